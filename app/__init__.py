@@ -37,6 +37,126 @@ def create_app():
 
     app.config["SQLALCHEMY_TRACK_MODIFICATIONS"] = False
 
+    # Full-text search backend: auto picks FTS5 on SQLite and tsvector on Postgres
+    app.config["SEARCH_BACKEND"] = os.getenv("SEARCH_BACKEND", "auto")
+
+    # Feed paging: default/maximum page size and how long cached totals live
+    app.config["FEED_PAGE_SIZE"] = int(os.getenv("FEED_PAGE_SIZE", "5"))
+    app.config["FEED_MAX_PAGE_SIZE"] = int(os.getenv("FEED_MAX_PAGE_SIZE", "50"))
+    app.config["FEED_COUNT_TTL"] = int(os.getenv("FEED_COUNT_TTL", "300"))
+
+    # Rendered feed pages: "local" (in-process LRU) or "null" to disable
+    app.config["FEED_CACHE_BACKEND"] = os.getenv("FEED_CACHE_BACKEND", "local")
+    app.config["FEED_CACHE_MAX_ENTRIES"] = int(os.getenv("FEED_CACHE_MAX_ENTRIES", "512"))
+    app.config["FEED_CACHE_TTL"] = int(os.getenv("FEED_CACHE_TTL", "60"))
+
+    # Tag name -> id cache used when posting opportunities
+    app.config["TAG_CACHE_MAX_ENTRIES"] = int(os.getenv("TAG_CACHE_MAX_ENTRIES", "4096"))
+    app.config["TAG_CACHE_TTL"] = int(os.getenv("TAG_CACHE_TTL", "300"))
+
+    # Exact tag filter: how many tags keep their approved-opportunity ids in
+    # memory, the longest list worth keeping, and the most ids sent to the
+    # database as a literal IN list before it is asked to match the tags itself
+    app.config["TAG_POSTINGS_MAX_ENTRIES"] = int(os.getenv("TAG_POSTINGS_MAX_ENTRIES", "256"))
+    app.config["TAG_POSTINGS_MAX_IDS"] = int(os.getenv("TAG_POSTINGS_MAX_IDS", "5000"))
+    app.config["TAG_FILTER_MAX_INLINE_IDS"] = int(os.getenv("TAG_FILTER_MAX_INLINE_IDS", "500"))
+
+    # /tags and /categories snapshot: how long it may live without a change
+    # being seen (other worker processes) and the max-age sent to clients
+    app.config["CATALOG_CACHE_TTL"] = int(os.getenv("CATALOG_CACHE_TTL", "300"))
+    app.config["CATALOG_MAX_AGE"] = int(os.getenv("CATALOG_MAX_AGE", "60"))
+
+    # /suggest typeahead: completions kept per prefix and how often the
+    # index is rebuilt to pick up other worker processes' changes
+    app.config["SUGGEST_MAX_RESULTS"] = int(os.getenv("SUGGEST_MAX_RESULTS", "10"))
+    app.config["SUGGEST_REBUILD_SECONDS"] = int(os.getenv("SUGGEST_REBUILD_SECONDS", "600"))
+
+    # Flask-Login user snapshots: how many are kept and how long a change
+    # made by another worker process can go unseen
+    app.config["USER_CACHE_MAX_ENTRIES"] = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+    app.config["USER_CACHE_TTL"] = int(os.getenv("USER_CACHE_TTL", "60"))
+
+    # Password hashing (app/passwords.py): Werkzeug method and salt length,
+    # pool workers (0 hashes inline), how many more may wait before logins
+    # get a 503, and whether the pool uses threads or processes
+    app.config["PASSWORD_HASH_METHOD"] = os.getenv("PASSWORD_HASH_METHOD", "scrypt:32768:8:1")
+    app.config["PASSWORD_SALT_LENGTH"] = int(os.getenv("PASSWORD_SALT_LENGTH", "16"))
+    app.config["PASSWORD_HASH_WORKERS"] = int(os.getenv("PASSWORD_HASH_WORKERS", "2"))
+    app.config["PASSWORD_HASH_QUEUE"] = int(os.getenv("PASSWORD_HASH_QUEUE", "16"))
+    app.config["PASSWORD_HASH_EXECUTOR"] = os.getenv("PASSWORD_HASH_EXECUTOR", "thread")
+
+    # Quotas (app/ratelimit.py): refill rate per second and burst size of
+    # the per-user and per-IP token buckets, and where they are kept
+    app.config["RATE_LIMIT_BACKEND"] = os.getenv("RATE_LIMIT_BACKEND", "local")
+    app.config["RATE_LIMIT_MAX_KEYS"] = int(os.getenv("RATE_LIMIT_MAX_KEYS", "100000"))
+    app.config["RATE_LIMIT_USER_RATE"] = float(os.getenv("RATE_LIMIT_USER_RATE", "2"))
+    app.config["RATE_LIMIT_USER_BURST"] = int(os.getenv("RATE_LIMIT_USER_BURST", "120"))
+    app.config["RATE_LIMIT_IP_RATE"] = float(os.getenv("RATE_LIMIT_IP_RATE", "10"))
+    app.config["RATE_LIMIT_IP_BURST"] = int(os.getenv("RATE_LIMIT_IP_BURST", "600"))
+
+    # Admission control: requests in flight before everything is refused,
+    # before low-priority work (search) is, and the average latency in ms
+    # above which low-priority work is refused (0 turns a limit off)
+    app.config["ADMISSION_MAX_CONCURRENT"] = int(os.getenv("ADMISSION_MAX_CONCURRENT", "48"))
+    app.config["ADMISSION_LOW_PRIORITY_MAX"] = int(os.getenv("ADMISSION_LOW_PRIORITY_MAX", "16"))
+    app.config["ADMISSION_SHED_LATENCY_MS"] = int(os.getenv("ADMISSION_SHED_LATENCY_MS", "1000"))
+
+    # Background jobs (app/jobs.py): tries per job, worker lease length,
+    # retry backoff (doubling from the base up to the max), jobs leased per
+    # poll, idle poll interval and how long finished jobs are kept
+    app.config["JOBS_MAX_ATTEMPTS"] = int(os.getenv("JOBS_MAX_ATTEMPTS", "5"))
+    app.config["JOBS_LEASE_SECONDS"] = int(os.getenv("JOBS_LEASE_SECONDS", "300"))
+    app.config["JOBS_BACKOFF_SECONDS"] = float(os.getenv("JOBS_BACKOFF_SECONDS", "5"))
+    app.config["JOBS_BACKOFF_MAX_SECONDS"] = float(os.getenv("JOBS_BACKOFF_MAX_SECONDS", "3600"))
+    app.config["JOBS_BATCH_SIZE"] = int(os.getenv("JOBS_BATCH_SIZE", "10"))
+    app.config["JOBS_POLL_SECONDS"] = float(os.getenv("JOBS_POLL_SECONDS", "1"))
+    app.config["JOBS_KEEP_SECONDS"] = int(os.getenv("JOBS_KEEP_SECONDS", "604800"))
+
+    # Mail outbox (app/outbox.py): SMTP socket timeout for the job workers
+    app.config["MAIL_OUTBOX_TIMEOUT"] = float(os.getenv("MAIL_OUTBOX_TIMEOUT", "30"))
+
+    # Feed radius search (?near=lat,lon&radius_km=): default and largest radius
+    app.config["GEO_DEFAULT_RADIUS_KM"] = float(os.getenv("GEO_DEFAULT_RADIUS_KM", "10"))
+    app.config["GEO_MAX_RADIUS_KM"] = float(os.getenv("GEO_MAX_RADIUS_KM", "500"))
+    # Most ids sent to the database as a literal IN list before it is asked
+    # to measure the distances itself
+    app.config["GEO_FILTER_MAX_INLINE_IDS"] = int(os.getenv("GEO_FILTER_MAX_INLINE_IDS", "500"))
+
+    # Response encoding: JSON backend (auto/orjson/stdlib), and the smallest
+    # body worth compressing plus the gzip/deflate level
+    app.config["JSON_BACKEND"] = os.getenv("JSON_BACKEND", "auto")
+    app.config["COMPRESS_MIN_SIZE"] = int(os.getenv("COMPRESS_MIN_SIZE", "1024"))
+    app.config["COMPRESS_LEVEL"] = int(os.getenv("COMPRESS_LEVEL", "6"))
+
+    # Live engagement events: seconds to coalesce bursts before emitting
+    app.config["REALTIME_COALESCE_WINDOW"] = float(os.getenv("REALTIME_COALESCE_WINDOW", "0.25"))
+
+    # Moderation queue: default/maximum lease length in seconds, the largest
+    # batch one claim may take and the most ids one bulk action accepts
+    app.config["MODERATION_LEASE_SECONDS"] = int(os.getenv("MODERATION_LEASE_SECONDS", "600"))
+    app.config["MODERATION_MAX_LEASE_SECONDS"] = int(os.getenv("MODERATION_MAX_LEASE_SECONDS", "3600"))
+    app.config["MODERATION_CLAIM_MAX"] = int(os.getenv("MODERATION_CLAIM_MAX", "50"))
+    app.config["MODERATION_BULK_MAX"] = int(os.getenv("MODERATION_BULK_MAX", "1000"))
+
+    # Admin user search: the most rows counted before a total is reported
+    # as a lower bound (SQLite; Postgres uses the planner's estimate)
+    app.config["ADMIN_USER_COUNT_CAP"] = int(os.getenv("ADMIN_USER_COUNT_CAP", "10000"))
+
+    # Report review: how many recent reports to show per reported target
+    app.config["REPORT_LATEST_REASONS"] = int(os.getenv("REPORT_LATEST_REASONS", "3"))
+
+    # Socket.IO fan-out between worker processes, see app/message_queue.py
+    app.config["SOCKETIO_MESSAGE_QUEUE"] = os.getenv("SOCKETIO_MESSAGE_QUEUE")
+    app.config["SOCKETIO_CHANNEL"] = os.getenv("SOCKETIO_CHANNEL", "community-connect")
+
+    # Production server (serve.py / app/serving.py): async mode is auto,
+    # threading, eventlet or gevent; threads bounds the per-worker pool
+    app.config["SERVER_ASYNC_MODE"] = os.getenv("SERVER_ASYNC_MODE", "auto")
+    app.config["SERVER_THREADS"] = int(os.getenv("SERVER_THREADS", "64"))
+    app.config["SERVER_KEEPALIVE"] = float(os.getenv("SERVER_KEEPALIVE", "75"))
+    app.config["SERVER_BACKLOG"] = int(os.getenv("SERVER_BACKLOG", "128"))
+    app.config["SERVER_DRAIN_TIMEOUT"] = float(os.getenv("SERVER_DRAIN_TIMEOUT", "30"))
+
     # Email configuration
     app.config["MAIL_SERVER"] = os.getenv("MAIL_SERVER", "smtp.gmail.com")
     app.config["MAIL_PORT"] = int(os.getenv("MAIL_PORT", "587"))
@@ -48,12 +168,20 @@ def create_app():
     app.config["MAIL_PASSWORD"] = os.getenv("MAIL_PASSWORD")
     app.config["MAIL_DEFAULT_SENDER"] = os.getenv("MAIL_DEFAULT_SENDER")
 
+    # Needs JSON_BACKEND, so it replaces Flask's provider once config is read
+    from app.json_provider import JSONProvider
+    app.json = JSONProvider(app)
+
     # Initialize extensions WITH the app instance
     db.init_app(app)
     login.init_app(app)
     migrate.init_app(app, db)
     mail.init_app(app)
-    socketio.init_app(app, cors_allowed_origins="*")
+    from app.message_queue import socketio_options
+    async_mode = app.config["SERVER_ASYNC_MODE"]
+    socketio.init_app(app, cors_allowed_origins="*",
+                      async_mode=None if async_mode == "auto" else async_mode,
+                      **socketio_options(app))
 
     # Configure Flask-Login settings
     login.login_view = "main.login"
@@ -77,4 +205,36 @@ def create_app():
     # This should also be done after db.init_app(app)
     from app import models
 
+    from app.pagination import feed_counts
+    from app.cache import feed_cache
+    from app.catalog import catalog
+    from app.suggest import suggester
+    from app.tags import posting_cache, tag_cache
+    from app.user_cache import user_cache
+    from app.passwords import password_hasher
+    from app.ratelimit import rate_limiter
+    from app.jobs import job_queue
+    from app.outbox import outbox
+    feed_counts.init_app(app)
+    feed_cache.init_app(app)
+    tag_cache.init_app(app)
+    posting_cache.init_app(app)
+    catalog.init_app(app)
+    suggester.init_app(app)
+    user_cache.init_app(app)
+    password_hasher.init_app(app)
+    rate_limiter.init_app(app)
+    job_queue.init_app(app)
+    outbox.init_app(app)
+
+    from app.compression import compression
+    compression.init_app(app)
+
+    # Registers the Socket.IO subscribe/unsubscribe handlers
+    from app.realtime import broadcaster
+    broadcaster.init_app(app)
+
+    from app.commands import register_commands
+    register_commands(app)
+
     return app
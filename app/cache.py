@@ -0,0 +1,276 @@
+# app/cache.py
+"""In-process caching primitives.
+
+``LocalCache`` is a bounded LRU map with optional per-entry TTL and tag based
+invalidation.  ``SingleFlight`` coalesces concurrent fills of the same key so a
+burst of misses runs the expensive work once.  ``FeedCache`` puts the two
+together for the public feed; its storage is looked up by name in ``BACKENDS``
+so a shared backend (Redis, memcached) can be registered without touching the
+routes.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app
+
+from app.signals import feed_changed
+
+_MISSING = object()
+
+
+class CacheBackend:
+    """Interface every feed cache backend implements."""
+
+    def get(self, key, default=None):
+        raise NotImplementedError
+
+    def set(self, key, value, tags=(), generation=None):
+        raise NotImplementedError
+
+    def invalidate_tags(self, tags):
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    @property
+    def generation(self):
+        """Changes every time something is invalidated"""
+        raise NotImplementedError
+
+    def stats(self):
+        return {}
+
+
+class NullCache(CacheBackend):
+    """Caches nothing; used to switch the feed cache off."""
+
+    generation = 0
+
+    def get(self, key, default=None):
+        return default
+
+    def set(self, key, value, tags=(), generation=None):
+        pass
+
+    def invalidate_tags(self, tags):
+        pass
+
+    def clear(self):
+        pass
+
+
+class LocalCache(CacheBackend):
+    """Thread-safe LRU cache bounded by entry count."""
+
+    def __init__(self, max_entries=1024, ttl=None):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()   # key -> (value, expires_at, tags)
+        self._tags = {}                 # tag -> set of keys
+        self._lock = threading.Lock()
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    @property
+    def generation(self):
+        return self._generation
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, default=None):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[1] is not None and entry[1] <= time.monotonic():
+                self._discard(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return default
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def set(self, key, value, tags=(), generation=None):
+        with self._lock:
+            # Something was invalidated while the value was being computed;
+            # storing it now could resurrect stale data.
+            if generation is not None and generation != self._generation:
+                return False
+            if key in self._entries:
+                self._discard(key)
+            expires_at = time.monotonic() + self.ttl if self.ttl else None
+            tags = frozenset(tags)
+            self._entries[key] = (value, expires_at, tags)
+            for tag in tags:
+                self._tags.setdefault(tag, set()).add(key)
+            while len(self._entries) > self.max_entries:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+            return True
+
+    def delete(self, key):
+        with self._lock:
+            self._generation += 1
+            self._discard(key)
+
+    def invalidate_tags(self, tags):
+        with self._lock:
+            self._generation += 1
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._discard(key)
+
+    def clear(self):
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+            self._tags.clear()
+
+    def _discard(self, key):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        for tag in entry[2]:
+            keys = self._tags.get(tag)
+            if keys is not None:
+                keys.discard(key)
+                if not keys:
+                    del self._tags[tag]
+
+    def stats(self):
+        return {
+            'entries': len(self._entries),
+            'max_entries': self.max_entries,
+            'hits': self.hits,
+            'misses': self.misses,
+            'evictions': self.evictions,
+        }
+
+
+class _Call:
+    __slots__ = ('event', 'result', 'error')
+
+    def __init__(self):
+        self.event = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """Run at most one fill per key at a time; other callers share its result."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._calls = {}
+
+    def do(self, key, fn):
+        with self._lock:
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.event.wait()
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = fn()
+            return call.result
+        except BaseException as error:
+            call.error = error
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.event.set()
+
+
+def _local_backend(app):
+    return LocalCache(
+        max_entries=app.config['FEED_CACHE_MAX_ENTRIES'],
+        ttl=app.config['FEED_CACHE_TTL'],
+    )
+
+
+BACKENDS = {
+    'local': _local_backend,
+    'null': lambda app: NullCache(),
+}
+
+FEED_TAG = 'feed'
+
+
+def opportunity_tag(opportunity_id):
+    return f'opportunity:{opportunity_id}'
+
+
+class FeedCache:
+    """Caches rendered feed pages keyed by their normalized filters."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FEED_CACHE_BACKEND', 'local')
+        app.config.setdefault('FEED_CACHE_MAX_ENTRIES', 512)
+        # Safety net for changes made by other worker processes
+        app.config.setdefault('FEED_CACHE_TTL', 60)
+        backend = BACKENDS[app.config['FEED_CACHE_BACKEND']](app)
+        app.extensions['feed_cache'] = {'backend': backend, 'flights': SingleFlight()}
+
+    @staticmethod
+    def _state(app=None):
+        return (app or current_app).extensions['feed_cache']
+
+    @property
+    def backend(self):
+        return self._state()['backend']
+
+    def get_or_fill(self, key, fill):
+        """Return the cached payload for ``key`` or build it with ``fill``.
+
+        ``fill`` returns ``(payload, opportunity_ids)``; the ids are recorded so
+        engagement changes on one opportunity only evict the pages showing it.
+        """
+        state = self._state()
+        backend = state['backend']
+        payload = backend.get(key, _MISSING)
+        if payload is not _MISSING:
+            return payload
+
+        def load():
+            # A concurrent leader may have stored it while we waited for the lock
+            cached = backend.get(key, _MISSING)
+            if cached is not _MISSING:
+                return cached
+            generation = backend.generation
+            payload, opportunity_ids = fill()
+            tags = [FEED_TAG] + [opportunity_tag(i) for i in opportunity_ids]
+            backend.set(key, payload, tags=tags, generation=generation)
+            return payload
+
+        return state['flights'].do(key, load)
+
+    def invalidate(self, app, opportunity_ids, membership=True):
+        backend = self._state(app)['backend']
+        if membership:
+            backend.invalidate_tags([FEED_TAG])
+        else:
+            backend.invalidate_tags([opportunity_tag(i) for i in opportunity_ids])
+
+
+feed_cache = FeedCache()
+
+
+@feed_changed.connect
+def _invalidate_feed_cache(app, opportunity_ids=(), membership=True, **kwargs):
+    feed_cache.invalidate(app, opportunity_ids, membership)
@@ -0,0 +1,155 @@
+# app/catalog.py
+"""Tag and category listings served from an in-process snapshot.
+
+``/tags`` and ``/categories`` are read on every page that offers a tag or
+category picker, but they only change when tags are created or an
+opportunity enters or leaves the feed.  ``catalog.snapshot()`` builds both
+listings, with usage counts over approved opportunities, in two grouped
+queries and keeps the result until one of those changes (or
+``CATALOG_CACHE_TTL`` passes, for changes made by other worker processes).
+
+The unfiltered responses are serialized once per snapshot.  Every response
+carries the snapshot's digest as its ``ETag``, so a client or proxy holding
+the current version gets a 304 without a body.
+"""
+import hashlib
+from bisect import bisect_left
+
+from flask import current_app, has_app_context, request
+from sqlalchemy import event, func
+
+from app import db
+from app.cache import LocalCache, SingleFlight
+from app.models import Opportunity, Tag, opportunity_tags
+from app.signals import feed_changed, tags_changed
+
+CATEGORIES = ["Education", "Climate", "Health", "Youth", "Technology", "Mental Health"]
+
+_MISSING = object()
+
+
+class Snapshot:
+    """One immutable version of the tag and category listings."""
+
+    __slots__ = ('tags', 'names', 'by_count', 'categories', 'bodies', 'etag')
+
+    def __init__(self, tags, categories):
+        # Name order for prefix lookups; usage order for ?top=
+        self.tags = sorted(tags, key=lambda tag: tag['name'])
+        self.names = [tag['name'] for tag in self.tags]
+        self.by_count = sorted(self.tags, key=lambda tag: -tag['count'])
+        self.categories = categories
+        dumps = current_app.json.dumps
+        self.bodies = {'tags': dumps(self.tags), 'categories': dumps(self.categories)}
+        digest = hashlib.sha1()
+        for body in self.bodies.values():
+            digest.update(body.encode())
+        self.etag = digest.hexdigest()
+
+    def find_tags(self, prefix='', top=None):
+        """Tags starting with ``prefix``, or the ``top`` most used of those"""
+        if prefix:
+            start = bisect_left(self.names, prefix)
+            end = start
+            while end < len(self.names) and self.names[end].startswith(prefix):
+                end += 1
+            tags = self.tags[start:end]
+            if top is not None:
+                tags = sorted(tags, key=lambda tag: -tag['count'])[:top]
+            return tags
+        if top is not None:
+            return self.by_count[:top]
+        return self.tags
+
+
+def _load_tags():
+    approved = db.and_(Opportunity.id == opportunity_tags.c.opportunity_id,
+                       Opportunity.is_approved.is_(True))
+    rows = db.session.execute(
+        db.select(Tag.id, Tag.name, func.count(Opportunity.id))
+        .outerjoin(opportunity_tags, opportunity_tags.c.tag_id == Tag.id)
+        .outerjoin(Opportunity, approved)
+        .group_by(Tag.id, Tag.name)
+    )
+    return [{'id': tag_id, 'name': name, 'count': count} for tag_id, name, count in rows]
+
+
+def _load_categories():
+    counts = dict(db.session.execute(
+        db.select(Opportunity.category, func.count())
+        .where(Opportunity.is_approved.is_(True))
+        .group_by(Opportunity.category)
+    ).all())
+    return [{'name': name, 'count': counts.get(name, 0)} for name in CATEGORIES]
+
+
+class Catalog:
+    """Holds the current ``Snapshot``, rebuilding it once after each change."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('CATALOG_CACHE_TTL', 300)
+        app.config.setdefault('CATALOG_MAX_AGE', 60)
+        app.extensions['catalog'] = {
+            'cache': LocalCache(max_entries=1, ttl=app.config['CATALOG_CACHE_TTL']),
+            'flights': SingleFlight(),
+        }
+
+    @staticmethod
+    def _state(app=None):
+        return (app or current_app).extensions['catalog']
+
+    def snapshot(self):
+        state = self._state()
+        cache = state['cache']
+        snapshot = cache.get('snapshot', _MISSING)
+        if snapshot is not _MISSING:
+            return snapshot
+
+        def load():
+            cached = cache.get('snapshot', _MISSING)
+            if cached is not _MISSING:
+                return cached
+            generation = cache.generation
+            snapshot = Snapshot(_load_tags(), _load_categories())
+            cache.set('snapshot', snapshot, generation=generation)
+            return snapshot
+
+        return state['flights'].do('snapshot', load)
+
+    def respond(self, snapshot, body):
+        """JSON response for ``body`` that revalidates against the snapshot"""
+        response = current_app.response_class(body, mimetype='application/json')
+        response.set_etag(snapshot.etag)
+        response.cache_control.public = True
+        response.cache_control.max_age = current_app.config['CATALOG_MAX_AGE']
+        return response.make_conditional(request)
+
+    def clear(self, app=None):
+        self._state(app)['cache'].clear()
+
+
+catalog = Catalog()
+
+
+@feed_changed.connect
+def _feed_changed(app, membership=True, **kwargs):
+    # Usage counts only cover approved opportunities
+    if membership and 'catalog' in app.extensions:
+        catalog.clear(app)
+
+
+@tags_changed.connect
+def _tags_changed(app, **kwargs):
+    if 'catalog' in app.extensions:
+        catalog.clear(app)
+
+
+@event.listens_for(Tag, 'after_update')
+@event.listens_for(Tag, 'after_delete')
+def _tag_changed(mapper, connection, target):
+    if has_app_context() and 'catalog' in current_app.extensions:
+        catalog.clear()
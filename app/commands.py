@@ -0,0 +1,96 @@
+# app/commands.py
+import signal
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+
+from app import counters, search
+from app.jobs import Worker, job_queue
+
+search_cli = AppGroup('search', help='Manage the full-text search index.')
+counters_cli = AppGroup('counters', help='Check the denormalized engagement counters.')
+jobs_cli = AppGroup('jobs', help='Run and inspect background jobs.')
+
+
+@search_cli.command('rebuild')
+def rebuild_search_index():
+    """Rebuild the search index from the opportunity table."""
+    indexed = search.rebuild_index()
+    if indexed is None:
+        click.echo("The configured search backend keeps its own index; nothing to rebuild.")
+    else:
+        click.echo(f"Indexed {indexed} approved opportunities.")
+
+
+@counters_cli.command('verify')
+@click.option('--batch-size', default=1000, show_default=True)
+def verify_counters(batch_size):
+    """Report opportunities whose counters disagree with source rows."""
+    drifted = 0
+    for opportunity_id, mismatches in counters.find_drift(batch_size):
+        drifted += 1
+        details = ', '.join(f"{name} {stored} != {actual}"
+                            for name, (stored, actual) in mismatches.items())
+        click.echo(f"Opportunity {opportunity_id}: {details}")
+    if drifted:
+        click.echo(f"{drifted} opportunities have drifted counters.")
+        raise SystemExit(1)
+    click.echo("All counters match.")
+
+
+@counters_cli.command('repair')
+@click.option('--batch-size', default=1000, show_default=True)
+def repair_counters(batch_size):
+    """Recompute drifted counters from the reaction and bookmark tables."""
+    repaired = counters.repair(batch_size)
+    click.echo(f"Repaired {repaired} opportunities.")
+
+
+@jobs_cli.command('work')
+@click.option('--batch-size', type=int, default=None, help='Jobs leased per poll [JOBS_BATCH_SIZE].')
+@click.option('--max-jobs', type=int, default=None, help='Exit after running this many jobs.')
+@click.option('--until-idle', is_flag=True, help='Exit once no job is due.')
+def work(batch_size, max_jobs, until_idle):
+    """Run jobs until stopped; SIGTERM/SIGINT finish the current job first."""
+    worker = Worker(current_app._get_current_object(), batch_size=batch_size)
+    previous = {signum: signal.signal(signum, lambda *args: worker.stop())
+                for signum in (signal.SIGTERM, signal.SIGINT)}
+    click.echo(f"Worker {worker.id} started.")
+    try:
+        ran = worker.run(max_jobs=max_jobs, until_idle=until_idle)
+    finally:
+        for signum, handler in previous.items():
+            signal.signal(signum, handler)
+    click.echo(f"Worker {worker.id} ran {ran} jobs.")
+
+
+@jobs_cli.command('stats')
+def job_stats():
+    """Count jobs by status."""
+    for status, count in job_queue.stats().items():
+        click.echo(f"{status:8} {count}")
+
+
+@jobs_cli.command('retry')
+@click.argument('job_id', type=int)
+def retry_job(job_id):
+    """Queue a failed job again."""
+    if not job_queue.retry(job_id):
+        click.echo(f"Job {job_id} is not failed.")
+        raise SystemExit(1)
+    click.echo(f"Job {job_id} queued.")
+
+
+@jobs_cli.command('prune')
+@click.option('--older-than', type=int, default=None,
+              help='Seconds since a job finished [JOBS_KEEP_SECONDS].')
+def prune_jobs(older_than):
+    """Delete finished jobs."""
+    click.echo(f"Deleted {job_queue.prune(older_than)} finished jobs.")
+
+
+def register_commands(app):
+    app.cli.add_command(search_cli)
+    app.cli.add_command(counters_cli)
+    app.cli.add_command(jobs_cli)
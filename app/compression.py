@@ -0,0 +1,78 @@
+# app/compression.py
+"""Negotiated gzip/deflate compression of responses.
+
+An ``after_request`` hook compresses bodies of at least
+``COMPRESS_MIN_SIZE`` bytes whose mimetype is in ``COMPRESS_MIMETYPES``,
+using whichever of gzip and deflate the client's ``Accept-Encoding`` rates
+higher (gzip on a tie).  Smaller bodies are sent as they are; compressing
+them costs more time than it saves on the wire.
+
+A compressed body is a different representation, so a strong ETag on it
+is turned into a weak one.  ``If-None-Match`` uses weak comparison, so
+clients revalidating the compressed copy still get their 304s.
+"""
+import gzip
+import zlib
+
+from flask import current_app, request
+
+ENCODINGS = ('gzip', 'deflate')
+
+
+def _compress(data, encoding, level):
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    return zlib.compress(data, level)
+
+
+def choose_encoding(accept_encodings):
+    """Preferred of ``ENCODINGS`` for an ``Accept-Encoding``, or None"""
+    best, best_quality = None, 0
+    for encoding in ENCODINGS:
+        quality = accept_encodings[encoding]
+        if quality > best_quality:
+            best, best_quality = encoding, quality
+    return best
+
+
+class Compression:
+    """Compresses eligible responses after each request."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('COMPRESS_MIN_SIZE', 1024)
+        app.config.setdefault('COMPRESS_LEVEL', 6)
+        app.config.setdefault('COMPRESS_MIMETYPES', ['application/json', 'text/html', 'text/plain'])
+        app.after_request(self._after_request)
+
+    @staticmethod
+    def _after_request(response):
+        config = current_app.config
+        if (response.direct_passthrough or response.is_streamed
+                or response.mimetype not in config['COMPRESS_MIMETYPES']
+                or 'Content-Encoding' in response.headers
+                or not 200 <= response.status_code < 300 or response.status_code == 204):
+            return response
+        data = response.get_data()
+        if len(data) < config['COMPRESS_MIN_SIZE']:
+            return response
+
+        # The body now depends on Accept-Encoding whether or not this client
+        # gets it compressed
+        response.vary.add('Accept-Encoding')
+        encoding = choose_encoding(request.accept_encodings)
+        if encoding is None:
+            return response
+
+        response.set_data(_compress(data, encoding, config['COMPRESS_LEVEL']))
+        response.headers['Content-Encoding'] = encoding
+        etag, weak = response.get_etag()
+        if etag and not weak:
+            response.set_etag(etag, weak=True)
+        return response
+
+
+compression = Compression()
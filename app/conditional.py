@@ -0,0 +1,65 @@
+# app/conditional.py
+"""Conditional GET for opportunity detail and feed responses.
+
+``Opportunity.updated_at`` moves on every change to an opportunity,
+including reaction and bookmark counter updates and tag changes.
+
+* Detail - the validators come from the opportunity's ``updated_at``, read
+  with a primary key lookup before the opportunity is loaded or serialized.
+* Feed - each page is serialized once when the feed cache fills it, and the
+  cached entry keeps the body together with its ETag (a digest of the
+  body).  A repeat request is answered, 200 or 304, without a query or a
+  serialization, and the feed cache's invalidation decides when a page is
+  rebuilt.  Feed pages carry no ``Last-Modified``: deleting, unapproving
+  or reordering rows can leave the newest ``updated_at`` on a page
+  unchanged or lower it, so ``If-Modified-Since`` would get stale 304s.
+
+Both ETags are strong; responses say ``no-cache`` so caches revalidate
+every time.
+"""
+import hashlib
+
+from flask import current_app, request
+from werkzeug.http import is_resource_modified
+
+from app import db
+from app.models import Opportunity
+
+
+def make_etag(*parts):
+    return hashlib.sha1(repr(parts).encode()).hexdigest()
+
+
+def opportunity_validator(opportunity_id):
+    """``updated_at`` of one opportunity, or None if it does not exist"""
+    return db.session.execute(
+        db.select(Opportunity.updated_at).where(Opportunity.id == opportunity_id)
+    ).scalar()
+
+
+def feed_entry(payload):
+    """``(body, etag)`` for a feed page payload"""
+    body = current_app.json.dumps(payload)
+    return body, hashlib.sha1(body.encode()).hexdigest()
+
+
+def not_modified(etag, last_modified):
+    """True if the client's cached copy is still current"""
+    return not is_resource_modified(request.environ, etag=etag, last_modified=last_modified)
+
+
+def add_validators(response, etag, last_modified):
+    response.set_etag(etag)
+    if last_modified is not None:
+        response.last_modified = last_modified
+    response.cache_control.no_cache = True
+    return response
+
+
+def respond(body, etag, last_modified=None):
+    """200 with ``body``, or a bodiless 304 if the client's copy is current"""
+    if not_modified(etag, last_modified):
+        response = current_app.response_class(status=304)
+    else:
+        response = current_app.response_class(body, mimetype='application/json')
+    return add_validators(response, etag, last_modified)
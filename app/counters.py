@@ -0,0 +1,78 @@
+# app/counters.py
+"""Verify and repair the denormalized engagement counters on Opportunity.
+
+The counters are recomputed from the reaction and bookmark tables with
+correlated COUNT subqueries, walking the opportunity table in primary key
+batches so a large table is never locked or loaded all at once.
+"""
+from app import db
+from app.models import REACTION_TYPES, Bookmark, Opportunity, Reaction
+
+
+def actual_counts():
+    """Map each counter column to a correlated COUNT over its source rows"""
+    counts = {}
+    for reaction_type in REACTION_TYPES:
+        counts[getattr(Opportunity, f'{reaction_type}_count')] = (
+            db.select(db.func.count(Reaction.id))
+            .where(Reaction.opportunity_id == Opportunity.id,
+                   Reaction.reaction_type == reaction_type)
+            .scalar_subquery()
+        )
+    counts[Opportunity.bookmark_count] = (
+        db.select(db.func.count(Bookmark.id))
+        .where(Bookmark.opportunity_id == Opportunity.id)
+        .scalar_subquery()
+    )
+    return counts
+
+
+def _batches(batch_size):
+    last_id = 0
+    while True:
+        ids = db.session.execute(
+            db.select(Opportunity.id).where(Opportunity.id > last_id)
+            .order_by(Opportunity.id).limit(batch_size)
+        ).scalars().all()
+        if not ids:
+            return
+        yield ids[0], ids[-1]
+        last_id = ids[-1]
+
+
+def _drifted(counts):
+    return db.or_(*[column != actual for column, actual in counts.items()])
+
+
+def find_drift(batch_size=1000):
+    """Yield (opportunity_id, {counter: (stored, actual)}) for every mismatch"""
+    counts = actual_counts()
+    columns = list(counts)
+    for first_id, last_id in _batches(batch_size):
+        rows = db.session.execute(
+            db.select(Opportunity.id, *columns, *counts.values())
+            .where(Opportunity.id.between(first_id, last_id), _drifted(counts))
+        )
+        for row in rows:
+            stored = row[1:1 + len(columns)]
+            actual = row[1 + len(columns):]
+            yield row[0], {
+                column.key: (stored[i], actual[i])
+                for i, column in enumerate(columns) if stored[i] != actual[i]
+            }
+
+
+def repair(batch_size=1000):
+    """Rewrite drifted counters from source rows; returns rows fixed"""
+    counts = actual_counts()
+    repaired = 0
+    for first_id, last_id in _batches(batch_size):
+        result = db.session.execute(
+            db.update(Opportunity)
+            .where(Opportunity.id.between(first_id, last_id), _drifted(counts))
+            .values(counts)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        repaired += result.rowcount
+    return repaired
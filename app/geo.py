@@ -0,0 +1,218 @@
+# app/geo.py
+"""Radius search over opportunity coordinates.
+
+Opportunities may carry a latitude and longitude; each located one also
+stores the geohash of its point (``GEOHASH_PRECISION`` characters), kept in
+step by ORM hooks below.  A geohash names a grid cell, and every point inside
+a cell has a geohash starting with the cell's, so "inside this cell" is a
+string range the ``(is_approved, geohash)`` index answers directly.
+
+``radius_filter`` picks the finest cell size still at least as large as the
+radius, so the circle always fits inside the 3x3 block of cells around the
+centre, and narrows those cells with the latitude/longitude box around the
+circle.  When at most ``GEO_FILTER_MAX_INLINE_IDS`` opportunities fall in
+that area it measures their exact great-circle distances and hands the feed
+an ``id IN (...)`` criterion.  Beyond that, binding every id would cost more
+than the check itself, so the database measures the distances instead
+(SQLite only when built with its math functions; without them the id list
+is used whatever its length).  Either criterion composes with every other
+feed filter and with keyset paging; the feed measures distances for the
+page it returns.
+"""
+import math
+
+from flask import current_app
+from sqlalchemy import event, false
+from sqlalchemy.exc import DBAPIError
+
+from app import db
+from app.models import Opportunity
+
+EARTH_RADIUS_KM = 6371.0088
+KM_PER_DEGREE = math.pi * EARTH_RADIUS_KM / 180
+
+GEOHASH_PRECISION = Opportunity.geohash.type.length
+_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+
+
+def encode(latitude, longitude, precision=GEOHASH_PRECISION):
+    """Geohash of a point, ``precision`` characters long"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, value, even = [], 0, 0, True
+    while len(chars) < precision:
+        # Bits alternate between longitude and latitude, longitude first
+        interval, coordinate = (lon_range, longitude) if even else (lat_range, latitude)
+        middle = (interval[0] + interval[1]) / 2
+        value <<= 1
+        if coordinate >= middle:
+            value |= 1
+            interval[0] = middle
+        else:
+            interval[1] = middle
+        even = not even
+        bits += 1
+        if bits == 5:
+            chars.append(_BASE32[value])
+            bits, value = 0, 0
+    return ''.join(chars)
+
+
+def cell_size(precision):
+    """(latitude, longitude) extent in degrees of a geohash cell"""
+    bits = 5 * precision
+    return 180.0 / 2 ** (bits // 2), 360.0 / 2 ** ((bits + 1) // 2)
+
+
+def covering_cells(latitude, longitude, radius_km):
+    """Geohash prefixes whose cells together contain the whole circle"""
+    lat_radius = radius_km / KM_PER_DEGREE
+    if abs(latitude) + lat_radius >= 90:
+        # A circle over a pole spans every longitude
+        return ['']
+    # Degrees of longitude shrink towards the poles
+    lon_radius = radius_km / (KM_PER_DEGREE * max(math.cos(math.radians(latitude)), 1e-6))
+
+    precision = 0
+    while precision < GEOHASH_PRECISION:
+        lat_size, lon_size = cell_size(precision + 1)
+        if lat_size < lat_radius or lon_size < lon_radius:
+            break
+        precision += 1
+    if precision == 0:
+        return ['']
+
+    lat_size, lon_size = cell_size(precision)
+    cells = set()
+    for lat_step in (-1, 0, 1):
+        for lon_step in (-1, 0, 1):
+            lat = min(max(latitude + lat_step * lat_size, -90.0), 90.0 - 1e-9)
+            lon = (longitude + lon_step * lon_size + 180.0) % 360.0 - 180.0
+            cells.add(encode(lat, lon, precision))
+    return sorted(cells)
+
+
+def parse_point(value):
+    """``(lat, lon)`` from "lat,lon"; raises ValueError"""
+    latitude, longitude = (float(part) for part in value.split(','))
+    return check_point(latitude, longitude)
+
+
+def check_point(latitude, longitude):
+    if not (-90 <= latitude <= 90 and -180 <= longitude <= 180):
+        raise ValueError('coordinates out of range')
+    return latitude, longitude
+
+
+def coordinates_from(data):
+    """``(lat, lon)`` from a JSON body's latitude/longitude, or (None, None)
+
+    Both or neither must be given; raises ValueError otherwise.
+    """
+    latitude, longitude = data.get('latitude'), data.get('longitude')
+    if latitude is None and longitude is None:
+        return None, None
+    if isinstance(latitude, bool) or isinstance(longitude, bool):
+        raise ValueError('coordinates must be numbers')
+    return check_point(float(latitude), float(longitude))
+
+
+def distances_km(latitude, longitude, points):
+    """Great-circle distance from one point to each ``(id, lat, lon)``"""
+    lat1 = math.radians(latitude)
+    cos_lat1 = math.cos(lat1)
+    lon1 = math.radians(longitude)
+    sin, cos, asin, sqrt, radians = math.sin, math.cos, math.asin, math.sqrt, math.radians
+    distances = {}
+    for point_id, lat, lon in points:
+        lat2 = radians(lat)
+        half = sin((lat2 - lat1) / 2) ** 2 + cos_lat1 * cos(lat2) * sin((radians(lon) - lon1) / 2) ** 2
+        distances[point_id] = 2 * EARTH_RADIUS_KM * asin(min(1.0, sqrt(half)))
+    return distances
+
+
+def bounding_box(latitude, longitude, radius_km):
+    """``(south, north, west, east)`` of the smallest box around the circle
+
+    ``west`` > ``east`` when the box crosses the antimeridian; both are None
+    when the circle covers a pole and so spans every longitude.
+    """
+    angle = radius_km / EARTH_RADIUS_KM
+    lat_radius = math.degrees(angle)
+    south, north = latitude - lat_radius, latitude + lat_radius
+    if abs(latitude) + lat_radius >= 90:
+        return max(south, -90.0), min(north, 90.0), None, None
+    # The circle is widest in longitude north (or south) of its centre, not
+    # at the centre's own latitude
+    lon_radius = math.degrees(math.asin(math.sin(angle) / math.cos(math.radians(latitude))))
+    west = (longitude - lon_radius + 180.0) % 360.0 - 180.0
+    east = (longitude + lon_radius + 180.0) % 360.0 - 180.0
+    return south, north, west, east
+
+
+def _box_criteria(south, north, west, east):
+    criteria = [Opportunity.latitude.between(south, north)]
+    if west is None:
+        return criteria
+    if west <= east:
+        criteria.append(Opportunity.longitude.between(west, east))
+    else:
+        criteria.append(db.or_(Opportunity.longitude >= west, Opportunity.longitude <= east))
+    return criteria
+
+
+def _within_sql(latitude, longitude, radius_km):
+    """Exact great-circle check evaluated by the database"""
+    lat1, lon1 = math.radians(latitude), math.radians(longitude)
+    lat2, lon2 = db.func.radians(Opportunity.latitude), db.func.radians(Opportunity.longitude)
+    sin_lat = db.func.sin((lat2 - lat1) / 2)
+    sin_lon = db.func.sin((lon2 - lon1) / 2)
+    half = sin_lat * sin_lat + math.cos(lat1) * db.func.cos(lat2) * sin_lon * sin_lon
+    # distance <= radius  <=>  haversine <= sin^2(radius / 2R); no asin needed
+    return half <= math.sin(radius_km / (2 * EARTH_RADIUS_KM)) ** 2
+
+
+def _sql_has_math():
+    """Whether the database has sin/cos/radians (SQLite only with its math functions)"""
+    state = current_app.extensions.setdefault('geo', {})
+    if 'math' not in state:
+        dialect = db.engine.dialect.name
+        if dialect == 'sqlite':
+            try:
+                with db.engine.connect() as connection:
+                    connection.exec_driver_sql("SELECT sin(0), cos(0), radians(0)")
+                state['math'] = True
+            except DBAPIError:
+                state['math'] = False
+        else:
+            state['math'] = dialect == 'postgresql'
+    return state['math']
+
+
+def radius_filter(latitude, longitude, radius_km):
+    """Criterion for approved opportunities within ``radius_km`` of the point"""
+    cells = [db.and_(Opportunity.geohash >= cell, Opportunity.geohash < cell + '~')
+             for cell in covering_cells(latitude, longitude, radius_km)]
+    area = [Opportunity.is_approved.is_(True), db.or_(*cells),
+            *_box_criteria(*bounding_box(latitude, longitude, radius_km))]
+    max_inline = current_app.config['GEO_FILTER_MAX_INLINE_IDS']
+    in_sql = _sql_has_math()
+    candidates = db.select(Opportunity.id, Opportunity.latitude, Opportunity.longitude).where(*area)
+    if in_sql:
+        candidates = candidates.limit(max_inline + 1)
+    candidates = db.session.execute(candidates).all()
+    if in_sql and len(candidates) > max_inline:
+        # Binding thousands of ids costs more than measuring in the database
+        return db.and_(*area, _within_sql(latitude, longitude, radius_km))
+    within = sorted(opportunity_id for opportunity_id, distance
+                    in distances_km(latitude, longitude, candidates).items()
+                    if distance <= radius_km)
+    return Opportunity.id.in_(within) if within else false()
+
+
+@event.listens_for(Opportunity, 'before_insert')
+@event.listens_for(Opportunity, 'before_update')
+def _set_geohash(mapper, connection, target):
+    if target.latitude is None or target.longitude is None:
+        target.geohash = None
+    else:
+        target.geohash = encode(target.latitude, target.longitude)
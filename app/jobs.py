@@ -0,0 +1,325 @@
+# app/jobs.py
+"""Durable background jobs kept in the application database.
+
+Register a function with ``@job`` and call ``fn.delay(...)`` (or
+``fn.enqueue(...)`` for per-call options) from a request::
+
+    @job(priority=5, max_attempts=3)
+    def rebuild_digest(user_id):
+        ...
+
+    rebuild_digest.delay(user.id)
+    db.session.commit()
+
+A job is a ``Job`` row inserted in the caller's transaction, so it exists
+only if the request's own changes commit.  Arguments are stored as JSON.
+Enqueuing twice with one ``idempotency_key`` adds the job once; the key
+stays taken until ``prune`` deletes the finished job.
+
+``flask jobs work`` runs a worker.  Each poll leases up to
+``JOBS_BATCH_SIZE`` due jobs, highest ``priority`` first, for
+``JOBS_LEASE_SECONDS``; every ``REQUEUE_INTERVAL`` seconds the worker also
+requeues jobs whose lease ran out because their worker died.  A job's own writes
+and its ``done`` mark commit together, and a worker that lost its lease
+rolls its writes back, so database effects happen once.  A job that raises
+is retried after an exponential backoff with jitter (``JOBS_BACKOFF_SECONDS``
+doubling up to ``JOBS_BACKOFF_MAX_SECONDS``) until it has been tried
+``max_attempts`` times, then left ``failed`` for ``flask jobs retry``; a
+task that raises ``PermanentFailure`` is failed at once.
+Other side effects (mail, HTTP calls) can repeat after a crash, so tasks
+should tolerate running twice.
+
+Any number of workers may run.  SQLite serializes their claims through its
+write lock, and Postgres lets them skip each other's rows.
+"""
+import functools
+import json
+import logging
+import os
+import random
+import socket
+import time
+import traceback
+import uuid
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app import db
+from app.models import _UPSERT_INSERTS, JOB_STATUSES, Job
+from app.signals import worker_idle
+
+logger = logging.getLogger(__name__)
+
+# Task name -> Task, filled in by @job as modules are imported
+TASKS = {}
+# Seconds between a worker's sweeps for jobs whose lease ran out
+REQUEUE_INTERVAL = 30
+
+
+class PermanentFailure(Exception):
+    """Raised by a task whose job would fail the same way however often it ran."""
+
+
+class Task:
+    """A function registered with ``@job``; calling it runs it inline."""
+
+    def __init__(self, fn, name, priority, max_attempts):
+        functools.update_wrapper(self, fn)
+        self.fn = fn
+        self.name = name
+        self.priority = priority
+        self.max_attempts = max_attempts
+
+    def __call__(self, *args, **kwargs):
+        return self.fn(*args, **kwargs)
+
+    def delay(self, *args, **kwargs):
+        """Enqueue ``fn(*args, **kwargs)``; returns the job id"""
+        return self.enqueue(args, kwargs)
+
+    def enqueue(self, args=(), kwargs=None, priority=None, countdown=0, idempotency_key=None):
+        return job_queue.enqueue(
+            self.name, args, kwargs,
+            priority=self.priority if priority is None else priority,
+            max_attempts=self.max_attempts, countdown=countdown,
+            idempotency_key=idempotency_key,
+        )
+
+
+def job(fn=None, *, name=None, priority=0, max_attempts=None):
+    """Register ``fn`` as a task; usable bare or with options"""
+    def register(fn):
+        task = Task(fn, name or f'{fn.__module__}.{fn.__qualname__}', priority, max_attempts)
+        if TASKS.setdefault(task.name, task) is not task:
+            raise ValueError(f"Task {task.name!r} is already registered")
+        return task
+    return register(fn) if fn is not None else register
+
+
+def backoff(attempts):
+    """Seconds to wait before retrying a job that has failed ``attempts`` times"""
+    config = current_app.config
+    delay = min(config['JOBS_BACKOFF_SECONDS'] * 2 ** (attempts - 1), config['JOBS_BACKOFF_MAX_SECONDS'])
+    # Jitter keeps jobs that failed together from retrying together
+    return delay * random.uniform(0.5, 1.0)
+
+
+class JobQueue:
+    """Enqueues jobs and reports on the queue."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('JOBS_MAX_ATTEMPTS', 5)
+        app.config.setdefault('JOBS_LEASE_SECONDS', 300)
+        app.config.setdefault('JOBS_BACKOFF_SECONDS', 5)
+        app.config.setdefault('JOBS_BACKOFF_MAX_SECONDS', 3600)
+        app.config.setdefault('JOBS_BATCH_SIZE', 10)
+        app.config.setdefault('JOBS_POLL_SECONDS', 1.0)
+        app.config.setdefault('JOBS_KEEP_SECONDS', 7 * 24 * 3600)
+
+    def enqueue(self, task, args=(), kwargs=None, priority=0, max_attempts=None,
+                countdown=0, idempotency_key=None):
+        """Insert a job in the caller's transaction; returns its id.
+
+        With an ``idempotency_key`` that is already taken nothing is added
+        and the existing job's id is returned.
+        """
+        now = datetime.utcnow()
+        values = {
+            'task': task,
+            'payload': json.dumps({'args': list(args), 'kwargs': kwargs or {}}),
+            'priority': priority,
+            'status': 'queued',
+            'attempts': 0,
+            'max_attempts': max_attempts or current_app.config['JOBS_MAX_ATTEMPTS'],
+            'run_at': now + timedelta(seconds=countdown),
+            'idempotency_key': idempotency_key,
+            'created_at': now,
+        }
+        if idempotency_key is None:
+            return db.session.execute(db.insert(Job).values(values)).inserted_primary_key[0]
+        insert = _UPSERT_INSERTS[db.session.get_bind().dialect.name]
+        db.session.execute(
+            insert(Job).values(values).on_conflict_do_nothing(index_elements=['idempotency_key'])
+        )
+        return db.session.execute(
+            db.select(Job.id).where(Job.idempotency_key == idempotency_key)
+        ).scalar_one()
+
+    def stats(self):
+        counts = dict(db.session.execute(
+            db.select(Job.status, db.func.count()).group_by(Job.status)
+        ).all())
+        return {status: counts.get(status, 0) for status in JOB_STATUSES}
+
+    def retry(self, job_id):
+        """Queue a failed job again with fresh attempts; True if it was failed"""
+        result = db.session.execute(
+            db.update(Job).where(Job.id == job_id, Job.status == 'failed')
+            .values(status='queued', attempts=0, run_at=datetime.utcnow(), finished_at=None)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount == 1
+
+    def prune(self, older_than=None):
+        """Delete jobs that finished ``done`` over ``older_than`` seconds ago"""
+        if older_than is None:
+            older_than = current_app.config['JOBS_KEEP_SECONDS']
+        result = db.session.execute(
+            db.delete(Job).where(Job.status == 'done',
+                                 Job.finished_at <= datetime.utcnow() - timedelta(seconds=older_than))
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return result.rowcount
+
+
+job_queue = JobQueue()
+
+
+class Worker:
+    """Leases due jobs in batches and runs them."""
+
+    def __init__(self, app, batch_size=None, poll_seconds=None):
+        self.app = app
+        self.batch_size = batch_size or app.config['JOBS_BATCH_SIZE']
+        self.poll_seconds = app.config['JOBS_POLL_SECONDS'] if poll_seconds is None else poll_seconds
+        self.id = f'{socket.gethostname()[:40]}:{os.getpid()}:{uuid.uuid4().hex[:8]}'
+        self.stopping = False
+        self.processed = 0
+        self._next_requeue = 0.0
+
+    def stop(self):
+        """Finish the job in hand, then return from ``run``"""
+        self.stopping = True
+
+    def run(self, max_jobs=None, until_idle=False):
+        """Poll and run jobs until stopped; returns how many ran"""
+        ran = 0
+        try:
+            while not self.stopping and (max_jobs is None or ran < max_jobs):
+                count = self.run_once(None if max_jobs is None else max_jobs - ran)
+                ran += count
+                if not count:
+                    if until_idle:
+                        break
+                    worker_idle.send(self.app)
+                    time.sleep(self.poll_seconds)
+        finally:
+            worker_idle.send(self.app)
+        return ran
+
+    def run_once(self, limit=None):
+        """Claim one batch and run it; returns how many jobs ran"""
+        with self.app.app_context():
+            if time.monotonic() >= self._next_requeue:
+                self.requeue_expired()
+                self._next_requeue = time.monotonic() + REQUEUE_INTERVAL
+            batch = self.claim(min(self.batch_size, limit or self.batch_size))
+        for index, row in enumerate(batch):
+            if self.stopping:
+                # Stopped mid-batch: hand the rest straight back
+                with self.app.app_context():
+                    self.release([r.id for r in batch[index:]])
+                return index
+            with self.app.app_context():
+                self.execute(row)
+            self.processed += 1
+        return len(batch)
+
+    def requeue_expired(self):
+        """Return jobs whose worker's lease ran out to the queue"""
+        now = datetime.utcnow()
+        expired = (Job.status == 'running', Job.locked_until <= now)
+        for statement in (
+            db.update(Job).where(*expired, Job.attempts >= Job.max_attempts)
+            .values(status='failed', locked_by=None, locked_until=None, finished_at=now,
+                    last_error='Lease expired before the job finished'),
+            db.update(Job).where(*expired)
+            .values(status='queued', locked_by=None, locked_until=None, run_at=now),
+        ):
+            db.session.execute(statement.execution_options(synchronize_session=False))
+        db.session.commit()
+
+    def claim(self, count):
+        """Lease up to ``count`` due jobs; returns their rows in run order"""
+        now = datetime.utcnow()
+        locked_until = now + timedelta(seconds=self.app.config['JOBS_LEASE_SECONDS'])
+        order = (Job.priority.desc(), Job.run_at, Job.id)
+        candidates = (
+            db.select(Job.id)
+            .where(Job.status == 'queued', Job.run_at <= now)
+            .order_by(*order)
+            .limit(count)
+            # Postgres: concurrent workers skip each other's rows instead of
+            # queueing behind them.  SQLite serializes writers and ignores this.
+            .with_for_update(skip_locked=True)
+        )
+        db.session.execute(
+            db.update(Job)
+            # Checked again on the row itself, in case another worker got it first
+            .where(Job.id.in_(candidates.scalar_subquery()), Job.status == 'queued')
+            .values(status='running', locked_by=self.id, locked_until=locked_until,
+                    attempts=Job.attempts + 1)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return db.session.execute(
+            db.select(Job.id, Job.task, Job.payload, Job.attempts, Job.max_attempts)
+            .where(Job.status == 'running', Job.locked_by == self.id,
+                   Job.locked_until == locked_until)
+            .order_by(*order)
+        ).all()
+
+    def release(self, ids):
+        db.session.execute(
+            db.update(Job).where(Job.id.in_(ids), Job.locked_by == self.id)
+            .values(status='queued', locked_by=None, locked_until=None,
+                    attempts=Job.attempts - 1)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+
+    def _finish(self, job_id, **values):
+        """Update a job this worker still holds; False if its lease was lost"""
+        result = db.session.execute(
+            db.update(Job).where(Job.id == job_id, Job.locked_by == self.id)
+            .values(locked_by=None, locked_until=None, **values)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    def execute(self, row):
+        """Run one claimed job and record how it went"""
+        now = datetime.utcnow
+        try:
+            task = TASKS.get(row.task)
+            if task is None:
+                raise LookupError(f"Unknown task {row.task!r}")
+            payload = json.loads(row.payload)
+            task.fn(*payload['args'], **payload['kwargs'])
+        except Exception as exc:
+            db.session.rollback()
+            error = traceback.format_exc()
+            logger.warning("Job %s (%s) failed, attempt %s of %s", row.id, row.task,
+                           row.attempts, row.max_attempts, exc_info=True)
+            if row.attempts >= row.max_attempts or isinstance(exc, PermanentFailure):
+                self._finish(row.id, status='failed', last_error=error, finished_at=now())
+            else:
+                self._finish(row.id, status='queued', last_error=error,
+                             run_at=now() + timedelta(seconds=backoff(row.attempts)))
+            db.session.commit()
+            return False
+
+        # The job's writes and its done mark commit together
+        if self._finish(row.id, status='done', last_error=None, finished_at=now()):
+            db.session.commit()
+            return True
+        db.session.rollback()
+        logger.warning("Job %s (%s) lost its lease; its changes were rolled back", row.id, row.task)
+        return False
@@ -0,0 +1,94 @@
+# app/json_provider.py
+"""JSON encoding for every response.
+
+``JSONProvider`` is installed as ``app.json`` and picks its encoder from
+``JSON_BACKEND``:
+
+* ``auto``    - orjson when it is installed, otherwise the standard library
+* ``orjson``  - require orjson
+* ``stdlib``  - the standard library ``json`` module
+
+Both backends write ``datetime`` and ``date`` values as ISO 8601 strings, so
+``to_dict()`` methods hand them over as they are instead of formatting them
+by hand.  Output is compact outside debug mode and keys are sorted, as with
+Flask's own provider, so bodies (and the feed's body-derived ETags) do not
+depend on the backend's dict handling.
+"""
+import json
+from datetime import date
+
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - exercised where orjson is absent
+    orjson = None
+
+BACKENDS = ('auto', 'orjson', 'stdlib')
+
+
+def _default(value):
+    if isinstance(value, date):
+        return value.isoformat()
+    return DefaultJSONProvider.default(value)
+
+
+class JSONProvider(DefaultJSONProvider):
+    """Flask JSON provider backed by orjson, falling back to ``json``."""
+
+    default = staticmethod(_default)
+
+    def __init__(self, app):
+        super().__init__(app)
+        backend = app.config.get('JSON_BACKEND', 'auto')
+        if backend not in BACKENDS:
+            raise ValueError(f"JSON_BACKEND must be one of {', '.join(BACKENDS)}")
+        if backend == 'orjson' and orjson is None:
+            raise RuntimeError("JSON_BACKEND is 'orjson' but orjson is not installed")
+        self.backend = 'orjson' if backend != 'stdlib' and orjson is not None else 'stdlib'
+
+    def _orjson_options(self, kwargs):
+        """orjson flags for ``json.dumps`` style kwargs, or None if unsupported"""
+        options = orjson.OPT_NON_STR_KEYS
+        if kwargs.pop('sort_keys', self.sort_keys):
+            options |= orjson.OPT_SORT_KEYS
+        if kwargs.pop('indent', None):
+            options |= orjson.OPT_INDENT_2
+        # orjson is always compact and always writes UTF-8
+        kwargs.pop('separators', None)
+        kwargs.pop('ensure_ascii', None)
+        kwargs.pop('default', None)
+        return None if kwargs else options
+
+    def dumpb(self, obj, **kwargs):
+        """Serialize ``obj`` to UTF-8 bytes"""
+        if self.backend == 'orjson':
+            options = self._orjson_options(dict(kwargs))
+            if options is not None:
+                return orjson.dumps(obj, default=kwargs.get('default', self.default), option=options)
+        return self._stdlib_dumps(obj, **kwargs).encode()
+
+    def dumps(self, obj, **kwargs):
+        if self.backend == 'orjson':
+            return self.dumpb(obj, **kwargs).decode()
+        return self._stdlib_dumps(obj, **kwargs)
+
+    def _stdlib_dumps(self, obj, **kwargs):
+        kwargs.setdefault('default', self.default)
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if self.backend == 'orjson' and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+        dump_args = {}
+        if (self.compact is None and self._app.debug) or self.compact is False:
+            dump_args['indent'] = 2
+        else:
+            dump_args['separators'] = (',', ':')
+        return self._app.response_class(self.dumpb(obj, **dump_args) + b'\n', mimetype=self.mimetype)
@@ -0,0 +1,266 @@
+# app/message_queue.py
+"""Cross-process fan-out for Socket.IO events.
+
+With more than one server process, a client is connected to exactly one of
+them, so an event emitted by another worker has to travel through a message
+queue.  ``SOCKETIO_MESSAGE_QUEUE`` selects the backend:
+
+* unset            - single process, no queue
+* ``local://``     - ``LocalManager``, an in-memory bus between Socket.IO
+                     servers living in the same process (tests, embedding)
+* ``ipc://host:port`` or ``ipc:///path/to.sock`` - ``IPCManager``, workers on
+                     one box relaying through a ``MessageHub`` (``serve.py``
+                     runs one next to its workers)
+* anything else    - handed to Flask-SocketIO as ``message_queue``, e.g.
+                     ``redis://`` or ``amqp://`` for multi-host deployments
+
+Both local backends plug into python-socketio's ``PubSubManager``; they only
+move opaque JSON messages, rooms and acks are handled by the base class.
+"""
+import json
+import logging
+import queue
+import threading
+from multiprocessing.connection import AuthenticationError, Client, Listener
+from urllib.parse import urlsplit
+
+from socketio import PubSubManager
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CHANNEL = 'community-connect'
+
+# Messages held for one slow subscriber before the hub starts dropping them
+SUBSCRIBER_BACKLOG = 10000
+
+
+class LocalManager(PubSubManager):
+    """Pub/sub between Socket.IO servers in one process."""
+
+    name = 'local'
+
+    _lock = threading.Lock()
+    _inboxes = {}   # channel -> list of queue.Queue
+
+    def __init__(self, url='local://', channel=DEFAULT_CHANNEL, write_only=False,
+                 logger=None, json=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self._inbox = None
+        if not write_only:
+            # Subscribe right away so nothing published before the listener
+            # thread starts is lost
+            self._inbox = queue.Queue()
+            with self._lock:
+                self._inboxes.setdefault(channel, []).append(self._inbox)
+
+    def close(self):
+        with self._lock:
+            inboxes = self._inboxes.get(self.channel, [])
+            if self._inbox in inboxes:
+                inboxes.remove(self._inbox)
+
+    def _publish(self, data):
+        message = self.json.dumps(data)
+        with self._lock:
+            inboxes = list(self._inboxes.get(self.channel, ()))
+        for inbox in inboxes:
+            inbox.put(message)
+
+    def _listen(self):
+        while True:
+            yield self._inbox.get()
+
+
+def parse_ipc_address(url):
+    """``ipc://host:port`` -> (host, port); ``ipc:///path`` -> '/path'"""
+    parts = urlsplit(url)
+    if parts.scheme != 'ipc':
+        raise ValueError(f"Not an ipc:// URL: {url}")
+    if parts.hostname:
+        if parts.port is None:
+            raise ValueError(f"ipc:// URL needs a port: {url}")
+        return parts.hostname, parts.port
+    if not parts.path:
+        raise ValueError(f"ipc:// URL needs a host:port or a socket path: {url}")
+    return parts.path
+
+
+def _hello(channel, role):
+    return json.dumps({'channel': channel, 'role': role}).encode()
+
+
+class IPCManager(PubSubManager):
+    """Pub/sub between worker processes through a ``MessageHub``."""
+
+    name = 'ipc'
+
+    def __init__(self, url='ipc://127.0.0.1:5099', channel=DEFAULT_CHANNEL,
+                 write_only=False, logger=None, json=None, authkey=None):
+        super().__init__(channel=channel, write_only=write_only, logger=logger, json=json)
+        self.address = parse_ipc_address(url)
+        self.authkey = authkey
+        self._publisher = None
+        self._publish_lock = threading.Lock()
+
+    def _connect(self, role):
+        connection = Client(self.address, authkey=self.authkey)
+        connection.send_bytes(_hello(self.channel, role))
+        return connection
+
+    def _publish(self, data):
+        message = self.json.dumps(data).encode()
+        with self._publish_lock:
+            # One reconnect covers a restarted hub; after that the event is
+            # dropped rather than blocking the request that emitted it.
+            for attempt in range(2):
+                try:
+                    if self._publisher is None:
+                        self._publisher = self._connect('publish')
+                    self._publisher.send_bytes(message)
+                    return
+                except (OSError, EOFError, AuthenticationError) as error:
+                    self._publisher = None
+                    if attempt:
+                        self._get_logger().error(
+                            'Cannot publish to the message hub at %s: %s', self.address, error)
+
+    def _listen(self):
+        retry_sleep = 1
+        while True:
+            try:
+                connection = self._connect('subscribe')
+            except (OSError, EOFError, AuthenticationError) as error:
+                self._get_logger().error(
+                    'Cannot reach the message hub at %s: %s; retrying in %ss',
+                    self.address, error, retry_sleep)
+                self.server.sleep(retry_sleep)
+                retry_sleep = min(retry_sleep * 2, 60)
+                continue
+            retry_sleep = 1
+            try:
+                while True:
+                    yield connection.recv_bytes()
+            except (OSError, EOFError):
+                self._get_logger().error('Lost the message hub at %s; reconnecting', self.address)
+            finally:
+                connection.close()
+
+
+class _Subscriber:
+    def __init__(self, connection):
+        self.connection = connection
+        self.queue = queue.Queue(maxsize=SUBSCRIBER_BACKLOG)
+
+    def offer(self, message):
+        try:
+            self.queue.put_nowait(message)
+        except queue.Full:
+            logger.warning('Dropping a message for a subscriber that stopped reading')
+
+    def run(self):
+        while True:
+            message = self.queue.get()
+            if message is None:
+                return
+            self.connection.send_bytes(message)
+
+
+class MessageHub:
+    """Relays every published message to the subscribers of its channel.
+
+    Each worker opens two connections, one to publish and one to listen, and
+    starts both with a JSON hello naming its channel and role.  Connections
+    are authenticated with ``authkey`` (``serve.py`` uses ``SECRET_KEY``).
+    """
+
+    def __init__(self, address, authkey=None):
+        self._listener = Listener(address, authkey=authkey)
+        self.address = self._listener.address
+        self._lock = threading.Lock()
+        self._subscribers = {}  # channel -> set of _Subscriber
+        self._closed = False
+
+    def start(self):
+        threading.Thread(target=self.serve_forever, name='message-hub', daemon=True).start()
+        return self
+
+    def serve_forever(self):
+        while not self._closed:
+            try:
+                connection = self._listener.accept()
+            except AuthenticationError:
+                logger.warning('Rejected a message hub connection with a bad key')
+                continue
+            except OSError:
+                if self._closed:
+                    return
+                raise
+            threading.Thread(target=self._handle, args=(connection,), daemon=True).start()
+
+    def close(self):
+        self._closed = True
+        self._listener.close()
+        with self._lock:
+            subscribers = [s for channel in self._subscribers.values() for s in channel]
+        for subscriber in subscribers:
+            subscriber.queue.put(None)
+
+    def subscriber_count(self, channel):
+        with self._lock:
+            return len(self._subscribers.get(channel, ()))
+
+    def publish(self, channel, message):
+        with self._lock:
+            subscribers = list(self._subscribers.get(channel, ()))
+        for subscriber in subscribers:
+            subscriber.offer(message)
+
+    def _handle(self, connection):
+        try:
+            hello = json.loads(connection.recv_bytes())
+            channel, role = hello['channel'], hello['role']
+        except (OSError, EOFError, ValueError, KeyError, TypeError):
+            connection.close()
+            return
+
+        try:
+            if role == 'subscribe':
+                subscriber = _Subscriber(connection)
+                with self._lock:
+                    self._subscribers.setdefault(channel, set()).add(subscriber)
+                try:
+                    subscriber.run()
+                finally:
+                    with self._lock:
+                        self._subscribers.get(channel, set()).discard(subscriber)
+            else:
+                while True:
+                    self.publish(channel, connection.recv_bytes())
+        except (OSError, EOFError):
+            pass
+        finally:
+            connection.close()
+
+
+MANAGERS = {
+    'local': LocalManager,
+    'ipc': IPCManager,
+}
+
+
+def socketio_options(app):
+    """Keyword arguments for ``socketio.init_app`` from the app config"""
+    url = app.config.get('SOCKETIO_MESSAGE_QUEUE')
+    channel = app.config.get('SOCKETIO_CHANNEL', DEFAULT_CHANNEL)
+    # client_manager is always passed so a manager from a previous init_app
+    # on the shared SocketIO object is never reused
+    if not url:
+        return {'client_manager': None, 'message_queue': None}
+    scheme = url.split('://', 1)[0]
+    if scheme == 'ipc':
+        manager = IPCManager(url, channel=channel, authkey=app.config['SECRET_KEY'].encode())
+    elif scheme in MANAGERS:
+        manager = MANAGERS[scheme](url, channel=channel)
+    else:
+        return {'message_queue': url, 'channel': channel}
+    return {'client_manager': manager, 'message_queue': None}
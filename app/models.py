@@ -1,19 +1,15 @@
 # app/models.py
-from app import login  # Import the login manager instance
 from app import db  # Correct way to import the SQLAlchemy instance
-# Import LoginManager to decorate load_user
-from flask_login import UserMixin, LoginManager
-from werkzeug.security import generate_password_hash, check_password_hash
+from app.passwords import password_hasher
+from app.search import register_index_ddl
+from flask_login import UserMixin
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import selectinload
 from datetime import datetime, timedelta  # Import datetime for timestamps
 import secrets
 import string
 
 
-# Initialize LoginManager here if not done in __init__.py,
-# but it's usually initialized in __init__.py and imported there for app.login.init_app(app)
-# If login is already initialized in app/__init__.py, you might just need:
-# from app import login # if you use @login.user_loader directly.
-
 # It's good practice to define the User model first if other models (like Opportunity)
 # have a foreign key relationship to it.
 
@@ -29,13 +25,35 @@ class User(db.Model, UserMixin):
     # Nullable as it's only set when suspended
     suspended_at = db.Column(db.DateTime, nullable=True)
     is_banned = db.Column(db.Boolean, default=False, nullable=False)
-    # Method to set the user's password hash
+
+    # Admin user search (app/users.py): case-insensitive prefix matching on
+    # username/email, the role filter, and partial indexes for the rare
+    # suspended/banned states.  text_pattern_ops lets Postgres answer
+    # LIKE 'prefix%' from the index whatever the database collation is.
+    __table_args__ = (
+        db.Index('ix_user_username_lower', db.func.lower(username).label('username_lower'),
+                 postgresql_ops={'username_lower': 'text_pattern_ops'}),
+        db.Index('ix_user_email_lower', db.func.lower(email).label('email_lower'),
+                 postgresql_ops={'email_lower': 'text_pattern_ops'}),
+        db.Index('ix_user_role', 'role', 'id'),
+        db.Index('ix_user_suspended', 'id', postgresql_where=(account_active == False),
+                 sqlite_where=(account_active == False)),
+        db.Index('ix_user_banned', 'id', postgresql_where=(is_banned == True),
+                 sqlite_where=(is_banned == True)),
+    )
+
+    # Method to set the user's password hash (hashed on the app's password
+    # pool, see app/passwords.py; may raise PasswordHashBusy)
     def set_password(self, password):
-        self.password_hash = generate_password_hash(password)
+        self.password_hash = password_hasher.hash(password)
 
     # Method to check a provided password against the stored hash
     def check_password(self, password):
-        return check_password_hash(self.password_hash, password)
+        return password_hasher.verify(self.password_hash, password)
+
+    # True if the stored hash predates the current hash settings
+    def password_needs_rehash(self):
+        return password_hasher.needs_rehash(self.password_hash)
 
     # Method to suspend a user account
     def suspend(self):
@@ -126,19 +144,51 @@ class Tag(db.Model):
     def __repr__(self):
         return f"<Tag {self.name}>"
 
+# Reaction types users can leave, each with a counter column on Opportunity
+REACTION_TYPES = ('like', 'love', 'wow')
+
+
 # Define model for Opportunity
 class Opportunity(db.Model):
+    __table_args__ = (
+        # Serves the approved feed ordered by (created_at, id) for keyset paging
+        db.Index('ix_opportunity_feed', 'is_approved', 'created_at', 'id'),
+        # Serves radius search (app/geo.py) as geohash prefix ranges
+        db.Index('ix_opportunity_geohash', 'is_approved', 'geohash'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(100), nullable=False)
     description = db.Column(db.Text, nullable=False)
     category = db.Column(db.String(50), nullable=False)
     location = db.Column(db.String(100), nullable=False)
+    # Optional point for radius search; geohash is derived from it on flush
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+    geohash = db.Column(db.String(9), nullable=True)
     is_approved = db.Column(db.Boolean, default=False, nullable=False)
     created_at = db.Column(
         db.DateTime, default=datetime.utcnow, nullable=False)
+    # Set on every UPDATE, ORM or Core, that does not set it explicitly
+    updated_at = db.Column(
+        db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow, nullable=False)
     approved_by_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True, index=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
 
+    # Moderation lease (see app/moderation.py).  A claim whose expiry has
+    # passed is treated as unclaimed, so nothing needs to clear it.
+    claimed_by_id = db.Column(
+        db.Integer, db.ForeignKey('user.id', ondelete='SET NULL'), nullable=True, index=True)
+    claim_expires_at = db.Column(db.DateTime, nullable=True)
+
+    # Denormalized engagement counters, maintained by the reaction and bookmark
+    # routes so feed reads never aggregate the child tables.
+    # `flask counters verify` / `flask counters repair` reconcile them.
+    like_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    love_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    wow_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+    bookmark_count = db.Column(db.Integer, default=0, server_default='0', nullable=False)
+
     # Relationship to User
     user = db.relationship(
         'User', backref=db.backref('opportunities', lazy=True), foreign_keys=[user_id])
@@ -148,36 +198,78 @@ class Opportunity(db.Model):
     tags = db.relationship('Tag', secondary=opportunity_tags, lazy='subquery',
         backref=db.backref('opportunities', lazy=True))
 
-    def to_dict(self):
-        return {
+    @property
+    def reaction_counts(self):
+        return {reaction_type: getattr(self, f'{reaction_type}_count') or 0
+                for reaction_type in REACTION_TYPES}
+
+    @staticmethod
+    def adjust_counters(opportunity_id, reactions=None, bookmarks=0):
+        """Apply counter deltas in one UPDATE, inside the caller's transaction"""
+        values = {}
+        for reaction_type, delta in (reactions or {}).items():
+            if delta:
+                column = getattr(Opportunity, f'{reaction_type}_count')
+                values[column] = column + delta
+        if bookmarks:
+            values[Opportunity.bookmark_count] = Opportunity.bookmark_count + bookmarks
+        if values:
+            db.session.execute(
+                db.update(Opportunity).where(Opportunity.id == opportunity_id).values(values)
+                .execution_options(synchronize_session=False)
+            )
+
+    def to_dict(self, expand=()):
+        # Engagement is summarized from the counter columns; pass
+        # expand=('reactions', 'bookmarks') for the full child rows.
+        data = {
             'id': self.id,
             'title': self.title,
             'description': self.description,
             'category': self.category,
             'location': self.location,
+            'latitude': self.latitude,
+            'longitude': self.longitude,
             'tags': [tag.to_dict() for tag in self.tags],
             'is_approved': self.is_approved,
-            'created_at': self.created_at.isoformat(),
+            'created_at': self.created_at,
+            'updated_at': self.updated_at,
             'approved_by': self.approved_by.username if self.approved_by else None,
             'user_id': self.user_id,
             'username': self.user.username,
-            'reactions': [reaction.to_dict() for reaction in self.reactions],
-            'bookmarks': [bookmark.to_dict() for bookmark in self.bookmarks],
+            'reaction_counts': self.reaction_counts,
+            'bookmark_count': self.bookmark_count or 0,
         }
+        if 'reactions' in expand:
+            data['reactions'] = [reaction.to_dict() for reaction in self.reactions]
+        if 'bookmarks' in expand:
+            data['bookmarks'] = [bookmark.to_dict() for bookmark in self.bookmarks]
+        return data
 
     def __repr__(self):
         return f"<Opportunity {self.title} by {self.user.username}>"
 
 
+# Keep the full-text search index in step with the opportunity table
+register_index_ddl(Opportunity.__table__)
+
+
 # Define model for Report
 class Report(db.Model):
+    __table_args__ = (
+        # Serve the per-target report review (app/reports.py); they also
+        # cover plain lookups by target
+        db.Index('ix_report_opportunity_review', 'reported_opportunity_id', 'is_reviewed'),
+        db.Index('ix_report_user_review', 'reported_user_id', 'is_reviewed'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     reporter_id = db.Column(
         db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     reported_user_id = db.Column(
-        db.Integer, db.ForeignKey('user.id'), nullable=True, index=True)
+        db.Integer, db.ForeignKey('user.id'), nullable=True)
     reported_opportunity_id = db.Column(
-        db.Integer, db.ForeignKey('opportunity.id'), nullable=True, index=True)
+        db.Integer, db.ForeignKey('opportunity.id'), nullable=True)
     reason = db.Column(db.String(255), nullable=False)
     timestamp = db.Column(db.DateTime, default=datetime.utcnow, nullable=True)
     is_reviewed = db.Column(db.Boolean, default=False, nullable=False)
@@ -190,22 +282,54 @@ class Report(db.Model):
     reported_opportunity = db.relationship(
         'Opportunity', backref=db.backref('reports', lazy=True))
 
-    def to_dict(self):
+    def to_dict(self, reported_opportunity=None):
+        # serialize_reports() passes the opportunity summary it built in batch
+        if reported_opportunity is None and self.reported_opportunity:
+            reported_opportunity = self.reported_opportunity.to_dict()
         return {
             'id': self.id,
             'reporter_username': self.reporter.username,
             'reason': self.reason,
-            'timestamp': self.timestamp.isoformat(),
+            'timestamp': self.timestamp,
             'is_reviewed': self.is_reviewed,
             'reported_user': self.reported_user.to_dict() if self.reported_user else None,
-            'reported_opportunity': self.reported_opportunity.to_dict() if self.reported_opportunity else None
+            'reported_opportunity': reported_opportunity
         }
 
     def __repr__(self):
         return f"<Report {self.id} by {self.reporter.username}>"
 
 
+# Dialects whose INSERT supports ON CONFLICT DO NOTHING
+_UPSERT_INSERTS = {'postgresql': postgresql.insert, 'sqlite': sqlite.insert}
+
+# A toggle only loops when another request changes the same row between two
+# of its statements, so a couple of retries is plenty.
+TOGGLE_ATTEMPTS = 5
+
+
+def _insert_if_absent(model, **values):
+    """INSERT ... ON CONFLICT DO NOTHING on (user_id, opportunity_id); True if a row was added"""
+    insert = _UPSERT_INSERTS[db.session.get_bind().dialect.name]
+    result = db.session.execute(
+        insert(model).values(created_at=datetime.utcnow(), **values)
+        .on_conflict_do_nothing(index_elements=['user_id', 'opportunity_id'])
+    )
+    return result.rowcount == 1
+
+
+def _delete_where(model, *criteria):
+    result = db.session.execute(
+        db.delete(model).where(*criteria).execution_options(synchronize_session=False)
+    )
+    return result.rowcount == 1
+
+
 class Reaction(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'opportunity_id', name='uq_reaction_user_opportunity'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     opportunity_id = db.Column(db.Integer, db.ForeignKey(
@@ -225,14 +349,70 @@ class Reaction(db.Model):
             'user_id': self.user_id,
             'opportunity_id': self.opportunity_id,
             'reaction_type': self.reaction_type,
-            'created_at': self.created_at.isoformat()
+            'created_at': self.created_at
         }
 
+    @staticmethod
+    def toggle(user_id, opportunity_id, reaction_type):
+        """Add, switch or remove a user's reaction inside the caller's transaction.
+
+        Returns ``(action, previous_type)`` where action is 'added', 'changed' or
+        'removed'.  Every step is a single conditional statement guarded by the
+        unique constraint, so parallel requests can neither duplicate the row nor
+        double count it.
+        """
+        mine = (Reaction.user_id == user_id, Reaction.opportunity_id == opportunity_id)
+        for _ in range(TOGGLE_ATTEMPTS):
+            if _insert_if_absent(Reaction, user_id=user_id, opportunity_id=opportunity_id,
+                                 reaction_type=reaction_type):
+                Opportunity.adjust_counters(opportunity_id, reactions={reaction_type: 1})
+                return 'added', None
+            if _delete_where(Reaction, *mine, Reaction.reaction_type == reaction_type):
+                Opportunity.adjust_counters(opportunity_id, reactions={reaction_type: -1})
+                return 'removed', reaction_type
+            previous = Reaction._switch_type(mine, reaction_type)
+            if previous is not None:
+                Opportunity.adjust_counters(
+                    opportunity_id, reactions={previous: -1, reaction_type: 1})
+                return 'changed', previous
+        raise RuntimeError(f"Reaction toggle kept conflicting for opportunity {opportunity_id}")
+
+    @staticmethod
+    def _switch_type(mine, reaction_type):
+        """Change the existing reaction to ``reaction_type``; returns the old type"""
+        table = Reaction.__table__
+        if db.session.get_bind().dialect.name == 'postgresql':
+            # UPDATE ... FROM a snapshot of the same row hands back the old
+            # value in the one statement.  Comparing against the snapshot makes
+            # a concurrently switched row fail the re-check and retry instead.
+            previous = table.alias('previous')
+            return db.session.execute(
+                table.update()
+                .where(*mine, table.c.id == previous.c.id,
+                       table.c.reaction_type == previous.c.reaction_type,
+                       table.c.reaction_type != reaction_type)
+                .values(reaction_type=reaction_type)
+                .returning(previous.c.reaction_type)
+            ).scalar()
+        # Elsewhere compare-and-set: only switch away from the type we read
+        previous = db.session.execute(db.select(table.c.reaction_type).where(*mine)).scalar()
+        if previous is None or previous == reaction_type:
+            return None
+        result = db.session.execute(
+            table.update().where(*mine, table.c.reaction_type == previous)
+            .values(reaction_type=reaction_type)
+        )
+        return previous if result.rowcount == 1 else None
+
     def __repr__(self):
         return f"<Reaction {self.reaction_type} by {self.user.username} on {self.opportunity.title}>"
 
 
 class Bookmark(db.Model):
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'opportunity_id', name='uq_bookmark_user_opportunity'),
+    )
+
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
     opportunity_id = db.Column(db.Integer, db.ForeignKey(
@@ -249,13 +429,113 @@ class Bookmark(db.Model):
             'id': self.id,
             'user_id': self.user_id,
             'opportunity_id': self.opportunity_id,
-            'created_at': self.created_at.isoformat()
+            'created_at': self.created_at
         }
 
+    @staticmethod
+    def toggle(user_id, opportunity_id):
+        """Bookmark or un-bookmark inside the caller's transaction; True if added"""
+        mine = (Bookmark.user_id == user_id, Bookmark.opportunity_id == opportunity_id)
+        for _ in range(TOGGLE_ATTEMPTS):
+            if _insert_if_absent(Bookmark, user_id=user_id, opportunity_id=opportunity_id):
+                Opportunity.adjust_counters(opportunity_id, bookmarks=1)
+                return True
+            if _delete_where(Bookmark, *mine):
+                Opportunity.adjust_counters(opportunity_id, bookmarks=-1)
+                return False
+        raise RuntimeError(f"Bookmark toggle kept conflicting for opportunity {opportunity_id}")
+
     def __repr__(self):
         return f"<Bookmark by {self.user.username} on {self.opportunity.title}>"
 
-# User loader for Flask-Login
-@login.user_loader
-def load_user(user_id):
-    return User.query.get(int(user_id))
\ No newline at end of file
+
+JOB_STATUSES = ('queued', 'running', 'done', 'failed')
+
+
+class Job(db.Model):
+    """A unit of deferred work; see app/jobs.py."""
+
+    id = db.Column(db.Integer, primary_key=True)
+    task = db.Column(db.String(200), nullable=False)
+    # JSON {"args": [...], "kwargs": {...}}
+    payload = db.Column(db.Text, nullable=False)
+    priority = db.Column(db.Integer, default=0, nullable=False)
+    status = db.Column(db.String(10), default='queued', nullable=False)
+    attempts = db.Column(db.Integer, default=0, nullable=False)
+    max_attempts = db.Column(db.Integer, nullable=False)
+    # Retries wait until run_at; a claimed job is leased until locked_until
+    run_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    locked_by = db.Column(db.String(64), nullable=True)
+    locked_until = db.Column(db.DateTime, nullable=True)
+    # Enqueuing the same key twice adds the job once
+    idempotency_key = db.Column(db.String(200), unique=True, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    # Workers take the next queued job by priority (highest first), then
+    # due time, straight off this index; running jobs are found by its prefix
+    __table_args__ = (
+        db.Index('ix_job_ready', 'status', priority.desc(), 'run_at', 'id'),
+    )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'task': self.task,
+            'priority': self.priority,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'run_at': self.run_at,
+            'idempotency_key': self.idempotency_key,
+            'last_error': self.last_error,
+            'created_at': self.created_at,
+            'finished_at': self.finished_at,
+        }
+
+    def __repr__(self):
+        return f"<Job {self.id} {self.task} ({self.status})>"
+
+
+def _load_users(user_ids):
+    # Pull every referenced user into the identity map in one query so the
+    # many-to-one `user` / `approved_by` lookups below do not hit the database
+    user_ids = {user_id for user_id in user_ids if user_id is not None}
+    if user_ids:
+        User.query.filter(User.id.in_(user_ids)).all()
+
+
+def serialize_opportunities(opportunities, expand=()):
+    """Serialize a page of opportunities with a fixed number of queries"""
+    opportunities = list(opportunities)
+    ids = [opp.id for opp in opportunities]
+    _load_users([opp.user_id for opp in opportunities] +
+                [opp.approved_by_id for opp in opportunities])
+    if expand and ids:
+        loaders = []
+        if 'reactions' in expand:
+            loaders.append(selectinload(Opportunity.reactions))
+        if 'bookmarks' in expand:
+            loaders.append(selectinload(Opportunity.bookmarks))
+        if loaders:
+            Opportunity.query.filter(Opportunity.id.in_(ids)).options(*loaders).all()
+    return [opp.to_dict(expand=expand) for opp in opportunities]
+
+
+def serialize_reports(reports):
+    """Serialize reports, resolving reporters and targets in batches"""
+    reports = list(reports)
+    opportunity_ids = {report.reported_opportunity_id for report in reports
+                       if report.reported_opportunity_id}
+    opportunities = Opportunity.query.filter(
+        Opportunity.id.in_(opportunity_ids)).all() if opportunity_ids else []
+    _load_users([report.reporter_id for report in reports] +
+                [report.reported_user_id for report in reports])
+    summaries = {opp['id']: opp for opp in serialize_opportunities(opportunities)}
+    return [report.to_dict(reported_opportunity=summaries.get(report.reported_opportunity_id))
+            for report in reports]
+
+
+# The Flask-Login user loader is in app/user_cache.py; it answers from
+# cached snapshots of these rows.
@@ -0,0 +1,314 @@
+# app/moderation.py
+"""Leased moderation queue for pending opportunities.
+
+Pending opportunities are worked oldest first.  A moderator claims a batch,
+which stamps ``claimed_by_id`` and ``claim_expires_at`` on the rows in one
+UPDATE; other moderators' claims then skip those rows, so concurrent
+moderators get disjoint work.  Nothing has to sweep expired leases: a claim
+whose ``claim_expires_at`` has passed simply counts as available again.
+
+The bulk actions decide a whole list of ids with one set-based statement per
+table and report an outcome per id.  Each batch sends a single
+``moderation_performed`` signal, which writes one audit log line.
+
+Deleting a user takes everything they posted and reacted to with them, so it
+runs on the job queue (``delete_user``) rather than in the request.
+"""
+import logging
+from datetime import datetime, timedelta
+
+from flask import current_app
+
+from app import db
+from app.jobs import job
+from app.models import REACTION_TYPES, Bookmark, Opportunity, PasswordResetToken, Reaction, Report
+from app.models import User, opportunity_tags
+from app.signals import moderation_performed, notify_feed_changed
+from app.user_cache import user_cache
+
+audit_log = logging.getLogger('app.moderation.audit')
+
+QUEUE_ORDER = [(Opportunity.created_at, False), (Opportunity.id, False)]
+
+
+class LeaseConflict(Exception):
+    """The opportunity is leased to another moderator."""
+
+    def __init__(self, opportunity):
+        super().__init__(f"Opportunity {opportunity.id} is claimed by another moderator")
+        self.opportunity = opportunity
+
+
+def pending():
+    return Opportunity.query.filter(Opportunity.is_approved.is_(False))
+
+
+def available(now=None):
+    """Criterion for rows nobody holds a live lease on"""
+    now = now or datetime.utcnow()
+    return db.or_(Opportunity.claimed_by_id.is_(None), Opportunity.claim_expires_at <= now)
+
+
+def held_by(user_id, now=None):
+    """Criterion for rows ``user_id`` holds a live lease on"""
+    now = now or datetime.utcnow()
+    return db.and_(Opportunity.claimed_by_id == user_id, Opportunity.claim_expires_at > now)
+
+
+def lease_length(seconds=None):
+    """Requested lease length, clamped to ``MODERATION_MAX_LEASE_SECONDS``"""
+    if seconds is None:
+        seconds = current_app.config['MODERATION_LEASE_SECONDS']
+    maximum = current_app.config['MODERATION_MAX_LEASE_SECONDS']
+    return timedelta(seconds=max(1, min(int(seconds), maximum)))
+
+
+def claim(user_id, count, lease_seconds=None):
+    """Lease up to ``count`` of the oldest available pending opportunities.
+
+    Returns the claimed opportunities, oldest first.  Commits.
+    """
+    now = datetime.utcnow()
+    expires_at = now + lease_length(lease_seconds)
+    candidates = (
+        db.select(Opportunity.id)
+        .where(Opportunity.is_approved.is_(False), available(now))
+        .order_by(*[column for column, _ in QUEUE_ORDER])
+        .limit(count)
+        # Postgres: concurrent claimers skip each other's rows instead of
+        # queueing behind them.  SQLite serializes writers and ignores this.
+        .with_for_update(skip_locked=True)
+    )
+    db.session.execute(
+        db.update(Opportunity)
+        # Availability is checked again on the row being updated, so a row
+        # claimed by someone else since the subquery ran is left alone
+        .where(Opportunity.id.in_(candidates.scalar_subquery()), available(now))
+        .values(claimed_by_id=user_id, claim_expires_at=expires_at)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return (
+        pending()
+        .filter(Opportunity.claimed_by_id == user_id, Opportunity.claim_expires_at == expires_at)
+        .order_by(*[column for column, _ in QUEUE_ORDER])
+        .all()
+    )
+
+
+def release(user_id, ids=None):
+    """Give back the caller's leases (all of them unless ``ids``); commits"""
+    query = db.update(Opportunity).where(Opportunity.claimed_by_id == user_id)
+    if ids is not None:
+        query = query.where(Opportunity.id.in_(ids))
+    result = db.session.execute(
+        query.values(claimed_by_id=None, claim_expires_at=None)
+        .execution_options(synchronize_session=False)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def check_lease(opportunity, user_id):
+    """Raise LeaseConflict if someone else holds a live lease on ``opportunity``"""
+    if (opportunity.claimed_by_id not in (None, user_id)
+            and opportunity.claim_expires_at is not None
+            and opportunity.claim_expires_at > datetime.utcnow()):
+        raise LeaseConflict(opportunity)
+
+
+def lease_info(opportunity):
+    return {
+        'claimed_by_id': opportunity.claimed_by_id,
+        'claim_expires_at': opportunity.claim_expires_at,
+    }
+
+
+# --- Bulk actions -------------------------------------------------------------
+
+def _leased_to_other(user_id, now):
+    return db.and_(Opportunity.claimed_by_id.is_not(None), Opportunity.claimed_by_id != user_id,
+                   Opportunity.claim_expires_at > now)
+
+
+def _lock_opportunities(ids, user_id, now):
+    """Lock the rows and read what each bulk action needs to classify them"""
+    return db.session.execute(
+        db.select(Opportunity.id, Opportunity.is_approved,
+                  _leased_to_other(user_id, now).label('leased'))
+        .where(Opportunity.id.in_(ids))
+        .with_for_update()
+    ).all()
+
+
+def _delete_opportunities(ids):
+    """Delete opportunities and the rows that depend on them"""
+    for statement in (
+        db.update(Report).where(Report.reported_opportunity_id.in_(ids))
+        .values(reported_opportunity_id=None),
+        db.delete(Reaction).where(Reaction.opportunity_id.in_(ids)),
+        db.delete(Bookmark).where(Bookmark.opportunity_id.in_(ids)),
+        db.delete(opportunity_tags).where(opportunity_tags.c.opportunity_id.in_(ids)),
+        db.delete(Opportunity).where(Opportunity.id.in_(ids)),
+    ):
+        db.session.execute(statement.execution_options(synchronize_session=False))
+
+
+def bulk_approve(user_id, ids):
+    now = datetime.utcnow()
+    results, approve = {}, []
+    for row in _lock_opportunities(ids, user_id, now):
+        if row.is_approved:
+            results[row.id] = 'already_approved'
+        elif row.leased:
+            results[row.id] = 'claimed'
+        else:
+            results[row.id] = 'approved'
+            approve.append(row.id)
+    if approve:
+        db.session.execute(
+            db.update(Opportunity).where(Opportunity.id.in_(approve))
+            .values(is_approved=True, approved_by_id=user_id,
+                    claimed_by_id=None, claim_expires_at=None)
+            .execution_options(synchronize_session=False)
+        )
+    return results, approve
+
+
+def bulk_reject(user_id, ids):
+    now = datetime.utcnow()
+    results, reject, feed = {}, [], []
+    for row in _lock_opportunities(ids, user_id, now):
+        if row.leased:
+            results[row.id] = 'claimed'
+            continue
+        results[row.id] = 'rejected'
+        reject.append(row.id)
+        if row.is_approved:
+            feed.append(row.id)
+    if reject:
+        _delete_opportunities(reject)
+    return results, feed
+
+
+def bulk_delete(user_id, ids):
+    rows = _lock_opportunities(ids, user_id, datetime.utcnow())
+    if rows:
+        _delete_opportunities([row.id for row in rows])
+    return ({row.id: 'deleted' for row in rows},
+            [row.id for row in rows if row.is_approved])
+
+
+def bulk_mark_reviewed(user_id, ids):
+    rows = db.session.execute(
+        db.select(Report.id, Report.is_reviewed).where(Report.id.in_(ids)).with_for_update()
+    ).all()
+    pending_ids = [row.id for row in rows if not row.is_reviewed]
+    if pending_ids:
+        db.session.execute(
+            db.update(Report).where(Report.id.in_(pending_ids)).values(is_reviewed=True)
+            .execution_options(synchronize_session=False)
+        )
+    return ({row.id: 'already_reviewed' if row.is_reviewed else 'reviewed' for row in rows},
+            [])
+
+
+# action -> function(user_id, ids) returning ({id: outcome}, feed-visible ids)
+BULK_ACTIONS = {
+    'approve': bulk_approve,
+    'reject': bulk_reject,
+    'delete': bulk_delete,
+    'mark_reviewed': bulk_mark_reviewed,
+}
+
+
+def perform_bulk(action, user_id, ids):
+    """Run one bulk action in a single transaction; returns {id: outcome}.
+
+    Ids that do not exist come back as ``not_found``.  Commits, then sends
+    one ``feed_changed`` for the ids the public feed can see and one
+    ``moderation_performed`` for the whole batch.
+    """
+    ids = list(dict.fromkeys(ids))
+    results, feed_ids = BULK_ACTIONS[action](user_id, ids)
+    db.session.commit()
+
+    results = {id: results.get(id, 'not_found') for id in ids}
+    app = current_app._get_current_object()
+    if feed_ids:
+        notify_feed_changed(app, feed_ids)
+    moderation_performed.send(app, action=action, moderator_id=user_id, results=results)
+    return results
+
+
+@moderation_performed.connect
+def _audit(app, action, moderator_id, results, **kwargs):
+    outcomes = {}
+    for id, outcome in results.items():
+        outcomes.setdefault(outcome, []).append(id)
+    audit_log.info('moderator=%s action=%s %s', moderator_id, action,
+                   ' '.join(f'{outcome}={ids}' for outcome, ids in sorted(outcomes.items())))
+
+
+# --- Deleting users -------------------------------------------------------------
+
+@job(priority=5)
+def delete_user(user_id, moderator_id):
+    """Delete a user and every row that depends on them.
+
+    Their opportunities go as in a bulk delete, their reactions and
+    bookmarks come off other opportunities' counters, reports they made are
+    removed and reports about them are kept without the user.  The task
+    commits by itself so the caches hear about the change only once it is
+    in; for a user who is already gone it does nothing.
+    """
+    if db.session.get(User, user_id) is None:
+        return
+    owned = db.session.execute(
+        db.select(Opportunity.id, Opportunity.is_approved).where(Opportunity.user_id == user_id)
+    ).all()
+    engaged = set(db.session.execute(
+        db.select(Reaction.opportunity_id).where(Reaction.user_id == user_id)
+        .union(db.select(Bookmark.opportunity_id).where(Bookmark.user_id == user_id))
+    ).scalars())
+
+    if owned:
+        _delete_opportunities([row.id for row in owned])
+    # One reaction and one bookmark per user and opportunity, so each
+    # counter drops by one
+    statements = [
+        db.update(Opportunity)
+        .where(Opportunity.id.in_(db.select(Reaction.opportunity_id)
+                                  .where(Reaction.user_id == user_id,
+                                         Reaction.reaction_type == reaction_type)))
+        .values({f'{reaction_type}_count': getattr(Opportunity, f'{reaction_type}_count') - 1})
+        for reaction_type in REACTION_TYPES
+    ]
+    statements += [
+        db.update(Opportunity)
+        .where(Opportunity.id.in_(db.select(Bookmark.opportunity_id).where(Bookmark.user_id == user_id)))
+        .values(bookmark_count=Opportunity.bookmark_count - 1),
+        db.delete(Reaction).where(Reaction.user_id == user_id),
+        db.delete(Bookmark).where(Bookmark.user_id == user_id),
+        db.update(Opportunity).where(Opportunity.approved_by_id == user_id).values(approved_by_id=None),
+        db.update(Opportunity).where(Opportunity.claimed_by_id == user_id)
+        .values(claimed_by_id=None, claim_expires_at=None),
+        db.delete(Report).where(Report.reporter_id == user_id),
+        db.update(Report).where(Report.reported_user_id == user_id).values(reported_user_id=None),
+        db.delete(PasswordResetToken).where(PasswordResetToken.user_id == user_id),
+        db.delete(User).where(User.id == user_id),
+    ]
+    for statement in statements:
+        db.session.execute(statement.execution_options(synchronize_session=False))
+    db.session.commit()
+
+    app = current_app._get_current_object()
+    user_cache.invalidate(user_id)
+    feed_ids = [row.id for row in owned if row.is_approved]
+    if feed_ids:
+        notify_feed_changed(app, feed_ids)
+    engaged.difference_update(row.id for row in owned)
+    if engaged:
+        notify_feed_changed(app, engaged, membership=False)
+    audit_log.info('moderator=%s action=delete_user user=%s opportunities=%s',
+                   moderator_id, user_id, [row.id for row in owned])
@@ -0,0 +1,165 @@
+# app/outbox.py
+"""Outgoing mail, sent by the job workers off the request path.
+
+A request queues a message with ``outbox.queue(subject, recipients, body)``.
+That enqueues a ``send_mail`` job (see app/jobs.py) in the caller's
+transaction, so the mail goes out only if the request's own changes commit,
+and the request never waits on an SMTP server.
+
+``flask jobs work`` sends it.  A worker leases up to ``JOBS_BATCH_SIZE`` jobs
+at a time, and every ``send_mail`` it runs goes over the same SMTP
+connection, which stays open from one batch to the next.  The handshake
+(connect, STARTTLS, AUTH) is paid once per busy spell rather than per
+message.  The worker closes the connection when no job is due.  A worker
+holds at most one connection, so the number of workers bounds how many
+connections the app keeps open to the mail server.  ``MAIL_MAX_EMAILS``
+still makes Flask-Mail reconnect after that many messages.
+
+Connection errors and 4xx replies are transient.  The job raises and the
+queue retries it with its usual backoff.  5xx replies and malformed messages
+raise ``PermanentFailure``, which fails the job at once.  A worker that dies
+mid-send can send a message twice, but a crash never loses one.
+"""
+import smtplib
+import threading
+import traceback
+
+from flask import current_app
+from flask_mail import Connection, Message
+
+from app import db
+from app.jobs import PermanentFailure, job
+from app.models import JOB_STATUSES, Job
+from app.signals import worker_idle
+
+# Each worker thread's SMTP connection, kept between send_mail jobs
+_local = threading.local()
+
+
+def is_transient(error):
+    """True if sending again later might succeed"""
+    if isinstance(error, smtplib.SMTPRecipientsRefused):
+        return any(code < 500 for code, _ in error.recipients.values())
+    if isinstance(error, smtplib.SMTPResponseException):
+        return error.smtp_code < 500
+    return isinstance(error, (smtplib.SMTPException, OSError))
+
+
+def keeps_connection(error):
+    """True if the SMTP session is still usable after ``error``"""
+    # smtplib resets the transaction after these; 421 means the server is closing
+    return (isinstance(error, (smtplib.SMTPRecipientsRefused, smtplib.SMTPSenderRefused,
+                               smtplib.SMTPDataError))
+            and getattr(error, 'smtp_code', None) != 421)
+
+
+class SMTPConnection(Connection):
+    """Flask-Mail's connection, opened on demand and kept between messages."""
+
+    def __init__(self, mail, timeout):
+        super().__init__(mail)
+        self.timeout = timeout
+        self.host = None
+        self.num_emails = 0
+
+    def open(self):
+        if self.host is None and not self.mail.suppress:
+            self.host = self.configure_host()
+
+    def configure_host(self):
+        # As Flask-Mail's, but with a socket timeout
+        smtp = smtplib.SMTP_SSL if self.mail.use_ssl else smtplib.SMTP
+        host = smtp(self.mail.server, self.mail.port, timeout=self.timeout)
+        try:
+            host.set_debuglevel(int(self.mail.debug))
+            if self.mail.use_tls:
+                host.starttls()
+            if self.mail.username and self.mail.password:
+                host.login(self.mail.username, self.mail.password)
+        except BaseException:
+            host.close()
+            raise
+        return host
+
+    def close(self):
+        host, self.host = self.host, None
+        self.num_emails = 0
+        if host is not None:
+            try:
+                host.quit()
+            except (smtplib.SMTPException, OSError):
+                host.close()
+
+
+def _connection():
+    """This thread's connection to the current app's mail server"""
+    mail = current_app.extensions['mail']
+    connection = getattr(_local, 'connection', None)
+    if connection is None or connection.mail is not mail:
+        close_connection()
+        connection = _local.connection = SMTPConnection(mail, current_app.config['MAIL_OUTBOX_TIMEOUT'])
+    return connection
+
+
+def close_connection():
+    """Close this thread's connection, if it has one open"""
+    connection = getattr(_local, 'connection', None)
+    if connection is not None:
+        connection.close()
+
+
+@worker_idle.connect
+def _worker_idle(app, **kwargs):
+    # Nothing left to send: don't hold an idle connection open
+    close_connection()
+
+
+@job
+def send_mail(subject, recipients, body, html=None, sender=None):
+    """Send one message over this thread's reused connection"""
+    connection = _connection()
+    try:
+        connection.open()
+        connection.send(Message(subject=subject, recipients=recipients, body=body,
+                                html=html, sender=sender))
+    except Exception as error:
+        if not keeps_connection(error):
+            connection.close()
+        if not is_transient(error):
+            raise PermanentFailure(_describe(error)) from error
+        raise
+
+
+class Outbox:
+    """Queues outgoing mail and reports on it."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('MAIL_OUTBOX_TIMEOUT', 30)
+
+    def queue(self, subject, recipients, body, html=None, sender=None, countdown=0):
+        """Enqueue a message in the caller's transaction; returns its job id"""
+        if isinstance(recipients, str):
+            recipients = [recipients]
+        if not recipients:
+            raise ValueError("A message needs at least one recipient")
+        return send_mail.enqueue((subject, list(recipients), body),
+                                 {'html': html, 'sender': sender}, countdown=countdown)
+
+    def stats(self):
+        """Count ``send_mail`` jobs by status"""
+        counts = dict(db.session.execute(
+            db.select(Job.status, db.func.count())
+            .where(Job.task == send_mail.name).group_by(Job.status)
+        ).all())
+        return {status: counts.get(status, 0) for status in JOB_STATUSES}
+
+
+outbox = Outbox()
+
+
+def _describe(error):
+    return ''.join(traceback.format_exception_only(type(error), error)).strip()
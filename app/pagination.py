@@ -0,0 +1,129 @@
+# app/pagination.py
+"""Keyset (cursor) pagination and cached result counts.
+
+A cursor is the sort key of the last row a client has seen, serialized as
+url-safe base64 JSON.  The next page is "everything strictly after that key",
+which the database answers with an index range scan instead of walking and
+discarding OFFSET rows.
+"""
+import base64
+import binascii
+import json
+from datetime import datetime
+
+from flask import current_app, request
+from sqlalchemy import and_, or_
+
+from app.cache import LocalCache
+from app.signals import feed_changed
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    payload = [{'dt': value.isoformat()} if isinstance(value, datetime) else value
+               for value in values]
+    raw = json.dumps(payload, separators=(',', ':')).encode()
+    return base64.urlsafe_b64encode(raw).rstrip(b'=').decode()
+
+
+def decode_cursor(cursor, size):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        if not isinstance(payload, list) or len(payload) != size:
+            raise InvalidCursor(cursor)
+        return [datetime.fromisoformat(value['dt']) if isinstance(value, dict) else value
+                for value in payload]
+    except (binascii.Error, ValueError, TypeError, KeyError):
+        raise InvalidCursor(cursor)
+
+
+def keyset_condition(keys, values):
+    """Build "row comes after values" for a list of (column, descending) keys.
+
+    Expands to (a > x) OR (a = x AND b > y) OR ... so that mixed sort
+    directions work on every backend.
+    """
+    clauses = []
+    for position, (column, descending) in enumerate(keys):
+        equal = [keys[i][0] == values[i] for i in range(position)]
+        beyond = column < values[position] if descending else column > values[position]
+        clauses.append(and_(*equal, beyond))
+    return or_(*clauses)
+
+
+def keyset_page(query, keys, per_page, after=None):
+    """Fetch one page of ``query`` ordered by ``keys``.
+
+    Returns ``(items, next_cursor)``; ``next_cursor`` is None on the last page.
+    """
+    columns = [column for column, _ in keys]
+    if after:
+        query = query.filter(keyset_condition(keys, decode_cursor(after, len(keys))))
+    query = query.order_by(*[column.desc() if descending else column.asc()
+                             for column, descending in keys])
+    # Fetch one extra row to learn whether another page exists
+    rows = query.add_columns(*columns).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    items = [row[0] for row in rows]
+    next_cursor = encode_cursor(list(rows[-1][1:])) if has_more else None
+    return items, next_cursor
+
+
+def get_page_size():
+    """Read ``per_page`` from the request, clamped to the configured bounds"""
+    default = current_app.config.get('FEED_PAGE_SIZE', 5)
+    maximum = current_app.config.get('FEED_MAX_PAGE_SIZE', 50)
+    per_page = request.args.get('per_page', default, type=int)
+    return max(1, min(per_page, maximum))
+
+
+class CountCache:
+    """Remembers ``COUNT(*)`` results per filter combination.
+
+    Entries are dropped whenever the feed changes (see ``app.signals``) and
+    also expire after ``FEED_COUNT_TTL`` seconds, which bounds staleness when
+    another worker process made the change.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('FEED_COUNT_TTL', 300)
+        app.config.setdefault('FEED_COUNT_MAX_ENTRIES', 1024)
+        app.extensions['feed_counts'] = LocalCache(
+            max_entries=app.config['FEED_COUNT_MAX_ENTRIES'],
+            ttl=app.config['FEED_COUNT_TTL'],
+        )
+
+    @staticmethod
+    def _cache(app=None):
+        return (app or current_app).extensions['feed_counts']
+
+    def get_or_count(self, key, query):
+        cache = self._cache()
+        total = cache.get(key)
+        if total is None:
+            generation = cache.generation
+            total = query.order_by(None).count()
+            cache.set(key, total, generation=generation)
+        return total
+
+    def clear(self, app=None):
+        self._cache(app).clear()
+
+
+feed_counts = CountCache()
+
+
+@feed_changed.connect
+def _clear_feed_counts(app, membership=True, **kwargs):
+    # Engagement-only changes never alter which rows match a filter
+    if membership:
+        feed_counts.clear(app)
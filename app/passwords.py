@@ -0,0 +1,165 @@
+# app/passwords.py
+"""Password hashing off the request thread.
+
+A scrypt or PBKDF2 hash is deliberately slow (tens of milliseconds of CPU and,
+for scrypt, 32 MiB of memory at the default cost).  ``User.set_password`` and
+``check_password`` hand that work to a small per-app pool of
+``PASSWORD_HASH_WORKERS`` workers, so a burst of logins or registrations uses
+at most that many cores, and other requests on the worker keep running.
+hashlib's scrypt and PBKDF2 release the GIL, so pool threads hash in
+parallel.  Under eventlet or gevent the pool's threads are green as well; set
+``PASSWORD_HASH_EXECUTOR=process`` there.
+
+At most ``PASSWORD_HASH_QUEUE`` more hashes may wait for a worker.  Past that
+the caller gets ``PasswordHashBusy``, which the routes turn into a 503 with
+``Retry-After`` rather than letting requests pile up behind the pool.
+``PASSWORD_HASH_WORKERS=0`` hashes on the calling thread, unbounded.
+
+``PASSWORD_HASH_METHOD`` is a Werkzeug method string (``scrypt:N:r:p`` or
+``pbkdf2:hash:iterations``) and ``PASSWORD_SALT_LENGTH`` its salt length.
+Changing either leaves existing hashes valid; ``needs_rehash`` spots them
+and login stores a fresh hash while it has the password at hand.
+"""
+import multiprocessing
+import threading
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from flask import current_app, has_app_context
+from werkzeug.security import DEFAULT_PBKDF2_ITERATIONS, check_password_hash, generate_password_hash
+
+DEFAULT_METHOD = 'scrypt:32768:8:1'
+DEFAULT_SALT_LENGTH = 16
+EXECUTORS = ('thread', 'process')
+
+
+class PasswordHashBusy(Exception):
+    """Every password hashing worker is busy and the queue is full."""
+
+
+def normalize_method(method):
+    """``method`` spelled out the way Werkzeug records it in a hash"""
+    name, *args = method.split(':')
+    try:
+        if name == 'scrypt' and len(args) in (0, 3):
+            n, r, p = map(int, args or (2 ** 15, 8, 1))
+            return f'scrypt:{n}:{r}:{p}'
+        if name == 'pbkdf2' and len(args) <= 2:
+            hash_name = args[0] if args else 'sha256'
+            iterations = int(args[1]) if len(args) == 2 else DEFAULT_PBKDF2_ITERATIONS
+            return f'pbkdf2:{hash_name}:{iterations}'
+    except ValueError:
+        pass
+    raise ValueError(f"Invalid PASSWORD_HASH_METHOD {method!r}")
+
+
+class HashPool:
+    """Runs hashing calls on a bounded pool, refusing work when it is full."""
+
+    def __init__(self, workers, queue, executor='thread'):
+        self.workers = workers
+        self.limit = workers + queue
+        self.executor = executor
+        self._executor = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.rejected = 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                # Started on first use so worker processes forked by serve.py
+                # each get their own
+                if self.executor == 'process':
+                    self._executor = ProcessPoolExecutor(
+                        self.workers, mp_context=multiprocessing.get_context('spawn'))
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        self.workers, thread_name_prefix='password-hash')
+            return self._executor
+
+    def run(self, fn, *args):
+        """``fn(*args)`` on a pool worker; raises ``PasswordHashBusy``"""
+        if not self.workers:
+            return fn(*args)
+        with self._lock:
+            if self.pending >= self.limit:
+                self.rejected += 1
+                raise PasswordHashBusy()
+            self.pending += 1
+        try:
+            return self._get_executor().submit(fn, *args).result()
+        finally:
+            with self._lock:
+                self.pending -= 1
+                self.completed += 1
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown()
+
+    def stats(self):
+        return {
+            'workers': self.workers,
+            'limit': self.limit,
+            'pending': self.pending,
+            'completed': self.completed,
+            'rejected': self.rejected,
+        }
+
+
+class PasswordHasher:
+    """Per-app hash parameters and ``HashPool``."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('PASSWORD_HASH_METHOD', DEFAULT_METHOD)
+        app.config.setdefault('PASSWORD_SALT_LENGTH', DEFAULT_SALT_LENGTH)
+        app.config.setdefault('PASSWORD_HASH_WORKERS', 2)
+        app.config.setdefault('PASSWORD_HASH_QUEUE', 16)
+        app.config.setdefault('PASSWORD_HASH_EXECUTOR', 'thread')
+        if app.config['PASSWORD_HASH_EXECUTOR'] not in EXECUTORS:
+            raise ValueError(f"PASSWORD_HASH_EXECUTOR must be one of {', '.join(EXECUTORS)}")
+        app.extensions['passwords'] = {
+            'method': normalize_method(app.config['PASSWORD_HASH_METHOD']),
+            'salt_length': app.config['PASSWORD_SALT_LENGTH'],
+            'pool': HashPool(app.config['PASSWORD_HASH_WORKERS'],
+                             app.config['PASSWORD_HASH_QUEUE'],
+                             app.config['PASSWORD_HASH_EXECUTOR']),
+        }
+
+    @staticmethod
+    def _state(app=None):
+        return (app or current_app).extensions['passwords']
+
+    def hash(self, password):
+        """A new hash of ``password`` with the configured parameters"""
+        if not has_app_context():
+            # Scripts outside the app hash inline with the defaults
+            return generate_password_hash(password, DEFAULT_METHOD, DEFAULT_SALT_LENGTH)
+        state = self._state()
+        return state['pool'].run(generate_password_hash, password,
+                                 state['method'], state['salt_length'])
+
+    def verify(self, pwhash, password):
+        if not has_app_context():
+            return check_password_hash(pwhash, password)
+        return self._state()['pool'].run(check_password_hash, pwhash, password)
+
+    def needs_rehash(self, pwhash):
+        """True if ``pwhash`` was made with other than the configured parameters"""
+        state = self._state()
+        method, _, rest = pwhash.partition('$')
+        salt, _, _ = rest.partition('$')
+        return method != state['method'] or len(salt) != state['salt_length']
+
+    def stats(self):
+        return self._state()['pool'].stats()
+
+
+password_hasher = PasswordHasher()
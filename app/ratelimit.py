@@ -0,0 +1,314 @@
+# app/ratelimit.py
+"""Per-user and per-IP quotas, and admission control under load.
+
+Quotas
+    Every request is charged a cost against two token buckets: one for the
+    client IP and, once logged in, one for the user.  A bucket refills at
+    ``RATE_LIMIT_*_RATE`` tokens a second up to ``RATE_LIMIT_*_BURST``.
+    Views opt into a different cost with ``@limit(cost)``; a request the
+    buckets cannot pay for gets a 429 with ``Retry-After`` and is charged
+    to none of them.
+
+    Buckets are kept in GCRA form: a single "theoretical arrival time"
+    per key, which is the moment the bucket will be full again.  A key whose
+    time has passed holds a full bucket and can be forgotten, so the local
+    backend stays small and drops idle keys first when it reaches
+    ``RATE_LIMIT_MAX_KEYS``.  Storage is looked up by name in ``BACKENDS``
+    (``RATE_LIMIT_BACKEND``), so a backend shared between worker
+    processes (Redis, memcached) can be registered without touching the
+    routes.  With the local backend each worker process enforces its own
+    quota.
+
+Admission control
+    At most ``ADMISSION_MAX_CONCURRENT`` requests run at once; beyond that
+    requests get a 503.  Views marked ``priority='low'`` (search and other
+    expensive reads) are shed earlier: once ``ADMISSION_LOW_PRIORITY_MAX``
+    requests are in flight, or while the moving average of request latency
+    is above ``ADMISSION_SHED_LATENCY_MS``.  Shedding them first leaves
+    capacity for cheap requests and for writes.  The average decays with
+    time as well, so shedding stops once a slow spell is over even if only
+    low priority requests are arriving.
+
+Behind a reverse proxy, ``request.remote_addr`` is the proxy unless the app
+is wrapped in Werkzeug's ``ProxyFix``.
+"""
+import math
+import threading
+import time
+from collections import OrderedDict
+
+from flask import current_app, g, jsonify, request
+from flask_login import current_user
+
+PRIORITIES = ('low', 'normal')
+# Weight of the newest request in the latency moving average
+LATENCY_SMOOTHING = 0.2
+# Seconds for the latency average to halve on its own.  Shed requests never
+# report a latency, so without this a spike could shed low priority work
+# until some other request happened to finish quickly.
+LATENCY_HALF_LIFE = 5.0
+
+
+def limit(cost=1, priority='normal'):
+    """Mark a view's quota cost and admission priority.
+
+    Either may be a callable taking no arguments, evaluated per request
+    (for views whose cost depends on their arguments).
+    """
+    if not callable(priority) and priority not in PRIORITIES:
+        raise ValueError(f"priority must be one of {', '.join(PRIORITIES)}")
+
+    def decorate(view):
+        view.rate_limit = (cost, priority)
+        return view
+    return decorate
+
+
+class RateLimitBackend:
+    """Interface every quota backend implements."""
+
+    def consume(self, key, cost, rate, burst):
+        """Take ``cost`` tokens from ``key``'s bucket if it holds them.
+
+        Returns ``(allowed, retry_after_seconds)``; nothing is taken from a
+        bucket that cannot pay.
+        """
+        raise NotImplementedError
+
+    def refund(self, key, cost, rate):
+        """Give back ``cost`` tokens ``consume`` took from ``key``'s bucket"""
+        raise NotImplementedError
+
+    def clear(self):
+        raise NotImplementedError
+
+    def stats(self):
+        return {}
+
+
+class NullLimiter(RateLimitBackend):
+    """Allows everything; used to switch quotas off."""
+
+    def consume(self, key, cost, rate, burst):
+        return True, 0.0
+
+    def refund(self, key, cost, rate):
+        pass
+
+    def clear(self):
+        pass
+
+
+class LocalLimiter(RateLimitBackend):
+    """Thread-safe GCRA buckets for this process, bounded by key count."""
+
+    def __init__(self, max_keys=100000, clock=time.monotonic):
+        self.max_keys = max_keys
+        self.clock = clock
+        self._arrivals = OrderedDict()   # key -> theoretical arrival time
+        self._lock = threading.Lock()
+        self.allowed = 0
+        self.limited = 0
+
+    def __len__(self):
+        return len(self._arrivals)
+
+    def consume(self, key, cost, rate, burst):
+        now = self.clock()
+        with self._lock:
+            # Each token is 1/rate seconds of refill; a full bucket is
+            # burst/rate seconds ahead of the arrival time
+            arrival = max(self._arrivals.get(key, now), now) + cost / rate
+            wait = arrival - now - burst / rate
+            if wait > 0:
+                self.limited += 1
+                return False, wait
+            self._arrivals[key] = arrival
+            self._arrivals.move_to_end(key)
+            self.allowed += 1
+            if len(self._arrivals) > self.max_keys:
+                self._shrink(now)
+            return True, 0.0
+
+    def refund(self, key, cost, rate):
+        now = self.clock()
+        with self._lock:
+            arrival = self._arrivals.get(key)
+            if arrival is None:
+                return
+            arrival -= cost / rate
+            if arrival <= now:
+                # Full again: nothing worth keeping
+                del self._arrivals[key]
+            else:
+                self._arrivals[key] = arrival
+
+    def _shrink(self, now):
+        # Keys whose bucket has refilled carry no information
+        for key in [key for key, arrival in self._arrivals.items() if arrival <= now]:
+            del self._arrivals[key]
+        # Otherwise the least recently charged go; they get a full bucket
+        while len(self._arrivals) > self.max_keys:
+            self._arrivals.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._arrivals.clear()
+
+    def stats(self):
+        return {
+            'keys': len(self._arrivals),
+            'max_keys': self.max_keys,
+            'allowed': self.allowed,
+            'limited': self.limited,
+        }
+
+
+BACKENDS = {
+    'local': lambda app: LocalLimiter(app.config['RATE_LIMIT_MAX_KEYS']),
+    'null': lambda app: NullLimiter(),
+}
+
+
+class Admission:
+    """Counts requests in flight and the moving average of their latency."""
+
+    def __init__(self, max_concurrent, low_priority_max, shed_latency_ms, clock=time.monotonic):
+        self.max_concurrent = max_concurrent
+        self.low_priority_max = low_priority_max
+        self.shed_latency = shed_latency_ms / 1000
+        self.clock = clock
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.latency = 0.0
+        self._latency_at = clock()
+        self.shed = {priority: 0 for priority in PRIORITIES}
+
+    def _decay(self):
+        # Called with the lock held
+        now = self.clock()
+        self.latency *= 0.5 ** ((now - self._latency_at) / LATENCY_HALF_LIFE)
+        self._latency_at = now
+
+    def enter(self, priority):
+        """Admit a request, or return False if it should be shed"""
+        with self._lock:
+            self._decay()
+            if self.max_concurrent and self.in_flight >= self.max_concurrent:
+                admit = False
+            elif priority == 'low':
+                admit = not (
+                    (self.low_priority_max and self.in_flight >= self.low_priority_max)
+                    or (self.shed_latency and self.latency > self.shed_latency))
+            else:
+                admit = True
+            if admit:
+                self.in_flight += 1
+            else:
+                self.shed[priority] += 1
+            return admit
+
+    def leave(self, seconds):
+        with self._lock:
+            self.in_flight -= 1
+            self._decay()
+            self.latency += LATENCY_SMOOTHING * (seconds - self.latency)
+
+    def stats(self):
+        return {
+            'in_flight': self.in_flight,
+            'max_concurrent': self.max_concurrent,
+            'low_priority_max': self.low_priority_max,
+            'latency_ms': round(self.latency * 1000, 1),
+            'shed': dict(self.shed),
+        }
+
+
+def _rejected(status, message, retry_after):
+    response = jsonify({"error": message})
+    response.headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return response, status
+
+
+class RateLimiter:
+    """Charges quotas and applies admission control around every request."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('RATE_LIMIT_BACKEND', 'local')
+        app.config.setdefault('RATE_LIMIT_MAX_KEYS', 100000)
+        app.config.setdefault('RATE_LIMIT_USER_RATE', 2.0)
+        app.config.setdefault('RATE_LIMIT_USER_BURST', 120)
+        app.config.setdefault('RATE_LIMIT_IP_RATE', 10.0)
+        app.config.setdefault('RATE_LIMIT_IP_BURST', 600)
+        app.config.setdefault('ADMISSION_MAX_CONCURRENT', 48)
+        app.config.setdefault('ADMISSION_LOW_PRIORITY_MAX', 16)
+        app.config.setdefault('ADMISSION_SHED_LATENCY_MS', 1000)
+        # Running init_app again applies new settings; the hooks stay single
+        registered = 'ratelimit' in app.extensions
+        app.extensions['ratelimit'] = {
+            'backend': BACKENDS[app.config['RATE_LIMIT_BACKEND']](app),
+            'admission': Admission(app.config['ADMISSION_MAX_CONCURRENT'],
+                                   app.config['ADMISSION_LOW_PRIORITY_MAX'],
+                                   app.config['ADMISSION_SHED_LATENCY_MS']),
+        }
+        if not registered:
+            app.before_request(self._before_request)
+            app.teardown_request(self._teardown_request)
+
+    @staticmethod
+    def _state(app=None):
+        return (app or current_app).extensions['ratelimit']
+
+    @property
+    def backend(self):
+        return self._state()['backend']
+
+    @staticmethod
+    def _view_limits():
+        view = current_app.view_functions.get(request.endpoint)
+        cost, priority = getattr(view, 'rate_limit', (1, 'normal'))
+        return (cost() if callable(cost) else cost,
+                priority() if callable(priority) else priority)
+
+    def _before_request(self):
+        if request.method == 'OPTIONS':
+            return None
+        state = self._state()
+        cost, priority = self._view_limits()
+        if not state['admission'].enter(priority):
+            return _rejected(503, "The server is busy, please retry shortly.", 1)
+        g.admitted_at = time.monotonic()
+
+        config = current_app.config
+        buckets = [(f'ip:{request.remote_addr}', config['RATE_LIMIT_IP_RATE'],
+                    config['RATE_LIMIT_IP_BURST'])]
+        if current_user.is_authenticated:
+            buckets.append((f'user:{current_user.id}', config['RATE_LIMIT_USER_RATE'],
+                            config['RATE_LIMIT_USER_BURST']))
+        # A request is charged only if every bucket can pay: buckets charged
+        # before one refuses get their tokens back
+        charged = []
+        for key, rate, burst in buckets:
+            allowed, retry_after = state['backend'].consume(key, cost, rate, burst)
+            if not allowed:
+                for charged_key, charged_rate in charged:
+                    state['backend'].refund(charged_key, cost, charged_rate)
+                return _rejected(429, "Too many requests, please slow down.", retry_after)
+            charged.append((key, rate))
+        return None
+
+    def _teardown_request(self, error=None):
+        admitted_at = g.pop('admitted_at', None)
+        if admitted_at is not None:
+            self._state()['admission'].leave(time.monotonic() - admitted_at)
+
+    def stats(self):
+        state = self._state()
+        return {**state['backend'].stats(), 'admission': state['admission'].stats()}
+
+
+rate_limiter = RateLimiter()
@@ -0,0 +1,157 @@
+# app/realtime.py
+"""Live engagement updates over Socket.IO.
+
+Clients join one room per opportunity they have on screen (``subscribe`` /
+``unsubscribe`` events), so a reaction only reaches the people looking at that
+post instead of every connected socket.
+
+Changes are not emitted from the request thread.  ``EngagementBroadcaster``
+queues them per opportunity and a background task flushes the queue after a
+short window, so a burst of clicks on a hot post becomes one
+``engagement_update`` event per room.  Every event has the same shape::
+
+    {
+        'opportunity_id': 7,
+        'reaction_counts': {'like': 3, 'love': 0, 'wow': 1},
+        'bookmark_count': 2,
+        'changes': [{'kind': 'reaction', 'action': 'added', 'type': 'like',
+                     'previous': None, 'user_id': 5}, ...],
+        'total_changes': 1,
+    }
+
+``changes`` holds at most ``REALTIME_MAX_CHANGES`` of the newest changes;
+``total_changes`` says how many were coalesced.  The counts are read once per
+flush for all pending opportunities, so they are always the committed values.
+"""
+import threading
+
+from flask import current_app
+from flask_socketio import join_room, leave_room, rooms
+
+from app import db, socketio
+from app.models import REACTION_TYPES, Opportunity
+from app.signals import engagement_changed
+
+ENGAGEMENT_EVENT = 'engagement_update'
+
+
+def room_for(opportunity_id):
+    return f'opportunity:{opportunity_id}'
+
+
+class _State:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.pending = {}       # opportunity_id -> {'changes': [...], 'total': n}
+        self.scheduled = False
+
+
+class EngagementBroadcaster:
+    """Coalesces engagement changes into one event per opportunity and window."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        # Seconds to gather changes before emitting; 0 emits inline
+        app.config.setdefault('REALTIME_COALESCE_WINDOW', 0.25)
+        app.config.setdefault('REALTIME_MAX_CHANGES', 20)
+        app.config.setdefault('REALTIME_MAX_SUBSCRIPTIONS', 100)
+        app.extensions['realtime'] = _State()
+
+    @staticmethod
+    def _state(app):
+        return app.extensions['realtime']
+
+    def publish(self, app, opportunity_id, change):
+        state = self._state(app)
+        window = app.config['REALTIME_COALESCE_WINDOW']
+        limit = app.config['REALTIME_MAX_CHANGES']
+        with state.lock:
+            pending = state.pending.setdefault(opportunity_id, {'changes': [], 'total': 0})
+            pending['changes'].append(change)
+            del pending['changes'][:-limit]
+            pending['total'] += 1
+            start = window > 0 and not state.scheduled
+            if start:
+                state.scheduled = True
+        if window <= 0:
+            self.flush(app)
+        elif start:
+            socketio.start_background_task(self._flush_later, app, window)
+
+    def _flush_later(self, app, window):
+        socketio.sleep(window)
+        with app.app_context():
+            self.flush(app)
+
+    def flush(self, app):
+        """Emit everything queued so far; returns the number of events sent"""
+        state = self._state(app)
+        with state.lock:
+            pending, state.pending = state.pending, {}
+            state.scheduled = False
+        if not pending:
+            return 0
+
+        columns = [getattr(Opportunity, f'{reaction_type}_count') for reaction_type in REACTION_TYPES]
+        rows = db.session.execute(
+            db.select(Opportunity.id, Opportunity.bookmark_count, *columns)
+            .where(Opportunity.id.in_(list(pending)))
+        ).all()
+
+        for row in rows:
+            queued = pending[row[0]]
+            socketio.emit(ENGAGEMENT_EVENT, {
+                'opportunity_id': row[0],
+                'reaction_counts': dict(zip(REACTION_TYPES, row[2:])),
+                'bookmark_count': row[1],
+                'changes': queued['changes'],
+                'total_changes': queued['total'],
+            }, to=room_for(row[0]))
+        return len(rows)
+
+
+broadcaster = EngagementBroadcaster()
+
+
+@engagement_changed.connect
+def _broadcast_engagement(app, opportunity_id, change, **kwargs):
+    broadcaster.publish(app, opportunity_id, change)
+
+
+def _opportunity_ids(data):
+    ids = data.get('opportunity_ids') if isinstance(data, dict) else None
+    if not isinstance(ids, list):
+        return []
+    return [i for i in ids if isinstance(i, int) and not isinstance(i, bool)]
+
+
+@socketio.on('subscribe')
+def subscribe(data):
+    """Join the rooms for the opportunities a client is showing"""
+    joined = {room for room in rooms() if room.startswith('opportunity:')}
+    allowed = current_app.config['REALTIME_MAX_SUBSCRIPTIONS'] - len(joined)
+    subscribed = []
+    for opportunity_id in _opportunity_ids(data):
+        room = room_for(opportunity_id)
+        if room not in joined:
+            if allowed <= 0:
+                break
+            join_room(room)
+            joined.add(room)
+            allowed -= 1
+        subscribed.append(opportunity_id)
+    return {'subscribed': subscribed}
+
+
+@socketio.on('unsubscribe')
+def unsubscribe(data):
+    """Leave rooms; with no ids, leave every opportunity room"""
+    ids = _opportunity_ids(data)
+    if not ids:
+        ids = [int(room.split(':', 1)[1]) for room in rooms() if room.startswith('opportunity:')]
+    for opportunity_id in ids:
+        leave_room(room_for(opportunity_id))
+    return {'unsubscribed': ids}
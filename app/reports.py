@@ -0,0 +1,206 @@
+# app/reports.py
+"""Report review grouped by target.
+
+Every report points at exactly one user or one opportunity.  The review
+queue lists those targets, most recently reported first, with their report
+counts and latest reasons rather than every report on its own.
+
+A page is a keyset over the grouped targets: GROUP BY target, ordered by
+each target's newest report id, with that id as the cursor.  Report ids only
+grow, so it orders targets by recency and is unique per target.  The grouping
+never covers the whole table at once.  It runs over windows of
+``SCAN_BATCH`` reports below the cursor, newest first, counting only the
+targets reported in the window (through the per-target indexes) and keeping
+those whose newest report falls inside it.  Targets come out in page order
+without remembering the ones already listed.  A page reads at most
+``SCAN_MAX_BATCHES`` windows; when a selective status filter finds too few
+targets in them, the page comes back short with a cursor to carry on from.
+Serializing a page costs one windowed query for the latest reports and one
+column projection per target type.
+"""
+from flask import current_app
+from sqlalchemy import case, func
+
+from app import db
+from app.models import Opportunity, Report, User
+from app.pagination import InvalidCursor, decode_cursor, encode_cursor
+
+TARGET_TYPES = ('opportunity', 'user')
+STATUSES = ('open', 'reviewed', 'all')
+
+# Report column that points at each target type
+TARGET_COLUMNS = {
+    'opportunity': Report.reported_opportunity_id,
+    'user': Report.reported_user_id,
+}
+
+# Reports per window of the walk, and most windows one page reads
+SCAN_BATCH = 500
+SCAN_MAX_BATCHES = 20
+
+
+def _window_floor(target_type, before):
+    """Id of the oldest of the next ``SCAN_BATCH`` reports below ``before``, or None if fewer remain"""
+    query = db.select(Report.id).where(_has_target(target_type))
+    if before is not None:
+        query = query.where(Report.id < before)
+    return db.session.scalar(query.order_by(Report.id.desc()).offset(SCAN_BATCH - 1).limit(1))
+
+
+def _has_target(target_type):
+    if target_type in TARGET_COLUMNS:
+        return TARGET_COLUMNS[target_type].is_not(None)
+    # Reports on deleted opportunities have no target left
+    return db.or_(*[column.is_not(None) for column in TARGET_COLUMNS.values()])
+
+
+def _grouped_targets(target_type, status, before, floor, limit):
+    """Targets whose newest report id is in ``[floor, before)``, newest first.
+
+    Only targets reported in that window are grouped; ``floor`` None means
+    the window runs to the oldest report.
+    """
+    open_count = func.sum(case((Report.is_reviewed.is_(False), 1), else_=0))
+    latest_id = func.max(Report.id)
+    window = db.select(Report.id)
+    if before is not None:
+        window = window.where(Report.id < before)
+    if floor is not None:
+        window = window.where(Report.id >= floor)
+    columns = ({target_type: TARGET_COLUMNS[target_type]} if target_type in TARGET_COLUMNS
+               else TARGET_COLUMNS)
+    query = (
+        db.select(
+            Report.reported_opportunity_id.label('opportunity_id'),
+            Report.reported_user_id.label('user_id'),
+            func.count().label('report_count'),
+            open_count.label('open_count'),
+            func.max(Report.timestamp).label('latest_at'),
+            latest_id.label('latest_id'),
+        )
+        .where(db.or_(*[
+            column.in_(window.with_only_columns(column).where(column.is_not(None)))
+            for column in columns.values()
+        ]))
+        .group_by(Report.reported_opportunity_id, Report.reported_user_id)
+        .order_by(latest_id.desc())
+        .limit(limit)
+    )
+    # A target with a newer report belongs to an earlier window or page
+    if before is not None:
+        query = query.having(latest_id < before)
+    if floor is not None:
+        query = query.having(latest_id >= floor)
+    if status == 'open':
+        query = query.having(open_count > 0)
+    elif status == 'reviewed':
+        query = query.having(open_count == 0)
+    return db.session.execute(query).all()
+
+
+def target_page(status='open', target_type=None, per_page=20, after=None):
+    """One page of report targets; returns ``(targets, next_cursor)``"""
+    before = None
+    if after:
+        [before] = decode_cursor(after, 1)
+        if not isinstance(before, int):
+            raise InvalidCursor(after)
+    rows = []
+    for _ in range(SCAN_MAX_BATCHES):
+        floor = _window_floor(target_type, before)
+        rows.extend(_grouped_targets(target_type, status, before, floor, per_page + 1 - len(rows)))
+        if len(rows) > per_page:
+            rows = rows[:per_page]
+            return serialize_targets(rows), encode_cursor([rows[-1].latest_id])
+        if floor is None:
+            return serialize_targets(rows), None
+        before = floor
+    # Out of windows: every target at or above ``before`` has been listed
+    return serialize_targets(rows), encode_cursor([before])
+
+
+def _latest_reports(opportunity_ids, user_ids, limit):
+    """The newest ``limit`` reports per target, grouped by (type, id)"""
+    rank = func.row_number().over(
+        partition_by=(Report.reported_opportunity_id, Report.reported_user_id),
+        order_by=Report.id.desc(),
+    ).label('rank')
+    latest = (
+        db.select(Report.id, Report.reported_opportunity_id, Report.reported_user_id,
+                  Report.reason, Report.timestamp, Report.is_reviewed,
+                  User.username.label('reporter_username'), rank)
+        .join(User, User.id == Report.reporter_id)
+        .where(db.or_(Report.reported_opportunity_id.in_(opportunity_ids),
+                      Report.reported_user_id.in_(user_ids)))
+        .subquery('latest_reports')
+    )
+    grouped = {}
+    rows = db.session.execute(
+        db.select(latest).where(latest.c.rank <= limit).order_by(latest.c.id.desc())
+    )
+    for row in rows:
+        key = (('opportunity', row.reported_opportunity_id) if row.reported_opportunity_id
+               else ('user', row.reported_user_id))
+        grouped.setdefault(key, []).append({
+            'id': row.id,
+            'reason': row.reason,
+            'reporter_username': row.reporter_username,
+            'timestamp': row.timestamp,
+            'is_reviewed': row.is_reviewed,
+        })
+    return grouped
+
+
+def _opportunity_summaries(ids):
+    rows = db.session.execute(
+        db.select(Opportunity.id, Opportunity.title, Opportunity.category,
+                  Opportunity.is_approved, Opportunity.user_id, User.username)
+        .join(User, User.id == Opportunity.user_id)
+        .where(Opportunity.id.in_(ids))
+    )
+    return {row.id: row._asdict() for row in rows}
+
+
+def _user_summaries(ids):
+    rows = db.session.execute(
+        db.select(User.id, User.username, User.role, User.account_active, User.is_banned)
+        .where(User.id.in_(ids))
+    )
+    return {row.id: row._asdict() for row in rows}
+
+
+def serialize_targets(rows):
+    """Serialize grouped target rows, resolving every join in one batch per table"""
+    if not rows:
+        return []
+    opportunity_ids = [row.opportunity_id for row in rows if row.opportunity_id]
+    user_ids = [row.user_id for row in rows if row.user_id]
+    latest = _latest_reports(opportunity_ids, user_ids, current_app.config['REPORT_LATEST_REASONS'])
+    summaries = {
+        'opportunity': _opportunity_summaries(opportunity_ids) if opportunity_ids else {},
+        'user': _user_summaries(user_ids) if user_ids else {},
+    }
+
+    targets = []
+    for row in rows:
+        target_type, target_id = (('opportunity', row.opportunity_id) if row.opportunity_id
+                                  else ('user', row.user_id))
+        targets.append({
+            'type': target_type,
+            'id': target_id,
+            'target': summaries[target_type].get(target_id),
+            'report_count': row.report_count,
+            'open_count': row.open_count,
+            'is_reviewed': row.open_count == 0,
+            'latest_report_at': row.latest_at,
+            'latest_reports': latest.get((target_type, target_id), []),
+        })
+    return targets
+
+
+def open_report_ids(target_type, target_id):
+    """Ids of the unreviewed reports on one target"""
+    column = TARGET_COLUMNS[target_type]
+    return db.session.execute(
+        db.select(Report.id).where(column == target_id, Report.is_reviewed.is_(False))
+    ).scalars().all()
@@ -1,122 +1,270 @@
-from flask import jsonify, request, Blueprint, current_app
+import math
+
+from flask import abort, jsonify, request, Blueprint, current_app
 from flask_login import login_user, logout_user, current_user, login_required
 from app.decorators import moderator_required
 from app import db
-from app.models import User, Opportunity, Report, PasswordResetToken, Tag
+from app.models import User, Opportunity, Report, PasswordResetToken, Tag, Reaction, Bookmark, REACTION_TYPES
+from app.models import serialize_opportunities, serialize_reports
 from app.utils import role_required
-from app import socketio
-from flask_socketio import emit
-
-CATEGORIES = ["Education", "Climate", "Health", "Youth", "Technology", "Mental Health"]
+from app import moderation
+from app import reports
+from app import search
+from app import users
+from app import geo
+from app import conditional
+from app.cache import feed_cache
+from app.catalog import CATEGORIES, catalog
+from app.jobs import job_queue
+from app.outbox import outbox
+from app.pagination import InvalidCursor, feed_counts, get_page_size, keyset_page
+from app.passwords import PasswordHashBusy, password_hasher
+from app.ratelimit import limit, rate_limiter
+from app.signals import notify_engagement_changed, notify_feed_changed, notify_tags_changed
+from app.suggest import KINDS as SUGGEST_KINDS, suggester
+from app.tags import TAG_MATCHES, TAG_MODES, exact_tag_filter, normalize, parse_tags
+from app.tags import posting_cache, set_opportunity_tags, tag_cache
+from app.user_cache import user_cache
+
+EXPANDABLE = ("reactions", "bookmarks")
 
 main = Blueprint("main", __name__)
 moderator_bp = Blueprint('moderator', __name__, url_prefix='/moderator')
 
+
+def get_expand():
+    """Child collections requested with ?expand=reactions,bookmarks"""
+    requested = request.args.get("expand", "").split(",")
+    return tuple(name for name in EXPANDABLE if name in requested)
+
+
 @main.route("/categories")
 def get_categories():
-    return jsonify(CATEGORIES)
+    snapshot = catalog.snapshot()
+    return catalog.respond(snapshot, snapshot.bodies["categories"])
 
 @main.route("/tags")
 def get_tags():
-    tags = Tag.query.all()
-    return jsonify([tag.to_dict() for tag in tags])
+    """Tags with approved usage counts; ?prefix= narrows, ?top=N keeps the most used"""
+    prefix = normalize(request.args.get("prefix", ""))
+    top = request.args.get("top", "").strip()
+    if top and (not top.isdigit() or int(top) < 1):
+        return jsonify({"error": "top must be a positive integer."}), 400
+
+    snapshot = catalog.snapshot()
+    if not prefix and not top:
+        return catalog.respond(snapshot, snapshot.bodies["tags"])
+    tags = snapshot.find_tags(prefix, int(top) if top else None)
+    return catalog.respond(snapshot, current_app.json.dumps(tags))
+
+@main.route("/suggest")
+def suggest():
+    """Most used tags and/or locations starting with ?q=; ?kind=tag|location"""
+    prefix = request.args.get("q", "")
+    kind = request.args.get("kind", "").strip()
+    max_results = current_app.config["SUGGEST_MAX_RESULTS"]
+    limit = request.args.get("limit", max_results, type=int)
+    if kind and kind not in SUGGEST_KINDS:
+        return jsonify({"error": "kind must be tag or location."}), 400
+    if not 1 <= limit <= max_results:
+        return jsonify({"error": f"limit must be between 1 and {max_results}."}), 400
+
+    kinds = (kind,) if kind else SUGGEST_KINDS
+    return jsonify({f"{name}s": suggester.search(name, prefix, limit) for name in kinds})
+
+def is_search():
+    return bool(request.args.get("q", "").strip() or request.args.get("near"))
+
+def feed_cost():
+    """Full-text and radius searches cost more than browsing"""
+    return 5 if is_search() else 1
+
+def feed_priority():
+    return "low" if is_search() else "normal"
 
 @main.route("/")
+@limit(cost=feed_cost, priority=feed_priority)
 def index():
-    query = request.args.get("q", "").strip()
+    query = " ".join(request.args.get("q", "").split())
     selected_category = request.args.get("category", "").strip()
     location = request.args.get("location", "").strip()
     tags = request.args.get("tags", "").strip()
+    tag_match = request.args.get("tag_match", "contains").strip()
+    tag_mode = request.args.get("tag_mode", "all").strip()
     status = request.args.get("status", "").strip()
-    page = request.args.get("page", 1, type=int)
+    page = max(request.args.get("page", 1, type=int), 1)
+    after = request.args.get("after", "").strip()
+    per_page = get_page_size()
+
+    if selected_category not in CATEGORIES:
+        selected_category = ""
+    if status not in ("approved", "pending"):
+        status = ""
+    if tag_match not in TAG_MATCHES or tag_mode not in TAG_MODES:
+        return jsonify({"error": "tag_match must be contains or exact, tag_mode all or any."}), 400
+    if tag_match == "exact":
+        tag_names = tuple(sorted(parse_tags(tags)))
+    else:
+        tag_names = tuple(sorted({tag.strip().lower() for tag in tags.split(',') if tag.strip()}))
+    tag_filter = (tag_names, tag_match, tag_mode) if tag_names else ()
+    near = ()
+    if request.args.get("near"):
+        max_radius = current_app.config["GEO_MAX_RADIUS_KM"]
+        radius_km = request.args.get("radius_km", current_app.config["GEO_DEFAULT_RADIUS_KM"], type=float)
+        try:
+            latitude, longitude = geo.parse_point(request.args["near"])
+        except ValueError:
+            return jsonify({"error": "near must be latitude,longitude."}), 400
+        if radius_km is None or not 0 < radius_km <= max_radius:
+            return jsonify({"error": f"radius_km must be above 0 and at most {max_radius}."}), 400
+        # Rounded to about a metre so nearby requests share cache entries
+        near = (round(latitude, 5), round(longitude, 5), radius_km)
+
+    # Equivalent requests normalize to the same key so they share one entry
+    filters = (query.lower(), selected_category, location.lower(), tag_filter, status, near)
+    expand = get_expand()
+    cache_key = filters + (after if after else page, per_page, expand)
+
+    def fill():
+        payload, opportunity_ids = build_feed_page(filters, page, after, per_page, expand)
+        return conditional.feed_entry(payload), opportunity_ids
+
+    try:
+        body, etag = feed_cache.get_or_fill(cache_key, fill)
+    except InvalidCursor:
+        return jsonify({"error": "Invalid cursor."}), 400
+    return conditional.respond(body, etag)
 
-    results_query = Opportunity.query.filter_by(is_approved=True)
 
-    if query:
-        results_query = results_query.filter(
-            (Opportunity.title.ilike(f"%{query}%")) |
-            (Opportunity.description.ilike(f"%{query}%")) |
-            (Opportunity.category.ilike(f"%{query}%")) |
-            (Opportunity.location.ilike(f"%{query}%"))
-        )
+def build_feed_page(filters, page, after, per_page, expand=()):
+    """Run the feed query for one page; returns (payload, opportunity ids)"""
+    query, selected_category, location, tag_filter, status, near = filters
 
-    if selected_category and selected_category in CATEGORIES:
+    results_query = Opportunity.query.filter_by(is_approved=True)
+    order_by = [(Opportunity.created_at, True), (Opportunity.id, True)]
+
+    if selected_category:
         results_query = results_query.filter_by(category=selected_category)
 
     if location:
         results_query = results_query.filter(Opportunity.location.ilike(f"%{location}%"))
 
-    if tags:
-        for tag in tags.split(','):
-            results_query = results_query.filter(Opportunity.tags.any(Tag.name.ilike(f"%{tag.strip()}%")))
+    if tag_filter:
+        tag_names, tag_match, tag_mode = tag_filter
+        if tag_match == "exact":
+            results_query = results_query.filter(exact_tag_filter(tag_names, tag_mode))
+        else:
+            matches = [Opportunity.tags.any(Tag.name.ilike(f"%{tag}%")) for tag in tag_names]
+            results_query = results_query.filter(
+                db.and_(*matches) if tag_mode == "all" else db.or_(*matches))
+
+    if near:
+        results_query = results_query.filter(geo.radius_filter(*near))
 
     if status == "approved":
         results_query = results_query.filter_by(is_approved=True)
     elif status == "pending":
         results_query = results_query.filter_by(is_approved=False)
 
-    paginated = results_query.order_by(Opportunity.created_at.desc()).paginate(
-        page=page, per_page=5, error_out=False
-    )
+    search_backend = search.get_backend() if query else None
+    if search_backend:
+        hits = search_backend.match(query)
+        results_query = results_query.join(hits, hits.c.id == Opportunity.id)
+        order_by.insert(0, (hits.c.rank, False))
 
-    return jsonify({
-        'opportunities': [opp.to_dict() for opp in paginated.items],
-        'pagination': {
-            'page': paginated.page,
-            'per_page': paginated.per_page,
-            'total_pages': paginated.pages,
-            'total_items': paginated.total
-        }
-    })
+    total = feed_counts.get_or_count(filters, results_query)
+
+    if after or page == 1:
+        # Keyset mode; the first page of both modes is the same rows, so it
+        # also hands out a cursor clients can switch to for infinite scroll.
+        items, next_cursor = keyset_page(results_query, order_by, per_page, after=after or None)
+    else:
+        items = results_query.order_by(
+            *[column.desc() if descending else column for column, descending in order_by]
+        ).offset((page - 1) * per_page).limit(per_page).all()
+        next_cursor = None
+
+    pagination = {
+        'per_page': per_page,
+        'total_items': total,
+        'next_cursor': next_cursor,
+        'has_more': next_cursor is not None if after else page * per_page < total
+    }
+    if not after:
+        pagination['page'] = page
+        pagination['total_pages'] = math.ceil(total / per_page)
+
+    opportunities = serialize_opportunities(items, expand=expand)
+    if near:
+        distances = geo.distances_km(near[0], near[1], [
+            (opp['id'], opp['latitude'], opp['longitude']) for opp in opportunities])
+        for opp in opportunities:
+            opp['distance_km'] = round(distances[opp['id']], 3)
+    if search_backend:
+        highlights = search_backend.highlight(query, [opp['id'] for opp in opportunities])
+        for opp in opportunities:
+            opp['highlight'] = highlights.get(opp['id'])
+
+    payload = {
+        'opportunities': opportunities,
+        'pagination': pagination
+    }
+    return payload, [opp['id'] for opp in opportunities]
 
 @main.route('/new', methods=["POST"])
 @login_required
+@limit(cost=10)
 def new_opportunity():
     data = request.get_json()
     title = data.get("title", "").strip()
     description = data.get("description", "").strip()
     category = data.get("category", "").strip()
     location = data.get("location", "").strip()
-    tags = data.get("tags", "").strip()
+    tag_names = parse_tags(data.get("tags", ""))
 
-    tags_list = [tag.strip() for tag in tags.split(',') if tag.strip()]
-    
     if not all([title, description, category, location]):
         return jsonify({"error": "All fields are required."}), 400
 
     if category not in CATEGORIES:
         return jsonify({"error": "Invalid category selected."}), 400
 
+    try:
+        latitude, longitude = geo.coordinates_from(data)
+    except (TypeError, ValueError):
+        return jsonify({"error": "latitude and longitude must be given together and be in range."}), 400
+
     new_opp = Opportunity(
         title=title,
         description=description,
         category=category,
         location=location,
+        latitude=latitude,
+        longitude=longitude,
         user_id=current_user.id
     )
 
-    for tag_name in tags_list:
-        tag = Tag.query.filter_by(name=tag_name).first()
-        if not tag:
-            tag = Tag(name=tag_name)
-            db.session.add(tag)
-        new_opp.tags.append(tag)
-
     if current_user.is_authenticated and current_user.role in ['admin', 'moderator']:
         new_opp.is_approved = True
-        new_opp.approved_by = current_user.username
+        new_opp.approved_by_id = current_user.id
     else:
         new_opp.is_approved = False
 
     try:
         db.session.add(new_opp)
+        db.session.flush()
+        created_tags = set_opportunity_tags(new_opp.id, tag_names, replace=False)
         db.session.commit()
+        if new_opp.is_approved:
+            notify_feed_changed(current_app._get_current_object(), [new_opp.id])
+        elif created_tags:
+            notify_tags_changed(current_app._get_current_object())
         return jsonify(new_opp.to_dict()), 201
     except Exception as e:
         db.session.rollback()
         return jsonify({"error": "An error occurred while creating the opportunity."}), 500
 
 @main.route("/register", methods=["POST"])
+@limit(cost=10)
 def register():
     data = request.get_json()
     username = data.get("username", "").strip()
@@ -138,6 +286,7 @@ def register():
     return jsonify(new_user.to_dict()), 201
 
 @main.route("/login", methods=["POST"])
+@limit(cost=5)
 def login():
     data = request.get_json()
     username = data.get("username", "").strip()
@@ -149,11 +298,25 @@ def login():
     user = User.query.filter_by(username=username).first()
 
     if user and user.check_password(password):
+        if user.password_needs_rehash():
+            # Upgrade the stored hash while the password is at hand; a busy
+            # pool just leaves it for the next login
+            try:
+                user.set_password(password)
+                db.session.commit()
+            except PasswordHashBusy:
+                pass
         login_user(user)
         return jsonify(user.to_dict())
     else:
         return jsonify({"error": "Invalid username or password."}), 401
 
+@main.errorhandler(PasswordHashBusy)
+def password_hash_busy(error):
+    response = jsonify({"error": "Too many sign-ins in progress, please retry shortly."})
+    response.headers["Retry-After"] = "1"
+    return response, 503
+
 @main.route("/logout", methods=["POST"])
 @login_required
 def logout():
@@ -165,21 +328,114 @@ def logout():
 def get_current_user():
     return jsonify(current_user.to_dict())
 
+def serialize_queue(opportunities):
+    return [dict(data, **moderation.lease_info(opp))
+            for opp, data in zip(opportunities, serialize_opportunities(opportunities, expand=get_expand()))]
+
 @moderator_bp.route("/opportunities")
 @login_required
 @moderator_required
 def moderate_opportunities():
-    opportunities = Opportunity.query.filter_by(is_approved=False).order_by(Opportunity.created_at.desc()).all()
-    return jsonify([opp.to_dict() for opp in opportunities])
+    """Pending opportunities, oldest first, one keyset page at a time.
+
+    ``?view=available`` hides items other moderators hold a live lease on,
+    ``?view=mine`` shows only the caller's own claims.
+    """
+    view = request.args.get("view", "all")
+    after = request.args.get("after", "").strip()
+    per_page = get_page_size()
+
+    query = moderation.pending()
+    if view == "available":
+        query = query.filter(db.or_(moderation.available(), moderation.held_by(current_user.id)))
+    elif view == "mine":
+        query = query.filter(moderation.held_by(current_user.id))
+    elif view != "all":
+        return jsonify({"error": "view must be all, available or mine."}), 400
+
+    try:
+        opportunities, next_cursor = keyset_page(query, moderation.QUEUE_ORDER, per_page, after)
+    except InvalidCursor:
+        return jsonify({"error": "Invalid cursor."}), 400
+    return jsonify({
+        "opportunities": serialize_queue(opportunities),
+        "pagination": {
+            "per_page": per_page,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None,
+        },
+    })
+
+@moderator_bp.route("/opportunities/claim", methods=["POST"])
+@login_required
+@moderator_required
+def claim_opportunities():
+    data = request.get_json(silent=True) or {}
+    maximum = current_app.config["MODERATION_CLAIM_MAX"]
+    count = data.get("count", current_app.config["FEED_PAGE_SIZE"])
+    lease_seconds = data.get("lease_seconds")
+    if not isinstance(count, int) or count < 1:
+        return jsonify({"error": "count must be a positive integer."}), 400
+    if lease_seconds is not None and (not isinstance(lease_seconds, int) or lease_seconds < 1):
+        return jsonify({"error": "lease_seconds must be a positive integer."}), 400
+
+    opportunities = moderation.claim(current_user.id, min(count, maximum), lease_seconds)
+    return jsonify({"opportunities": serialize_queue(opportunities)})
+
+@moderator_bp.route("/opportunities/release", methods=["POST"])
+@login_required
+@moderator_required
+def release_opportunities():
+    data = request.get_json(silent=True) or {}
+    ids = data.get("ids")
+    if ids is not None and (not isinstance(ids, list) or not all(isinstance(i, int) for i in ids)):
+        return jsonify({"error": "ids must be a list of opportunity ids."}), 400
+    released = moderation.release(current_user.id, ids)
+    return jsonify({"released": released})
+
+@moderator_bp.errorhandler(moderation.LeaseConflict)
+def lease_conflict(error):
+    return jsonify({
+        "error": "Opportunity is claimed by another moderator.",
+        **moderation.lease_info(error.opportunity),
+    }), 409
+
+@moderator_bp.route('/bulk/<action>', methods=['POST'])
+@login_required
+@moderator_required
+def bulk_moderate(action):
+    """Apply one action to many opportunities (or reports) in one transaction"""
+    if action not in moderation.BULK_ACTIONS:
+        return jsonify({"error": "Unknown action."}), 404
+    data = request.get_json(silent=True) or {}
+    ids = data.get("ids")
+    if not isinstance(ids, list) or not ids or not all(isinstance(i, int) for i in ids):
+        return jsonify({"error": "ids must be a non-empty list of integers."}), 400
+    if len(ids) > current_app.config["MODERATION_BULK_MAX"]:
+        return jsonify({"error": f"At most {current_app.config['MODERATION_BULK_MAX']} ids per request."}), 400
+
+    results = moderation.perform_bulk(action, current_user.id, ids)
+    counts = {}
+    for outcome in results.values():
+        counts[outcome] = counts.get(outcome, 0) + 1
+    return jsonify({
+        "action": action,
+        "results": {str(id): outcome for id, outcome in results.items()},
+        "counts": counts,
+    })
 
 @moderator_bp.route('/approve/<int:id>', methods=['POST'])
 @login_required
 @moderator_required
 def approve_opportunity(id):
     opp = Opportunity.query.get_or_404(id)
+    moderation.check_lease(opp, current_user.id)
     opp.is_approved = True
-    opp.approved_by = current_user.username
+    opp.approved_by_id = current_user.id
+    opp.claimed_by_id = None
+    opp.claim_expires_at = None
     db.session.commit()
+    notify_feed_changed(current_app._get_current_object(), [opp.id])
     return jsonify(opp.to_dict())
 
 @moderator_bp.route('/reject/<int:id>', methods=['POST'])
@@ -187,20 +443,35 @@ def approve_opportunity(id):
 @moderator_required
 def reject_opportunity(id):
     opp = Opportunity.query.get_or_404(id)
+    moderation.check_lease(opp, current_user.id)
+    was_approved = opp.is_approved
     db.session.delete(opp)
     db.session.commit()
+    if was_approved:
+        notify_feed_changed(current_app._get_current_object(), [id])
     return jsonify({"message": "Opportunity rejected."}), 200
 
 @main.route("/dashboard")
 @login_required
 def dashboard():
     opportunities = Opportunity.query.filter_by(user_id=current_user.id).order_by(Opportunity.created_at.desc()).all()
-    return jsonify([opp.to_dict() for opp in opportunities])
+    return jsonify(serialize_opportunities(opportunities, expand=get_expand()))
 
 @main.route('/opportunity/<int:opportunity_id>')
 def view_opportunity(opportunity_id):
+    expand = get_expand()
+    updated_at = conditional.opportunity_validator(opportunity_id)
+    if updated_at is None:
+        abort(404)
+    etag = conditional.make_etag("opportunity", opportunity_id, updated_at, expand)
+    if conditional.not_modified(etag, updated_at):
+        return conditional.respond(None, etag, updated_at)
+
     opportunity = Opportunity.query.get_or_404(opportunity_id)
-    return jsonify(opportunity.to_dict())
+    # Validators from the row actually served, in case it changed meanwhile
+    etag = conditional.make_etag("opportunity", opportunity_id, opportunity.updated_at, expand)
+    return conditional.add_validators(
+        jsonify(opportunity.to_dict(expand=expand)), etag, opportunity.updated_at)
 
 @main.route('/opportunity/<int:opportunity_id>/edit', methods=['POST'])
 @login_required
@@ -218,7 +489,20 @@ def edit_opportunity(opportunity_id):
     if opportunity.category not in CATEGORIES:
         return jsonify({"error": "Invalid category selected."}), 400
 
+    if "latitude" in data or "longitude" in data:
+        try:
+            opportunity.latitude, opportunity.longitude = geo.coordinates_from(data)
+        except (TypeError, ValueError):
+            return jsonify({"error": "latitude and longitude must be given together and be in range."}), 400
+
+    created_tags = []
+    if "tags" in data:
+        created_tags = set_opportunity_tags(opportunity.id, parse_tags(data["tags"]))
     db.session.commit()
+    if opportunity.is_approved:
+        notify_feed_changed(current_app._get_current_object(), [opportunity.id])
+    elif created_tags:
+        notify_tags_changed(current_app._get_current_object())
     return jsonify(opportunity.to_dict())
 
 @main.route('/opportunity/<int:opportunity_id>/delete', methods=['DELETE'])
@@ -228,22 +512,67 @@ def delete_opportunity(opportunity_id):
     if opportunity.user_id != current_user.id:
         return jsonify({"error": "You are not authorized to delete this opportunity."}), 403
 
+    was_approved = opportunity.is_approved
     db.session.delete(opportunity)
     db.session.commit()
+    if was_approved:
+        notify_feed_changed(current_app._get_current_object(), [opportunity_id])
     return jsonify({"message": "Opportunity deleted successfully."}), 200
 
 
 
+def get_flag(name):
+    """Read an optional true/false query parameter; None when absent"""
+    value = request.args.get(name, "").strip().lower()
+    if not value:
+        return None
+    if value not in ("true", "false"):
+        raise ValueError(name)
+    return value == "true"
+
 @main.route('/admin/users')
 @login_required
-@role_required(['admin', 'moderator'])
+@role_required('admin', 'moderator')
+@limit(priority="low")
 def user_moderation():
-    users = User.query.all()
-    return jsonify([user.to_dict() for user in users])
+    """Users one keyset page at a time.
+
+    ``?q=`` matches a username or email prefix, ``?role=``, ``?active=`` and
+    ``?banned=`` filter, ``?sort=`` is one of ``users.SORTS`` and
+    ``?count=true`` adds a cheap total (see ``users.count_users``).
+    """
+    q = request.args.get("q", "").strip()
+    role = request.args.get("role", "").strip() or None
+    sort = request.args.get("sort", "username")
+    after = request.args.get("after", "").strip()
+    per_page = get_page_size()
+    try:
+        active, banned, with_count = get_flag("active"), get_flag("banned"), get_flag("count")
+    except ValueError as error:
+        return jsonify({"error": f"{error} must be true or false."}), 400
+    if role is not None and role not in users.ROLES:
+        return jsonify({"error": "Invalid role specified."}), 400
+    if sort not in users.SORTS:
+        return jsonify({"error": f"sort must be one of {', '.join(users.SORTS)}."}), 400
+
+    query = users.search_query(q, role=role, active=active, banned=banned)
+    try:
+        page, next_cursor = keyset_page(query, users.SORTS[sort], per_page, after)
+    except InvalidCursor:
+        return jsonify({"error": "Invalid cursor."}), 400
+
+    pagination = {
+        "per_page": per_page,
+        "next_cursor": next_cursor,
+        "has_more": next_cursor is not None,
+    }
+    if with_count:
+        pagination["total"] = users.count_users(query)
+    return jsonify({"users": [user.to_dict() for user in page], "pagination": pagination})
 
 @main.route('/admin/suspend/<int:user_id>', methods=['POST'])
 @login_required
-@role_required(['admin', 'moderator'])
+@role_required('admin', 'moderator')
 def suspend_user(user_id):
     user = User.query.get_or_404(user_id)
     if user.id == current_user.id:
@@ -251,15 +580,17 @@ def suspend_user(user_id):
 
     user.suspend()
     db.session.commit()
+    user_cache.invalidate(user.id)
     return jsonify(user.to_dict())
 
 @main.route('/admin/activate/<int:user_id>', methods=['POST'])
 @login_required
-@role_required(['admin', 'moderator'])
+@role_required('admin', 'moderator')
 def activate_user(user_id):
     user = User.query.get_or_404(user_id)
     user.activate()
     db.session.commit()
+    user_cache.invalidate(user.id)
     return jsonify(user.to_dict())
 
 @main.route('/admin/role/<int:user_id>/<role>', methods=['POST'])
@@ -277,10 +608,28 @@ def change_role(user_id, role):
 
     user.promote(role)
     db.session.commit()
+    user_cache.invalidate(user.id)
     return jsonify(user.to_dict())
 
+@main.route('/admin/metrics')
+@login_required
+@role_required('admin')
+def cache_metrics():
+    """Entry counts and hit/miss counters of the in-process caches"""
+    return jsonify({
+        "user_cache": user_cache.stats(),
+        "feed_cache": feed_cache.backend.stats(),
+        "tag_cache": tag_cache.stats(),
+        "tag_postings": posting_cache.stats(),
+        "password_hashing": password_hasher.stats(),
+        "rate_limit": rate_limiter.stats(),
+        "jobs": job_queue.stats(),
+        "outbox": outbox.stats(),
+    })
+
 @main.route('/report', methods=['POST'])
 @login_required
+@limit(cost=10)
 def submit_report():
     data = request.get_json()
     reason = data.get('reason')
@@ -313,8 +662,52 @@ def submit_report():
 @login_required
 @moderator_required
 def view_reports():
-    reports = Report.query.order_by(Report.timestamp.desc()).all()
-    return jsonify([report.to_dict() for report in reports]), 200
+    all_reports = Report.query.order_by(Report.timestamp.desc()).all()
+    return jsonify(serialize_reports(all_reports)), 200
+
+@moderator_bp.route('/reports/targets', methods=['GET'])
+@login_required
+@moderator_required
+def view_report_targets():
+    """Reported users and opportunities, most recently reported first.
+
+    ``?status=open`` (default) lists targets with unreviewed reports,
+    ``reviewed`` those without, ``all`` both; ``?type=`` limits the list to
+    opportunities or users.
+    """
+    status = request.args.get("status", "open")
+    target_type = request.args.get("type") or None
+    if status not in reports.STATUSES:
+        return jsonify({"error": "status must be open, reviewed or all."}), 400
+    if target_type is not None and target_type not in reports.TARGET_TYPES:
+        return jsonify({"error": "type must be opportunity or user."}), 400
+    per_page = get_page_size()
+    after = request.args.get("after", "").strip()
+
+    try:
+        targets, next_cursor = reports.target_page(status, target_type, per_page, after)
+    except InvalidCursor:
+        return jsonify({"error": "Invalid cursor."}), 400
+    return jsonify({
+        "targets": targets,
+        "pagination": {
+            "per_page": per_page,
+            "next_cursor": next_cursor,
+            "has_more": next_cursor is not None,
+        },
+    }), 200
+
+@moderator_bp.route('/reports/targets/<target_type>/<int:target_id>/review', methods=['POST'])
+@login_required
+@moderator_required
+def review_report_target(target_type, target_id):
+    """Mark every open report on one target reviewed"""
+    if target_type not in reports.TARGET_TYPES:
+        return jsonify({"error": "type must be opportunity or user."}), 404
+    ids = reports.open_report_ids(target_type, target_id)
+    if ids:
+        moderation.perform_bulk("mark_reviewed", current_user.id, ids)
+    return jsonify({"type": target_type, "id": target_id, "reviewed": len(ids)}), 200
 
 @moderator_bp.route('/delete_user/<int:user_id>', methods=['DELETE'])
 @login_required
@@ -326,17 +719,22 @@ def moderator_delete_user(user_id):
     if user.role == 'admin' and current_user.role != 'admin':
         return jsonify({"error": "Only an admin can delete another admin."}), 403
 
-    db.session.delete(user)
+    # The cascade runs on the job queue; asking twice queues it once
+    job_id = moderation.delete_user.enqueue((user.id, current_user.id),
+                                            idempotency_key=f'delete-user:{user.id}')
     db.session.commit()
-    return jsonify({"message": f"User '{user.username}' deleted."}), 200
+    return jsonify({"message": f"User '{user.username}' will be deleted.", "job_id": job_id}), 202
 
 @moderator_bp.route('/delete_opportunity/<int:opp_id>', methods=['DELETE'])
 @login_required
 @moderator_required
 def moderator_delete_opportunity(opp_id):
     opportunity = Opportunity.query.get_or_404(opp_id)
+    was_approved = opportunity.is_approved
     db.session.delete(opportunity)
     db.session.commit()
+    if was_approved:
+        notify_feed_changed(current_app._get_current_object(), [opp_id])
     return jsonify({"message": f"Opportunity '{opportunity.title}' deleted."}), 200
 
 @moderator_bp.route('/ban_user/<int:user_id>', methods=['POST'])
@@ -351,6 +749,7 @@ def ban_user(user_id):
 
     user.is_banned = True
     db.session.commit()
+    user_cache.invalidate(user.id)
     return jsonify(user.to_dict()), 200
 
 @moderator_bp.route('/mark_reviewed/<int:report_id>', methods=['POST'])
@@ -364,56 +763,34 @@ def mark_report_reviewed(report_id):
 
 @main.route('/opportunity/<int:opportunity_id>/react', methods=['POST'])
 @login_required
+@limit(cost=2)
 def react_to_opportunity(opportunity_id):
     data = request.get_json()
     reaction_type = data.get('reaction_type')
+    if reaction_type not in REACTION_TYPES:
+        return jsonify({"error": "Invalid reaction type."}), 400
     opportunity = Opportunity.query.get_or_404(opportunity_id)
 
-    existing_reaction = Reaction.query.filter_by(user_id=current_user.id, opportunity_id=opportunity.id).first()
-
-    if existing_reaction:
-        if existing_reaction.reaction_type == reaction_type:
-            # User is removing their reaction
-            db.session.delete(existing_reaction)
-            db.session.commit()
-            socketio.emit('reaction_update', {'opportunity_id': opportunity.id, 'reactions': {reaction.id: reaction.reaction_type for reaction in opportunity.reactions}})
-            return jsonify({"message": "Reaction removed."}), 200
-        else:
-            # User is changing their reaction
-            existing_reaction.reaction_type = reaction_type
-            db.session.commit()
-            socketio.emit('reaction_update', {'opportunity_id': opportunity.id, 'reactions': [reaction.to_dict() for reaction in opportunity.reactions]})
-            return jsonify(opportunity.to_dict()), 200
-
-    new_reaction = Reaction(
-        user_id=current_user.id,
-        opportunity_id=opportunity.id,
-        reaction_type=reaction_type
-    )
-    db.session.add(new_reaction)
+    action, previous = Reaction.toggle(current_user.id, opportunity.id, reaction_type)
     db.session.commit()
-    socketio.emit('reaction_update', {'opportunity_id': opportunity.id, 'reactions': [reaction.to_dict() for reaction in opportunity.reactions]})
-    return jsonify(opportunity.to_dict()), 201
+    app = current_app._get_current_object()
+    notify_feed_changed(app, [opportunity.id], membership=False)
+    notify_engagement_changed(app, opportunity.id, 'reaction', action, current_user.id,
+                              reaction_type=reaction_type, previous=previous)
+    if action == 'removed':
+        return jsonify({"message": "Reaction removed."}), 200
+    return jsonify(opportunity.to_dict()), 201 if action == 'added' else 200
 
 
 @main.route('/opportunity/<int:opportunity_id>/bookmark', methods=['POST'])
 @login_required
+@limit(cost=2)
 def bookmark_opportunity(opportunity_id):
     opportunity = Opportunity.query.get_or_404(opportunity_id)
-    existing_bookmark = Bookmark.query.filter_by(user_id=current_user.id, opportunity_id=opportunity.id).first()
-
-    if existing_bookmark:
-        # User is removing their bookmark
-        db.session.delete(existing_bookmark)
-        db.session.commit()
-        socketio.emit('bookmark_update', {'opportunity_id': opportunity.id, 'bookmarks': [bookmark.to_dict() for bookmark in opportunity.bookmarks]})
-        return jsonify(opportunity.to_dict()), 200
-
-    new_bookmark = Bookmark(
-        user_id=current_user.id,
-        opportunity_id=opportunity.id
-    )
-    db.session.add(new_bookmark)
+    added = Bookmark.toggle(current_user.id, opportunity.id)
     db.session.commit()
-    socketio.emit('bookmark_update', {'opportunity_id': opportunity.id, 'bookmarks': [bookmark.to_dict() for bookmark in opportunity.bookmarks]})
-    return jsonify(opportunity.to_dict()), 201
+    app = current_app._get_current_object()
+    notify_feed_changed(app, [opportunity.id], membership=False)
+    notify_engagement_changed(app, opportunity.id, 'bookmark',
+                              'added' if added else 'removed', current_user.id)
+    return jsonify(opportunity.to_dict()), 201 if added else 200
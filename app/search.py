@@ -0,0 +1,301 @@
+# app/search.py
+"""Full-text search over approved opportunities.
+
+The feed delegates ``?q=`` handling to a search backend chosen from the
+``SEARCH_BACKEND`` setting.  Every backend answers two questions:
+
+* ``match(q)`` - a selectable of ``(id, rank)`` rows for the opportunities that
+  match, where a lower rank is a better hit.  The feed joins it to the normal
+  filter query so category, location and tag filters still apply.
+* ``highlight(q, ids)`` - highlighted title and description snippets for the
+  handful of rows that actually end up on the page.
+
+The SQLite backend keeps an FTS5 table in sync with ``opportunity`` through
+triggers, so every write path (ORM or bulk SQL) updates the index in the same
+transaction.  The Postgres backend uses an expression GIN index over a
+weighted ``tsvector``, which Postgres maintains by itself.
+"""
+import re
+
+from flask import current_app
+from markupsafe import escape
+from sqlalchemy import DDL, Float, Integer, bindparam, event, text
+
+from app import db
+
+HIGHLIGHT_START = '<mark>'
+HIGHLIGHT_END = '</mark>'
+SNIPPET_TOKENS = 16
+
+# The databases mark hits with control characters rather than HTML; they are
+# swapped for HIGHLIGHT_START/END only after the text around them has been
+# HTML-escaped, so a title or description can't inject markup.
+_MARK_START = '\x02'
+_MARK_END = '\x03'
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def tokenize(query):
+    """Split free text into search terms, dropping punctuation and operators"""
+    return _TOKEN_RE.findall(query.lower())
+
+
+def _to_html(fragment):
+    """Escape a highlighted fragment and turn the hit markers into <mark> tags"""
+    if fragment is None:
+        return None
+    escaped = str(escape(fragment))
+    return escaped.replace(_MARK_START, HIGHLIGHT_START).replace(_MARK_END, HIGHLIGHT_END)
+
+
+def _no_hits():
+    """An empty hits selectable, for queries with no searchable words"""
+    from app.models import Opportunity
+
+    return (
+        db.select(Opportunity.id.label('id'), db.literal(0.0).label('rank'))
+        .where(db.false())
+        .subquery('search_hits')
+    )
+
+
+class SearchBackend:
+    name = None
+
+    def match(self, query):
+        raise NotImplementedError
+
+    def highlight(self, query, ids):
+        return {}
+
+
+class LikeSearchBackend(SearchBackend):
+    """Fallback that keeps the old substring behaviour when no index exists."""
+    name = 'like'
+
+    def match(self, query):
+        from app.models import Opportunity
+
+        pattern = f"%{query}%"
+        return (
+            db.select(Opportunity.id.label('id'), db.literal(0.0).label('rank'))
+            .where(
+                Opportunity.title.ilike(pattern) |
+                Opportunity.description.ilike(pattern) |
+                Opportunity.category.ilike(pattern) |
+                Opportunity.location.ilike(pattern)
+            )
+            .subquery('search_hits')
+        )
+
+
+class SQLiteSearchBackend(SearchBackend):
+    name = 'sqlite'
+
+    # Column weights for bm25(): title, description, category, location
+    WEIGHTS = (10.0, 1.0, 4.0, 4.0)
+
+    @staticmethod
+    def to_match_expression(query):
+        # Quote every token so user input can never be parsed as FTS5 syntax,
+        # and make each one a prefix match so partially typed words still hit.
+        return ' '.join(f'"{token}"*' for token in tokenize(query))
+
+    def match(self, query):
+        expression = self.to_match_expression(query)
+        if not expression:
+            # MATCH '' is a syntax error; nothing to search for matches nothing
+            return _no_hits()
+        weights = ', '.join(str(weight) for weight in self.WEIGHTS)
+        return (
+            text(
+                "SELECT rowid AS id, bm25(opportunity_fts, " + weights + ") AS rank "
+                "FROM opportunity_fts WHERE opportunity_fts MATCH :match"
+            )
+            .bindparams(match=expression)
+            .columns(id=Integer, rank=Float)
+            .subquery('search_hits')
+        )
+
+    def highlight(self, query, ids):
+        expression = self.to_match_expression(query)
+        if not ids or not expression:
+            return {}
+        stmt = text(
+            "SELECT rowid, "
+            "highlight(opportunity_fts, 0, :start, :end), "
+            "snippet(opportunity_fts, 1, :start, :end, '…', :tokens) "
+            "FROM opportunity_fts "
+            "WHERE opportunity_fts MATCH :match AND rowid IN :ids"
+        ).bindparams(bindparam('ids', expanding=True))
+        rows = db.session.execute(stmt, {
+            'match': expression,
+            'ids': list(ids),
+            'start': _MARK_START,
+            'end': _MARK_END,
+            'tokens': SNIPPET_TOKENS,
+        })
+        return {row[0]: {'title': _to_html(row[1]), 'snippet': _to_html(row[2])} for row in rows}
+
+
+class PostgresSearchBackend(SearchBackend):
+    name = 'postgresql'
+
+    DOCUMENT = (
+        "setweight(to_tsvector('english', coalesce(opportunity.title, '')), 'A') || "
+        "setweight(to_tsvector('english', coalesce(opportunity.category, '')), 'B') || "
+        "setweight(to_tsvector('english', coalesce(opportunity.location, '')), 'B') || "
+        "setweight(to_tsvector('english', coalesce(opportunity.description, '')), 'C')"
+    )
+
+    @staticmethod
+    def to_tsquery(query):
+        return ' & '.join(f"{token}:*" for token in tokenize(query))
+
+    def match(self, query):
+        tsquery = self.to_tsquery(query)
+        if not tsquery:
+            return _no_hits()
+        # ts_rank grows with relevance, negate it so lower is better everywhere
+        return (
+            text(
+                "SELECT opportunity.id AS id, "
+                "-ts_rank(" + self.DOCUMENT + ", to_tsquery('english', :tsquery)) AS rank "
+                "FROM opportunity "
+                "WHERE " + self.DOCUMENT + " @@ to_tsquery('english', :tsquery)"
+            )
+            .bindparams(tsquery=tsquery)
+            .columns(id=Integer, rank=Float)
+            .subquery('search_hits')
+        )
+
+    def highlight(self, query, ids):
+        tsquery = self.to_tsquery(query)
+        if not ids or not tsquery:
+            return {}
+        options = (
+            f"StartSel={_MARK_START}, StopSel={_MARK_END}, "
+            f"MaxWords={SNIPPET_TOKENS}, MinWords=5"
+        )
+        stmt = text(
+            "SELECT id, "
+            "ts_headline('english', title, to_tsquery('english', :tsquery), :full), "
+            "ts_headline('english', description, to_tsquery('english', :tsquery), :options) "
+            "FROM opportunity WHERE id IN :ids"
+        ).bindparams(bindparam('ids', expanding=True))
+        rows = db.session.execute(stmt, {
+            'tsquery': tsquery,
+            'ids': list(ids),
+            'full': f"StartSel={_MARK_START}, StopSel={_MARK_END}, HighlightAll=true",
+            'options': options,
+        })
+        return {row[0]: {'title': _to_html(row[1]), 'snippet': _to_html(row[2])} for row in rows}
+
+
+BACKENDS = {
+    'like': LikeSearchBackend,
+    'sqlite': SQLiteSearchBackend,
+    'postgresql': PostgresSearchBackend,
+}
+
+
+def _sqlite_has_fts5(connection):
+    try:
+        options = connection.exec_driver_sql("PRAGMA compile_options").scalars().all()
+    except Exception:
+        return False
+    return 'ENABLE_FTS5' in options
+
+
+def get_backend():
+    """Return the search backend configured for the current app"""
+    name = current_app.config.get('SEARCH_BACKEND', 'auto')
+    if name == 'auto':
+        name = db.engine.dialect.name
+        if name == 'sqlite':
+            state = current_app.extensions.setdefault('search', {})
+            if 'fts5' not in state:
+                with db.engine.connect() as connection:
+                    state['fts5'] = _sqlite_has_fts5(connection)
+            if not state['fts5']:
+                name = 'like'
+    return BACKENDS.get(name, LikeSearchBackend)()
+
+
+# --- Index DDL --------------------------------------------------------------
+# Kept next to the backends so db.create_all() (used by the tests and seed.py)
+# builds the same index the migration does.
+
+SQLITE_CREATE = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS opportunity_fts USING fts5("
+    "title, description, category, location, "
+    "tokenize='unicode61 remove_diacritics 2', prefix='2 3')",
+    # Only approved opportunities are searchable, so pending rows never
+    # take up space in the index.
+    "CREATE TRIGGER IF NOT EXISTS opportunity_fts_insert AFTER INSERT ON opportunity "
+    "WHEN new.is_approved BEGIN "
+    "INSERT INTO opportunity_fts(rowid, title, description, category, location) "
+    "VALUES (new.id, new.title, new.description, new.category, new.location); END",
+    "CREATE TRIGGER IF NOT EXISTS opportunity_fts_update "
+    "AFTER UPDATE OF title, description, category, location, is_approved ON opportunity "
+    "BEGIN "
+    "DELETE FROM opportunity_fts WHERE rowid = old.id; "
+    "INSERT INTO opportunity_fts(rowid, title, description, category, location) "
+    "SELECT new.id, new.title, new.description, new.category, new.location "
+    "WHERE new.is_approved; END",
+    "CREATE TRIGGER IF NOT EXISTS opportunity_fts_delete AFTER DELETE ON opportunity "
+    "BEGIN DELETE FROM opportunity_fts WHERE rowid = old.id; END",
+]
+
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS opportunity_fts_insert",
+    "DROP TRIGGER IF EXISTS opportunity_fts_update",
+    "DROP TRIGGER IF EXISTS opportunity_fts_delete",
+    "DROP TABLE IF EXISTS opportunity_fts",
+]
+
+SQLITE_REBUILD = [
+    "DELETE FROM opportunity_fts",
+    "INSERT INTO opportunity_fts(rowid, title, description, category, location) "
+    "SELECT id, title, description, category, location FROM opportunity WHERE is_approved",
+    "INSERT INTO opportunity_fts(opportunity_fts) VALUES ('optimize')",
+]
+
+POSTGRES_CREATE = [
+    "CREATE INDEX IF NOT EXISTS ix_opportunity_search ON opportunity "
+    "USING gin ((" + PostgresSearchBackend.DOCUMENT + "))",
+]
+
+POSTGRES_DROP = [
+    "DROP INDEX IF EXISTS ix_opportunity_search",
+]
+
+
+def _sqlite_with_fts5(ddl, target, bind, **kw):
+    return bind.dialect.name == 'sqlite' and _sqlite_has_fts5(bind)
+
+
+def register_index_ddl(table):
+    """Attach the search index DDL to the opportunity table's create/drop"""
+    for statement in SQLITE_CREATE:
+        event.listen(table, 'after_create', DDL(statement).execute_if(callable_=_sqlite_with_fts5))
+    for statement in SQLITE_DROP:
+        event.listen(table, 'before_drop', DDL(statement).execute_if(callable_=_sqlite_with_fts5))
+    for statement in POSTGRES_CREATE:
+        event.listen(table, 'after_create', DDL(statement).execute_if(dialect='postgresql'))
+    for statement in POSTGRES_DROP:
+        event.listen(table, 'before_drop', DDL(statement).execute_if(dialect='postgresql'))
+
+
+def rebuild_index():
+    """Repopulate the index from the opportunity table"""
+    backend = get_backend()
+    if backend.name != 'sqlite':
+        # The Postgres index is an expression index and the LIKE backend has
+        # no index at all, so there is nothing to rebuild.
+        return None
+    for statement in SQLITE_REBUILD:
+        db.session.execute(text(statement))
+    db.session.commit()
+    return db.session.execute(text("SELECT count(*) FROM opportunity_fts")).scalar()
@@ -0,0 +1,197 @@
+# app/serving.py
+"""Production WSGI servers for the Socket.IO app.
+
+``serve(app, host, port)`` runs one worker process in the async mode
+Flask-SocketIO was initialized with (``SERVER_ASYNC_MODE``, resolved by
+``serve.py``):
+
+* ``threading`` - werkzeug's HTTP/1.1 handler on a bounded thread pool.  Each
+  open websocket holds a pool thread, so ``SERVER_THREADS`` caps both request
+  concurrency and live sockets per worker.  The handler speaks HTTP/1.1 only
+  so the websocket upgrade gets a valid ``101`` response: werkzeug still sends
+  ``Connection: close`` after every plain HTTP response, so keep-alive to
+  clients has to come from the load balancer in this mode.
+* ``eventlet`` / ``gevent`` - a green thread per connection, so thousands of
+  idle websockets are cheap; blocking calls must be monkey patched, which
+  ``serve.py`` does before importing the app.  ``SERVER_THREADS`` bounds the
+  green pool.
+
+``SERVER_KEEPALIVE`` is how long an idle connection is held open (between
+keep-alive requests in the green modes, or on a silent socket).  It should stay above the
+Engine.IO ping interval (25s) so websockets are not cut while idle.  On SIGTERM/SIGINT a worker stops accepting, disconnects its
+Socket.IO clients so they reconnect to another worker, and gives in-flight
+requests up to ``SERVER_DRAIN_TIMEOUT`` seconds to finish.
+"""
+import logging
+import signal
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+from app import socketio
+
+logger = logging.getLogger(__name__)
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """werkzeug WSGI server that handles connections on a bounded thread pool.
+
+    When every thread is busy the accept loop waits, leaving new connections
+    in the listen backlog instead of starting unbounded threads.
+    """
+
+    multithread = True
+
+    def __init__(self, host, port, app, threads=64, keepalive=75, backlog=128):
+        self.request_queue_size = backlog
+        # StreamRequestHandler applies `timeout` to the client socket.
+        # HTTP/1.1 is for the websocket handshake; werkzeug closes plain
+        # HTTP connections after one response whatever the version.
+        handler = type('PooledRequestHandler', (WSGIRequestHandler,), {
+            'protocol_version': 'HTTP/1.1',
+            'timeout': keepalive or None,
+        })
+        super().__init__(host, port, app, handler=handler)
+        self.draining = False
+        self._slots = threading.BoundedSemaphore(threads)
+        self._pool = ThreadPoolExecutor(threads, thread_name_prefix='wsgi')
+        self._idle = threading.Condition()
+        self._active = 0
+
+    def process_request(self, request, client_address):
+        while not self._slots.acquire(timeout=0.5):
+            if self.draining:
+                self.shutdown_request(request)
+                return
+        with self._idle:
+            self._active += 1
+        self._pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+            self._slots.release()
+            with self._idle:
+                self._active -= 1
+                self._idle.notify_all()
+
+    def wait_idle(self, timeout):
+        """Wait for in-flight connections; returns how many are still open"""
+        deadline = time.monotonic() + timeout
+        with self._idle:
+            while self._active and time.monotonic() < deadline:
+                self._idle.wait(deadline - time.monotonic())
+            return self._active
+
+    def server_close(self):
+        super().server_close()
+        self._pool.shutdown(wait=False)
+
+
+def _stop_event():
+    """An event set by SIGTERM/SIGINT"""
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        logger.info("Received signal %s, draining", signum)
+        stop.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    return stop
+
+
+def _disconnect_clients():
+    # Clients reconnect, and the load balancer sends them to a live worker.
+    # Don't wait for the close packet to be delivered: a long-polling client
+    # may never poll again.
+    eio = socketio.server.eio
+    for client in list(eio.sockets.values()):
+        try:
+            client.close(wait=False, reason=eio.reason.SERVER_DISCONNECT)
+        except Exception:
+            logger.exception("Could not disconnect Socket.IO client %s", client.sid)
+    eio.sockets = {}
+
+
+def _serve_threading(app, host, port, settings, stop):
+    server = PooledWSGIServer(host, port, app, threads=settings['threads'],
+                              keepalive=settings['keepalive'], backlog=settings['backlog'])
+    accept_loop = threading.Thread(target=server.serve_forever, name='wsgi-accept', daemon=True)
+    accept_loop.start()
+    logger.info("Serving on %s:%s (threading, %s threads)", host, server.port, settings['threads'])
+    stop.wait()
+
+    server.draining = True
+    server.shutdown()
+    server.socket.close()
+    _disconnect_clients()
+    remaining = server.wait_idle(settings['drain_timeout'])
+    if remaining:
+        logger.warning("Drain timed out with %s connections still open", remaining)
+    server.server_close()
+
+
+def _serve_eventlet(app, host, port, settings, stop):
+    import eventlet
+    import eventlet.wsgi
+
+    sock = eventlet.listen((host, port), backlog=settings['backlog'])
+    pool = eventlet.GreenPool(settings['threads'])
+    accept_loop = eventlet.spawn(
+        eventlet.wsgi.server, sock, app, custom_pool=pool, log_output=False,
+        keepalive=settings['keepalive'] or False,
+        socket_timeout=settings['keepalive'] or None,
+    )
+    logger.info("Serving on %s:%s (eventlet, %s green threads)", host, port, settings['threads'])
+    stop.wait()
+
+    accept_loop.kill()
+    sock.close()
+    _disconnect_clients()
+    with eventlet.Timeout(settings['drain_timeout'], False):
+        pool.waitall()
+
+
+def _serve_gevent(app, host, port, settings, stop):
+    from gevent.pool import Pool
+    from gevent.pywsgi import WSGIServer
+
+    try:
+        from geventwebsocket.handler import WebSocketHandler as handler_class
+    except ImportError:
+        from gevent.pywsgi import WSGIHandler as handler_class
+
+    server = WSGIServer((host, port), app, spawn=Pool(settings['threads']),
+                        handler_class=handler_class, backlog=settings['backlog'], log=None)
+    server.start()
+    logger.info("Serving on %s:%s (gevent, %s greenlets)", host, port, settings['threads'])
+    stop.wait()
+
+    server.close()
+    _disconnect_clients()
+    server.stop(timeout=settings['drain_timeout'])
+
+
+SERVERS = {
+    'threading': _serve_threading,
+    'eventlet': _serve_eventlet,
+    'gevent': _serve_gevent,
+}
+
+
+def serve(app, host='127.0.0.1', port=5000):
+    """Serve ``app`` until SIGTERM/SIGINT, then drain and return"""
+    settings = {
+        'threads': app.config['SERVER_THREADS'],
+        'keepalive': app.config['SERVER_KEEPALIVE'],
+        'backlog': app.config['SERVER_BACKLOG'],
+        'drain_timeout': app.config['SERVER_DRAIN_TIMEOUT'],
+    }
+    SERVERS[socketio.async_mode](app, host, port, settings, _stop_event())
@@ -0,0 +1,55 @@
+# app/signals.py
+from blinker import Namespace
+
+_signals = Namespace()
+
+# Sent (with the app as sender) after a commit that changes what the public
+# feed can show.  Receivers get:
+#   opportunity_ids - ids of the opportunities that changed
+#   membership      - True when the change can move opportunities into or out
+#                     of a filtered feed (create/approve/edit/delete), False
+#                     when only their engagement data changed
+feed_changed = _signals.signal('feed-changed')
+
+
+def notify_feed_changed(app, opportunity_ids, membership=True):
+    feed_changed.send(app, opportunity_ids=list(opportunity_ids), membership=membership)
+
+# Sent (with the app as sender) after a commit that created tags which were
+# not linked to an approved opportunity (those are covered by feed_changed).
+tags_changed = _signals.signal('tags-changed')
+
+
+def notify_tags_changed(app):
+    tags_changed.send(app)
+
+# Sent (with the app as sender) after a commit that changed one user's
+# reaction or bookmark on an opportunity.  Receivers get:
+#   opportunity_id - the opportunity that was reacted to or bookmarked
+#   change         - {'kind': 'reaction'|'bookmark', 'action': 'added'|
+#                    'changed'|'removed', 'type': reaction type or None,
+#                    'previous': old reaction type or None, 'user_id': id}
+engagement_changed = _signals.signal('engagement-changed')
+
+
+def notify_engagement_changed(app, opportunity_id, kind, action, user_id,
+                              reaction_type=None, previous=None):
+    engagement_changed.send(app, opportunity_id=opportunity_id, change={
+        'kind': kind,
+        'action': action,
+        'type': reaction_type,
+        'previous': previous,
+        'user_id': user_id,
+    })
+
+# Sent (with the app as sender) once per committed moderation batch (see
+# app/moderation.py).  Receivers get:
+#   action       - 'approve', 'reject', 'delete' or 'mark_reviewed'
+#   moderator_id - id of the user who acted
+#   results      - {id: outcome} for every id in the request
+moderation_performed = _signals.signal('moderation-performed')
+
+# Sent (with the app as sender) from a job worker's thread whenever it finds
+# no job due, and once more when it stops (see app/jobs.py).  Lets tasks
+# release what they keep open between jobs, such as an SMTP connection.
+worker_idle = _signals.signal('worker-idle')
@@ -0,0 +1,249 @@
+# app/suggest.py
+"""Typeahead for tags and locations.
+
+``/suggest`` answers from two in-memory prefix tries, one of tag names and
+one of the locations of approved opportunities, each ranked by how many
+approved opportunities use the value.  Every trie node keeps its own top
+``SUGGEST_MAX_RESULTS`` completions, so a lookup walks the prefix and copies
+one short list no matter how many values share the prefix.
+
+Locations are free text; they are matched case- and whitespace-
+insensitively, so "Oak  Park" and "oak park" count as one value, shown in
+its most common spelling.
+
+The index is built on first use and kept current from ``feed_changed``: the
+changed opportunities are re-read and only the difference from what they
+contributed before is applied.  It is rebuilt from scratch after
+``SUGGEST_REBUILD_SECONDS`` to pick up changes made by other worker
+processes.
+"""
+import heapq
+import threading
+import time
+from collections import Counter
+
+from flask import current_app
+
+from app import db
+from app.cache import SingleFlight
+from app.models import Opportunity, Tag, opportunity_tags
+from app.signals import feed_changed
+
+KINDS = ('tag', 'location')
+
+
+def suggest_key(value):
+    """Lookup form of a tag or location"""
+    return ' '.join(value.split()).casefold()
+
+
+class _Node:
+    __slots__ = ('children', 'terminal', 'best')
+
+    def __init__(self):
+        self.children = {}
+        self.terminal = False
+        self.best = []
+
+
+class PrefixTrie:
+    """Counted values under a trie whose nodes cache their top completions.
+
+    Not thread-safe; ``SuggestIndex`` serializes access.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.root = _Node()
+        self.counts = {}        # key -> count
+        self.spellings = {}     # key -> Counter of display forms
+
+    def _rank(self, key):
+        return (-self.counts[key], key)
+
+    def _refresh(self, node, key):
+        # A node's best list is drawn from its own value and its children's
+        candidates = {key} if node.terminal else set()
+        for child in node.children.values():
+            candidates.update(child.best)
+        node.best = heapq.nsmallest(self.size, candidates, key=self._rank)
+
+    def _node(self, key):
+        """The path of nodes from the root to ``key``, creating them"""
+        path = [self.root]
+        for char in key:
+            path.append(path[-1].children.setdefault(char, _Node()))
+        return path
+
+    def _count(self, key, delta, spelling):
+        count = self.counts.get(key, 0) + delta
+        if count > 0:
+            self.counts[key] = count
+            if spelling is not None:
+                spellings = self.spellings.setdefault(key, Counter())
+                spellings[spelling] += delta
+                if spellings[spelling] <= 0:
+                    del spellings[spelling]
+        else:
+            self.counts.pop(key, None)
+            self.spellings.pop(key, None)
+        return count > 0
+
+    def add(self, key, delta, spelling=None):
+        """Change ``key``'s count by ``delta``, dropping it when it reaches 0"""
+        path = self._node(key)
+        path[-1].terminal = self._count(key, delta, spelling)
+        # Only the nodes on this key's path can change their best lists
+        for depth in range(len(path) - 1, -1, -1):
+            node = path[depth]
+            if depth and not node.terminal and not node.children:
+                del path[depth - 1].children[key[depth - 1]]
+            else:
+                self._refresh(node, key[:depth])
+
+    def load(self, values):
+        """Bulk-add ``(key, spelling)`` pairs, refreshing every node once"""
+        for key, spelling in values:
+            self._node(key)[-1].terminal = self._count(key, 1, spelling)
+
+        def refresh(node, key):
+            for char, child in node.children.items():
+                refresh(child, key + char)
+            self._refresh(node, key)
+
+        refresh(self.root, '')
+
+    def search(self, prefix, limit):
+        node = self.root
+        for char in prefix:
+            node = node.children.get(char)
+            if node is None:
+                return []
+        return [{'value': self.display(key), 'count': self.counts[key]}
+                for key in node.best[:limit]]
+
+    def display(self, key):
+        spellings = self.spellings.get(key)
+        if spellings:
+            # Most common spelling; ties go to the alphabetically first
+            return min(spellings.items(), key=lambda item: (-item[1], item[0]))[0]
+        return key
+
+
+def _load_sources(ids=None):
+    """``{opportunity_id: (location, tag names)}`` for approved opportunities"""
+    locations = db.select(Opportunity.id, Opportunity.location).where(
+        Opportunity.is_approved.is_(True))
+    tags = (db.select(opportunity_tags.c.opportunity_id, Tag.name)
+            .join(Tag, Tag.id == opportunity_tags.c.tag_id)
+            .join(Opportunity, Opportunity.id == opportunity_tags.c.opportunity_id)
+            .where(Opportunity.is_approved.is_(True)))
+    if ids is not None:
+        locations = locations.where(Opportunity.id.in_(ids))
+        tags = tags.where(opportunity_tags.c.opportunity_id.in_(ids))
+
+    names = {}
+    for opportunity_id, name in db.session.execute(tags):
+        names.setdefault(opportunity_id, []).append(name)
+    return {opportunity_id: (' '.join(location.split()), tuple(sorted(names.get(opportunity_id, ()))))
+            for opportunity_id, location in db.session.execute(locations)}
+
+
+class SuggestIndex:
+    """Tag and location tries plus what each opportunity put into them."""
+
+    def __init__(self, size, sources):
+        self.lock = threading.Lock()
+        self.built_at = time.monotonic()
+        self.tries = {kind: PrefixTrie(size) for kind in KINDS}
+        self.sources = sources
+        self.tries['location'].load(
+            (suggest_key(location), location) for location, _ in sources.values() if location)
+        self.tries['tag'].load(
+            (name, None) for _, names in sources.values() for name in names)
+
+    def _apply(self, source, delta):
+        location, names = source
+        if location:
+            self.tries['location'].add(suggest_key(location), delta, location)
+        for name in names:
+            self.tries['tag'].add(name, delta)
+
+    def update(self, ids, sources):
+        """Replace what opportunities ``ids`` contribute with ``sources``"""
+        with self.lock:
+            for opportunity_id in ids:
+                old = self.sources.pop(opportunity_id, None)
+                new = sources.get(opportunity_id)
+                if old == new:
+                    if new is not None:
+                        self.sources[opportunity_id] = new
+                    continue
+                if old is not None:
+                    self._apply(old, -1)
+                if new is not None:
+                    self._apply(new, 1)
+                    self.sources[opportunity_id] = new
+
+    def search(self, kind, prefix, limit):
+        with self.lock:
+            return self.tries[kind].search(suggest_key(prefix), limit)
+
+
+class Suggester:
+    """Owns the app's ``SuggestIndex``, building it on first use."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('SUGGEST_MAX_RESULTS', 10)
+        app.config.setdefault('SUGGEST_REBUILD_SECONDS', 600)
+        app.extensions['suggest'] = {'index': None, 'changes': 0, 'flights': SingleFlight()}
+
+    @staticmethod
+    def _state(app=None):
+        return (app or current_app).extensions['suggest']
+
+    def index(self):
+        state = self._state()
+        index = state['index']
+        max_age = current_app.config['SUGGEST_REBUILD_SECONDS']
+        if index is not None and time.monotonic() - index.built_at < max_age:
+            return index
+
+        def build():
+            current = state['index']
+            if current is not None and time.monotonic() - current.built_at < max_age:
+                return current
+            changes = state['changes']
+            index = SuggestIndex(current_app.config['SUGGEST_MAX_RESULTS'], _load_sources())
+            if state['changes'] != changes:
+                # Something changed while the rows were read; serve this
+                # index once but build again on the next request
+                index.built_at -= max_age
+            state['index'] = index
+            return index
+
+        return state['flights'].do('build', build)
+
+    def search(self, kind, prefix, limit):
+        return self.index().search(kind, prefix, limit)
+
+    def refresh(self, app, opportunity_ids):
+        """Re-read ``opportunity_ids`` and apply what changed"""
+        state = self._state(app)
+        state['changes'] += 1
+        index = state['index']
+        if index is not None and opportunity_ids:
+            index.update(opportunity_ids, _load_sources(opportunity_ids))
+
+
+suggester = Suggester()
+
+
+@feed_changed.connect
+def _feed_changed(app, opportunity_ids=(), membership=True, **kwargs):
+    if membership and 'suggest' in app.extensions:
+        suggester.refresh(app, opportunity_ids)
@@ -0,0 +1,288 @@
+# app/tags.py
+"""Tag normalization and batched resolution.
+
+Tag names are case-folded with whitespace collapsed, so "Climate  Action"
+and "climate action" are the same tag.  ``set_opportunity_tags`` turns a
+post's tag names into ids through ``tag_cache.resolve(names)``: names are
+looked up in a bounded in-process name -> id cache first, the misses are
+read in one query, and any still missing are created in one
+``INSERT ... ON CONFLICT DO NOTHING`` and read back, so two posters
+inventing the same tag at once both succeed and share one row.
+
+Cached ids are dropped whenever a Tag row is updated or deleted through the
+ORM; set-based changes should call ``tag_cache.clear()``.  ``TAG_CACHE_TTL``
+bounds staleness for changes made by other worker processes.
+
+The feed's exact tag filter (``exact_tag_filter``) works on posting lists:
+the ids of the approved opportunities carrying a tag, read through the
+``opportunity_tags`` primary key, (tag_id, opportunity_id).  Lists of the
+most recently used tags are kept in memory by ``posting_cache`` and
+intersected (all tags) or merged (any tag) in Python; tags with more than
+``TAG_POSTINGS_MAX_IDS`` opportunities are left to the database, and so is a
+result longer than ``TAG_FILTER_MAX_INLINE_IDS``, which would otherwise be
+sent back as one huge ``IN (...)`` list.
+"""
+from datetime import datetime
+
+from flask import current_app, has_app_context
+from sqlalchemy import event, false, func
+
+from app import db
+from app.cache import LocalCache
+from app.models import _UPSERT_INSERTS, Opportunity, Tag, opportunity_tags
+from app.signals import feed_changed
+
+TAG_MODES = ('all', 'any')
+TAG_MATCHES = ('contains', 'exact')
+
+_MISSING = object()
+
+MAX_NAME_LENGTH = Tag.name.type.length
+
+
+def normalize(name):
+    """Canonical form of a tag name; '' when nothing is left"""
+    return ' '.join(name.split()).casefold()[:MAX_NAME_LENGTH].strip()
+
+
+def parse_tags(raw):
+    """Normalized, de-duplicated tag names from "a, b" or ["a", "b"], in order"""
+    if isinstance(raw, str):
+        raw = raw.split(',')
+    names = (normalize(name) for name in raw if isinstance(name, str))
+    return list(dict.fromkeys(name for name in names if name))
+
+
+class TagCache:
+    """Bounded name -> id cache in front of the tag table."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('TAG_CACHE_MAX_ENTRIES', 4096)
+        app.config.setdefault('TAG_CACHE_TTL', 300)
+        app.extensions['tag_cache'] = LocalCache(
+            max_entries=app.config['TAG_CACHE_MAX_ENTRIES'],
+            ttl=app.config['TAG_CACHE_TTL'],
+        )
+
+    @staticmethod
+    def _cache(app=None):
+        return (app or current_app).extensions['tag_cache']
+
+    def lookup(self, names):
+        """``{name: id}`` for the existing tags among normalized ``names``"""
+        cache = self._cache()
+        generation = cache.generation
+        ids = {}
+        missing = []
+        for name in names:
+            tag_id = cache.get(name)
+            if tag_id is None:
+                missing.append(name)
+            else:
+                ids[name] = tag_id
+        if missing:
+            found = self._lookup(missing)
+            for name, tag_id in found.items():
+                cache.set(name, tag_id, generation=generation)
+            ids.update(found)
+        return ids
+
+    def resolve(self, names):
+        """Ids for already-normalized ``names``, creating missing tags.
+
+        Runs inside the caller's transaction; returns ``({name: id}, names
+        that were not tags before)``.
+        """
+        ids = self.lookup(names)
+        absent = [name for name in names if name not in ids]
+        if absent:
+            ids.update(self.create(absent))
+        return ids, absent
+
+    def create(self, names):
+        """Insert tags ``names`` unless they exist; returns ``{name: id}``"""
+        insert = _UPSERT_INSERTS[db.session.get_bind().dialect.name]
+        db.session.execute(
+            insert(Tag).values([{'name': name} for name in names])
+            .on_conflict_do_nothing(index_elements=['name'])
+        )
+        # A row another transaction inserted first is skipped by the upsert,
+        # so read every id back.  They are not cached: if the caller rolls
+        # back, the new tags never existed.
+        return self._lookup(names)
+
+    @staticmethod
+    def _lookup(names):
+        rows = db.session.execute(db.select(Tag.name, Tag.id).where(Tag.name.in_(names)))
+        return dict(rows.all())
+
+    def clear(self, app=None):
+        self._cache(app).clear()
+
+    def stats(self):
+        return self._cache().stats()
+
+
+tag_cache = TagCache()
+
+
+def set_opportunity_tags(opportunity_id, names, replace=True):
+    """Link an opportunity to the tags ``names``, replacing its current ones.
+
+    Pass ``replace=False`` for a new opportunity, which has none yet.
+    Returns the names that were not tags before, so the caller can send
+    ``tags_changed`` once it has committed.
+    """
+    ids, created = tag_cache.resolve(names)
+    if replace:
+        db.session.execute(
+            db.delete(opportunity_tags).where(opportunity_tags.c.opportunity_id == opportunity_id)
+        )
+        # The opportunity's own row may not change, but its representation does
+        db.session.execute(
+            db.update(Opportunity).where(Opportunity.id == opportunity_id)
+            .values(updated_at=datetime.utcnow())
+        )
+    if ids:
+        db.session.execute(opportunity_tags.insert(), [
+            {'opportunity_id': opportunity_id, 'tag_id': ids[name]} for name in names
+        ])
+    return created
+
+
+@event.listens_for(Tag, 'after_update')
+@event.listens_for(Tag, 'after_delete')
+def _tag_changed(mapper, connection, target):
+    # A rename or delete makes cached ids wrong; dropping everything is
+    # cheap because tags change rarely
+    if has_app_context() and 'tag_cache' in current_app.extensions:
+        tag_cache.clear()
+
+
+class PostingCache:
+    """Approved opportunity ids per tag id, for the most recently used tags.
+
+    A tag with more than ``TAG_POSTINGS_MAX_IDS`` approved opportunities is
+    remembered as too big (``None``) rather than held in memory.  Everything
+    is dropped when the feed's membership changes.
+    """
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('TAG_POSTINGS_MAX_ENTRIES', 256)
+        app.config.setdefault('TAG_POSTINGS_MAX_IDS', 5000)
+        app.config.setdefault('TAG_FILTER_MAX_INLINE_IDS', 500)
+        app.config.setdefault('TAG_POSTINGS_TTL', 300)
+        app.extensions['tag_postings'] = LocalCache(
+            max_entries=app.config['TAG_POSTINGS_MAX_ENTRIES'],
+            ttl=app.config['TAG_POSTINGS_TTL'],
+        )
+
+    @staticmethod
+    def _cache(app=None):
+        return (app or current_app).extensions['tag_postings']
+
+    def get_many(self, tag_ids):
+        """``{tag_id: frozenset of opportunity ids, or None if too big}``"""
+        cache = self._cache()
+        generation = cache.generation
+        postings = {}
+        missing = []
+        for tag_id in tag_ids:
+            posting = cache.get(tag_id, _MISSING)
+            if posting is _MISSING:
+                missing.append(tag_id)
+            else:
+                postings[tag_id] = posting
+        if missing:
+            loaded = self._load(missing)
+            for tag_id, posting in loaded.items():
+                cache.set(tag_id, posting, generation=generation)
+            postings.update(loaded)
+        return postings
+
+    @staticmethod
+    def _load(tag_ids):
+        # Count first so a tag on half the table is never pulled into memory
+        limit = current_app.config['TAG_POSTINGS_MAX_IDS']
+        approved = db.and_(Opportunity.id == opportunity_tags.c.opportunity_id,
+                           Opportunity.is_approved.is_(True))
+        counts = dict(db.session.execute(
+            db.select(opportunity_tags.c.tag_id, func.count())
+            .join(Opportunity, approved)
+            .where(opportunity_tags.c.tag_id.in_(tag_ids))
+            .group_by(opportunity_tags.c.tag_id)
+        ).all())
+        small = [tag_id for tag_id in tag_ids if counts.get(tag_id, 0) <= limit]
+        postings = {tag_id: None for tag_id in tag_ids}
+        members = {tag_id: set() for tag_id in small}
+        if any(counts.get(tag_id) for tag_id in small):
+            rows = db.session.execute(
+                db.select(opportunity_tags.c.tag_id, opportunity_tags.c.opportunity_id)
+                .join(Opportunity, approved)
+                .where(opportunity_tags.c.tag_id.in_(small))
+            )
+            for tag_id, opportunity_id in rows:
+                members[tag_id].add(opportunity_id)
+        postings.update({tag_id: frozenset(ids) for tag_id, ids in members.items()})
+        return postings
+
+    def clear(self, app=None):
+        self._cache(app).clear()
+
+    def stats(self):
+        return self._cache().stats()
+
+
+posting_cache = PostingCache()
+
+
+def _sql_postings(tag_ids, mode):
+    postings = db.select(opportunity_tags.c.opportunity_id).where(
+        opportunity_tags.c.tag_id.in_(tag_ids))
+    if mode == 'all' and len(tag_ids) > 1:
+        postings = postings.group_by(opportunity_tags.c.opportunity_id).having(
+            func.count() == len(tag_ids))
+    return Opportunity.id.in_(postings)
+
+
+def exact_tag_filter(names, mode='all'):
+    """Criterion for opportunities tagged with all (or any) of normalized ``names``"""
+    ids = tag_cache.lookup(names)
+    if not ids or (mode == 'all' and len(ids) < len(names)):
+        # An unknown tag can never be matched
+        return false()
+    postings = posting_cache.get_many(list(ids.values()))
+    cached = [posting for posting in postings.values() if posting is not None]
+    too_big = [tag_id for tag_id, posting in postings.items() if posting is None]
+
+    if mode == 'any':
+        if too_big:
+            return _sql_postings(list(postings), mode)
+        matched = frozenset().union(*cached)
+    else:
+        if not cached:
+            return _sql_postings(too_big, mode)
+        # The in-memory lists already bound the result; the big tags only
+        # need checking against those few candidates
+        matched = frozenset.intersection(*cached)
+    if len(matched) > current_app.config['TAG_FILTER_MAX_INLINE_IDS']:
+        # Binding thousands of ids costs more than the index lookup
+        return _sql_postings(list(postings), mode)
+    if matched and too_big:
+        return db.and_(Opportunity.id.in_(sorted(matched)), _sql_postings(too_big, mode))
+    return Opportunity.id.in_(sorted(matched)) if matched else false()
+
+
+@feed_changed.connect
+def _clear_postings(app, membership=True, **kwargs):
+    # Engagement-only changes never add or remove tagged opportunities
+    if membership and 'tag_postings' in app.extensions:
+        posting_cache.clear(app)
@@ -0,0 +1,100 @@
+# app/user_cache.py
+"""Cached Flask-Login user loader.
+
+Every authenticated request loads its user.  ``UserCache`` keeps an
+immutable ``UserSnapshot`` of each recently seen user for ``USER_CACHE_TTL``
+seconds, so most requests skip that query.  A snapshot holds what request
+handling reads from ``current_user`` (id, role, account state) and no
+password hash; a handler that needs to change the user loads the row.
+
+Routes that change a user's role or account state, or delete the user, call
+``invalidate`` after committing so the very next request sees the change.
+ORM updates and deletes of a user also evict it when they flush, which
+covers other code paths.  The TTL bounds how long a change made by another
+worker process goes unseen.
+"""
+from flask import current_app, has_app_context
+from flask_login import UserMixin
+from sqlalchemy import event
+
+from app import db, login
+from app.cache import LocalCache
+from app.models import User
+
+
+class UserSnapshot(UserMixin):
+    """Read-only copy of the ``User`` columns ``current_user`` is used for."""
+
+    __slots__ = ('id', 'username', 'email', 'role', 'account_active', 'is_banned')
+
+    def __init__(self, user):
+        for name in self.__slots__:
+            object.__setattr__(self, name, getattr(user, name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError(f"{type(self).__name__} is read-only")
+
+    def to_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+    def __repr__(self):
+        return f"<UserSnapshot {self.username} (Role: {self.role}, Active: {self.account_active})>"
+
+
+class UserCache:
+    """Bounded user id -> ``UserSnapshot`` cache behind the user loader."""
+
+    def __init__(self, app=None):
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('USER_CACHE_MAX_ENTRIES', 10000)
+        app.config.setdefault('USER_CACHE_TTL', 60)
+        app.extensions['user_cache'] = LocalCache(
+            max_entries=app.config['USER_CACHE_MAX_ENTRIES'],
+            ttl=app.config['USER_CACHE_TTL'],
+        )
+
+    @staticmethod
+    def _cache(app=None):
+        return (app or current_app).extensions['user_cache']
+
+    def get(self, user_id):
+        """Snapshot of user ``user_id``, or None if there is no such user"""
+        cache = self._cache()
+        snapshot = cache.get(user_id)
+        if snapshot is not None:
+            return snapshot
+        generation = cache.generation
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        snapshot = UserSnapshot(user)
+        # Skipped if the user was invalidated while the row was read
+        cache.set(user_id, snapshot, generation=generation)
+        return snapshot
+
+    def invalidate(self, user_id, app=None):
+        self._cache(app).delete(user_id)
+
+    def clear(self, app=None):
+        self._cache(app).clear()
+
+    def stats(self):
+        return self._cache().stats()
+
+
+user_cache = UserCache()
+
+
+@login.user_loader
+def load_user(user_id):
+    return user_cache.get(int(user_id))
+
+
+@event.listens_for(User, 'after_update')
+@event.listens_for(User, 'after_delete')
+def _user_changed(mapper, connection, target):
+    if has_app_context() and 'user_cache' in current_app.extensions:
+        user_cache.invalidate(target.id)
@@ -0,0 +1,109 @@
+# app/users.py
+"""Admin user search.
+
+Lists users in keyset pages with case-insensitive prefix search on username
+and email, filters on role and account state, and a choice of sort order.
+Every filter and sort has an index behind it (see ``User.__table_args__``):
+
+* prefix search - ``lower(username)`` / ``lower(email)`` expression indexes,
+  matched with a range on SQLite and with ``LIKE 'prefix%'`` on Postgres,
+  whose indexes use ``text_pattern_ops``.  SQLite's ``lower()`` only folds
+  ASCII letters, so there the search ignores case for A-Z alone: "émile"
+  does not find "Émile"
+* sort by username/email - their unique indexes; id - the primary key
+* ``role`` - ``(role, id)``; suspended/banned - partial indexes on ``id``
+
+Totals are optional because counting a large filtered table is the slow
+part.  ``count_users`` either asks the Postgres planner for its row estimate
+or counts up to ``ADMIN_USER_COUNT_CAP`` rows and says whether it stopped.
+"""
+import json
+import string
+import sys
+
+from flask import current_app
+from sqlalchemy import func
+
+from app import db
+from app.models import User
+
+ROLES = ('user', 'moderator', 'admin')
+
+# ?sort= value -> keyset keys; id breaks ties so every key is unique
+SORTS = {
+    'id': [(User.id, False)],
+    '-id': [(User.id, True)],
+    'username': [(User.username, False), (User.id, False)],
+    '-username': [(User.username, True), (User.id, True)],
+    'email': [(User.email, False), (User.id, False)],
+    '-email': [(User.email, True), (User.id, True)],
+}
+
+
+# What SQLite's lower() does: A-Z only
+_ASCII_LOWER = str.maketrans(string.ascii_uppercase, string.ascii_lowercase)
+_SURROGATES = range(0xD800, 0xE000)
+
+
+def _successor(char):
+    """The next code point after ``char`` that can be stored in a string"""
+    code = ord(char) + 1
+    return chr(_SURROGATES.stop if code in _SURROGATES else code)
+
+
+def _escape_like(value):
+    return value.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+
+
+def prefix_match(column, prefix):
+    """Case-insensitive "column starts with prefix" that can use lower(column) indexes"""
+    expression = func.lower(column)
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return expression.like(_escape_like(prefix.lower()) + '%', escape='\\')
+    # A half-open range over the binary-collated index: every string that
+    # starts with the prefix sorts at or after it and before its successor.
+    # The prefix is folded the way lower() folds the column, and a trailing
+    # U+10FFFF has no successor, so the range ends after the character
+    # before it instead.
+    prefix = prefix.translate(_ASCII_LOWER)
+    stem = prefix.rstrip(chr(sys.maxunicode))
+    if not stem:
+        return expression >= prefix
+    upper = stem[:-1] + _successor(stem[-1])
+    return db.and_(expression >= prefix, expression < upper)
+
+
+def search_query(q='', role=None, active=None, banned=None):
+    query = User.query
+    if q:
+        query = query.filter(db.or_(prefix_match(User.username, q), prefix_match(User.email, q)))
+    if role:
+        query = query.filter(User.role == role)
+    # Compared with == so the filters match the partial index predicates
+    if active is not None:
+        query = query.filter(User.account_active == active)
+    if banned is not None:
+        query = query.filter(User.is_banned == banned)
+    return query
+
+
+def _planner_estimate(query):
+    # Search terms stay bound parameters.  The statement is compiled in the
+    # driver's paramstyle, so it and its params go to the driver unchanged
+    statement = query.statement.compile(
+        dialect=db.session.get_bind().dialect, compile_kwargs={'render_postcompile': True})
+    plan = db.session.connection().exec_driver_sql(
+        'EXPLAIN (FORMAT JSON) ' + str(statement), statement.params).scalar()
+    if isinstance(plan, str):
+        plan = json.loads(plan)
+    return int(plan[0]['Plan']['Plan Rows'])
+
+
+def count_users(query):
+    """``{'value': n, 'exact': bool}`` without counting the whole table"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        return {'value': _planner_estimate(query.order_by(None)), 'exact': False}
+    cap = current_app.config['ADMIN_USER_COUNT_CAP']
+    limited = query.order_by(None).with_entities(User.id).limit(cap + 1).subquery()
+    value = db.session.execute(db.select(func.count()).select_from(limited)).scalar()
+    return {'value': min(value, cap), 'exact': value <= cap}
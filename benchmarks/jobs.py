@@ -0,0 +1,93 @@
+"""Enqueue and dequeue throughput of the database job queue.
+
+    PYTHONPATH=. python benchmarks/jobs.py [--jobs 5000] [--workers 2]
+
+Runs on a scratch SQLite database.  Enqueue is timed with one commit per
+job, as a request enqueuing one job does, and with 100 jobs per commit.
+Dequeue is timed for a no-op task with one worker at a few batch sizes,
+then with ``--workers`` worker processes sharing the queue.
+"""
+import argparse
+import multiprocessing
+import os
+import tempfile
+import time
+
+from app import create_app, db
+from app.jobs import Worker, job
+
+BATCH_SIZES = (1, 10, 100)
+
+
+@job(name='benchmarks.noop')
+def noop(i):
+    pass
+
+
+def fresh_app():
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def enqueue(app, count, per_commit):
+    with app.app_context():
+        started = time.perf_counter()
+        for i in range(count):
+            noop.delay(i)
+            if (i + 1) % per_commit == 0:
+                db.session.commit()
+        db.session.commit()
+        return count / (time.perf_counter() - started)
+
+
+def work(batch_size, queue):
+    app = create_app()
+    started = time.perf_counter()
+    ran = Worker(app, batch_size=batch_size, poll_seconds=0).run(until_idle=True)
+    queue.put((ran, time.perf_counter() - started))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--jobs', type=int, default=5000)
+    parser.add_argument('--workers', type=int, default=2)
+    args = parser.parse_args()
+
+    fd, scratch = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    os.environ['DATABASE_URL'] = f'sqlite:///{scratch}'
+    try:
+        app = fresh_app()
+        print(f"{args.jobs} jobs")
+        for per_commit in (1, 100):
+            rate = enqueue(fresh_app(), args.jobs, per_commit)
+            print(f"  enqueue, {per_commit:3} per commit   {rate:8.0f} jobs/s")
+
+        for batch_size in BATCH_SIZES:
+            enqueue(fresh_app(), args.jobs, 100)
+            started = time.perf_counter()
+            ran = Worker(app, batch_size=batch_size, poll_seconds=0).run(until_idle=True)
+            rate = ran / (time.perf_counter() - started)
+            print(f"  dequeue, 1 worker, batch {batch_size:3}  {rate:8.0f} jobs/s")
+
+        enqueue(fresh_app(), args.jobs, 100)
+        queue = multiprocessing.Queue()
+        started = time.perf_counter()
+        processes = [multiprocessing.Process(target=work, args=(10, queue)) for _ in range(args.workers)]
+        for process in processes:
+            process.start()
+        results = [queue.get() for _ in processes]
+        for process in processes:
+            process.join()
+        ran = sum(count for count, _ in results)
+        print(f"  dequeue, {args.workers} workers, batch  10  "
+              f"{ran / (time.perf_counter() - started):8.0f} jobs/s ({ran} jobs)")
+    finally:
+        os.unlink(scratch)
+
+
+if __name__ == '__main__':
+    main()
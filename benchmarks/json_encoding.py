@@ -0,0 +1,90 @@
+"""Encode representative feed payloads with each JSON backend, then compress.
+
+    python benchmarks/json_encoding.py [--pages 200] [--per-page 20]
+
+Payloads have the shape of ``/`` responses built from ``Opportunity.to_dict``:
+datetimes left for the encoder, tags, reaction counts and, for the
+``expand`` variant, embedded reaction and bookmark lists.  No database or
+server is needed.
+"""
+import argparse
+import gzip
+import random
+import time
+import zlib
+from datetime import datetime, timedelta
+
+from flask import Flask
+
+from app.json_provider import JSONProvider, orjson
+
+
+def opportunity(rng, i, expand):
+    created = datetime(2026, 1, 1) + timedelta(minutes=rng.randrange(500000))
+    data = {
+        'id': i,
+        'title': f'Volunteer opportunity {i}',
+        'description': ' '.join(rng.choice(('help', 'community', 'garden', 'tutor', 'weekly',
+                                            'food bank', 'shift', 'youth')) for _ in range(60)),
+        'category': rng.choice(('Education', 'Climate', 'Health', 'Youth')),
+        'location': rng.choice(('Oak Park', 'Riverside', 'Downtown', 'North Hills')),
+        'latitude': 51.5 + rng.random(), 'longitude': -0.1 + rng.random(),
+        'tags': [{'id': t, 'name': f'tag {t}'} for t in rng.sample(range(200), 4)],
+        'is_approved': True,
+        'created_at': created,
+        'updated_at': created + timedelta(hours=rng.randrange(100)),
+        'approved_by': 'moderator',
+        'user_id': rng.randrange(1000),
+        'username': f'user{rng.randrange(1000)}',
+        'reaction_counts': {'like': rng.randrange(50), 'love': rng.randrange(20), 'wow': rng.randrange(5)},
+        'bookmark_count': rng.randrange(30),
+    }
+    if expand:
+        data['reactions'] = [{'id': r, 'user_id': r, 'opportunity_id': i, 'reaction_type': 'like',
+                              'timestamp': created} for r in range(40)]
+        data['bookmarks'] = [{'id': b, 'user_id': b, 'opportunity_id': i, 'created_at': created}
+                             for b in range(15)]
+    return data
+
+
+def payloads(pages, per_page, expand, seed=1):
+    rng = random.Random(seed)
+    return [{
+        'opportunities': [opportunity(rng, page * per_page + i, expand) for i in range(per_page)],
+        'pagination': {'per_page': per_page, 'total_items': pages * per_page,
+                       'next_cursor': 'eyJrIjpbMV19', 'has_more': True, 'page': page + 1},
+    } for page in range(pages)]
+
+
+def timed(fn, items):
+    started = time.perf_counter()
+    results = [fn(item) for item in items]
+    return (time.perf_counter() - started) / len(items), results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--pages', type=int, default=200)
+    parser.add_argument('--per-page', type=int, default=20)
+    args = parser.parse_args()
+
+    backends = ['stdlib'] + (['orjson'] if orjson is not None else [])
+    for expand in (False, True):
+        pages = payloads(args.pages, args.per_page, expand)
+        print(f"\n{args.per_page} opportunities per page{', expanded' if expand else ''}")
+        for backend in backends:
+            app = Flask(__name__)
+            app.config['JSON_BACKEND'] = backend
+            provider = JSONProvider(app)
+            encode, bodies = timed(lambda page: provider.dumpb(page, separators=(',', ':')), pages)
+            size = sum(map(len, bodies)) / len(bodies)
+            print(f"  {backend:7} encode {encode * 1e6:8.0f} us  {size / 1024:6.1f} KiB")
+        for name, compress in (('gzip-6', lambda body: gzip.compress(body, 6, mtime=0)),
+                               ('deflate-6', lambda body: zlib.compress(body, 6))):
+            seconds, compressed = timed(compress, bodies)
+            ratio = sum(map(len, compressed)) / sum(map(len, bodies))
+            print(f"  {name:9} {seconds * 1e6:11.0f} us  {ratio:6.1%} of encoded size")
+
+
+if __name__ == '__main__':
+    main()
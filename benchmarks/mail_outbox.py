@@ -0,0 +1,154 @@
+"""Password reset mail: sent inline per message versus queued for the job workers.
+
+    PYTHONPATH=. python benchmarks/mail_outbox.py [--emails 2000] [--handshake-ms 20] [--message-ms 0]
+
+Runs the app in-process on a scratch SQLite database against the local SMTP
+stub from the tests.  The stub sleeps ``--handshake-ms`` before greeting each
+connection, standing in for the connect, STARTTLS and AUTH round trips of a
+real mail server, and ``--message-ms`` before accepting each message.
+
+First a reset token and ``outbox.queue`` are timed for ``--emails`` users,
+one transaction each, which is what a request pays to send a reset link.
+Then ``mail.send`` is timed for ``--inline`` messages, one connection each,
+which is the cost a request would pay if it sent the mail itself.  Finally
+the queued messages are sent by one and by ``--workers`` job workers, each
+reusing its connection across batches of ``--batch-size`` jobs.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from flask_mail import Message
+
+from app import create_app, db, mail
+from app.jobs import Worker
+from app.models import Job, PasswordResetToken, User
+from app.outbox import outbox, send_mail
+from tests.smtp_stub import SMTPStub
+
+RESET_URL = 'http://localhost:5173/reset-password?token={token}'
+
+
+def fresh_app(stub, database):
+    os.environ.update({
+        'DATABASE_URL': f'sqlite:///{database}',
+        'MAIL_SERVER': stub.host,
+        'MAIL_PORT': str(stub.port),
+        'MAIL_USE_TLS': 'False',
+        'MAIL_USE_SSL': 'False',
+        'MAIL_USERNAME': '',
+        'MAIL_PASSWORD': '',
+        'MAIL_DEFAULT_SENDER': 'noreply@example.com',
+    })
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+    return app
+
+
+def queue_resets(app, count):
+    """Create a token and queue a reset mail for ``count`` new users; returns latencies"""
+    with app.app_context():
+        db.session.add_all(User(username=f'user{i}', email=f'user{i}@example.com',
+                                password_hash='unused') for i in range(count))
+        db.session.commit()
+        # Plain rows: a session holding thousands of users would slow every commit
+        users = db.session.execute(
+            db.select(User.id, User.username, User.email).order_by(User.id)).all()
+        latencies = []
+        for user in users:
+            started = time.perf_counter()
+            token = PasswordResetToken(user.id)
+            db.session.add(token)
+            outbox.queue(
+                "Reset your Community Connect password",
+                [user.email],
+                f"Hi {user.username},\n\n"
+                f"Use this link within 24 hours to choose a new password:\n\n"
+                f"{RESET_URL.format(token=token.token)}\n",
+            )
+            db.session.commit()
+            latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def send_inline(app, count):
+    """``mail.send`` ``count`` messages, one connection each; returns latencies"""
+    with app.app_context():
+        latencies = []
+        for i in range(count):
+            started = time.perf_counter()
+            mail.send(Message('Reset your Community Connect password',
+                              recipients=[f'inline-{i}@example.com'], body='Inline'))
+            latencies.append(time.perf_counter() - started)
+    return latencies
+
+
+def requeue(app):
+    with app.app_context():
+        db.session.execute(
+            db.update(Job).where(Job.task == send_mail.name)
+            .values(status='queued', attempts=0, finished_at=None)
+        )
+        db.session.commit()
+
+
+def drain(app, workers, batch_size):
+    """Run ``workers`` job workers in threads until nothing is due; returns how many jobs ran"""
+    ran = []
+    threads = [threading.Thread(target=lambda: ran.append(
+        Worker(app, batch_size=batch_size, poll_seconds=0).run(until_idle=True)))
+        for _ in range(workers)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(ran)
+
+
+def describe(latencies):
+    return (f"{len(latencies) / sum(latencies):8.0f}/s   "
+            f"median {statistics.median(latencies) * 1000:6.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--emails', type=int, default=2000)
+    parser.add_argument('--inline', type=int, default=200)
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--handshake-ms', type=float, default=20)
+    parser.add_argument('--message-ms', type=float, default=0)
+    args = parser.parse_args()
+
+    fd, database = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        with SMTPStub(greeting_delay=args.handshake_ms / 1000,
+                      data_delay=args.message_ms / 1000) as stub:
+            app = fresh_app(stub, database)
+            print(f"{args.emails} reset emails, {args.handshake_ms:g} ms handshake, "
+                  f"{args.message_ms:g} ms per message")
+            print(f"  token + outbox.queue          {describe(queue_resets(app, args.emails))}")
+            print(f"  mail.send inline, {args.inline} messages   "
+                  f"{describe(send_inline(app, args.inline))}")
+
+            for workers in sorted({1, args.workers}):
+                requeue(app)
+                opened = stub.connections
+                started = time.perf_counter()
+                sent = drain(app, workers, args.batch_size)
+                elapsed = time.perf_counter() - started
+                print(f"  {workers} worker{'s' if workers > 1 else ' '}, batch {args.batch_size}"
+                      f"          {sent / elapsed:8.0f}/s   "
+                      f"{sent} sent over {stub.connections - opened} connections")
+    finally:
+        os.unlink(database)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,100 @@
+"""Login throughput under contention, with and without the hashing pool.
+
+    PYTHONPATH=. python benchmarks/password_hashing.py [--logins 16] [--duration 5]
+
+Runs the app in-process on a scratch SQLite database.  ``--logins`` threads
+post ``/login`` in a loop while one more thread fetches ``/categories`` and
+records its latency, standing in for everything else the worker serves.
+Login threads that get a 503 wait for its ``Retry-After``.
+Each configuration runs for ``--duration`` seconds: hashing inline on the
+request threads (``PASSWORD_HASH_WORKERS=0``, the old behaviour) and on
+pools of a few sizes.
+"""
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+
+from app import create_app, db
+from app.models import User
+
+CONFIGS = [
+    ('inline', 0, 0),
+    ('pool, 1 worker, queue 16', 1, 16),
+    ('pool, 2 workers, queue 16', 2, 16),
+    ('pool, 2 workers, queue 4', 2, 4),
+]
+
+
+def run(workers, queue, logins, duration, database):
+    os.environ.update({
+        'DATABASE_URL': f'sqlite:///{database}',
+        'PASSWORD_HASH_WORKERS': str(workers),
+        'PASSWORD_HASH_QUEUE': str(queue),
+    })
+    app = create_app()
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        user = User(username='bench', email='bench@example.com')
+        user.set_password('password123')
+        db.session.add(user)
+        db.session.commit()
+
+    statuses = {}
+    probes = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def login():
+        client = app.test_client()
+        while time.monotonic() < deadline:
+            response = client.post('/login', json={'username': 'bench', 'password': 'password123'})
+            with lock:
+                statuses[response.status_code] = statuses.get(response.status_code, 0) + 1
+            if response.status_code == 503:
+                # A well-behaved client backs off as told
+                time.sleep(float(response.headers['Retry-After']))
+
+    def probe():
+        client = app.test_client()
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            client.get('/categories')
+            probes.append(time.perf_counter() - started)
+
+    threads = [threading.Thread(target=login) for _ in range(logins)]
+    threads.append(threading.Thread(target=probe))
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    app.extensions['passwords']['pool'].shutdown()
+    return statuses, probes
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--logins', type=int, default=16)
+    parser.add_argument('--duration', type=float, default=5)
+    args = parser.parse_args()
+
+    fd, database = tempfile.mkstemp(suffix='.db')
+    os.close(fd)
+    try:
+        print(f"{args.logins} login threads, 1 probe thread, {args.duration:g}s each")
+        for name, workers, queue in CONFIGS:
+            statuses, probes = run(workers, queue, args.logins, args.duration, database)
+            ok = statuses.get(200, 0)
+            probes.sort()
+            print(f"  {name:26} logins {ok / args.duration:6.1f}/s  503 {statuses.get(503, 0):5}"
+                  f"  probe p50 {statistics.median(probes) * 1e3:6.1f} ms"
+                  f"  p99 {probes[int(len(probes) * 0.99)] * 1e3:7.1f} ms  ({len(probes)} probes)")
+    finally:
+        os.unlink(database)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""Load a running server: HTTP throughput, then websocket concurrency.
+
+    python benchmarks/serving.py --url http://127.0.0.1:5000
+
+Start the server under test first (see benchmarks/README.md).  The HTTP
+phase runs ``--concurrency`` clients against ``--path`` for ``--duration``
+seconds.  The websocket phase opens ``--sockets`` Socket.IO websocket
+connections, counts how many complete the Socket.IO handshake, and measures
+HTTP latency while they are all held open.
+"""
+import argparse
+import statistics
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import simple_websocket
+
+
+def http_phase(url, concurrency, duration, timeout=5):
+    latencies = []
+    errors = 0
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def client():
+        nonlocal errors
+        while time.monotonic() < deadline:
+            started = time.perf_counter()
+            try:
+                with urllib.request.urlopen(url, timeout=timeout) as response:
+                    response.read()
+            except (urllib.error.URLError, OSError):
+                with lock:
+                    errors += 1
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - started)
+
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(client)
+    return latencies, errors
+
+
+def open_socket(ws_url, timeout):
+    try:
+        ws = simple_websocket.Client.connect(ws_url)
+        ws.receive(timeout=timeout)          # Engine.IO open packet
+        ws.send('40')                        # Socket.IO namespace connect
+        reply = ws.receive(timeout=timeout)
+    except Exception:
+        return None
+    if not reply or not reply.startswith('40'):
+        ws.close()
+        return None
+    return ws
+
+
+def socket_phase(base_url, count, timeout):
+    ws_url = base_url.replace('http', 'ws', 1) + '/socket.io/?EIO=4&transport=websocket'
+    sockets = []
+    lock = threading.Lock()
+
+    def connect():
+        ws = open_socket(ws_url, timeout)
+        if ws is not None:
+            with lock:
+                sockets.append(ws)
+
+    # A server that is out of threads leaves connections in its backlog
+    # rather than refusing them, so give up on stragglers at the deadline.
+    started = time.perf_counter()
+    threads = [threading.Thread(target=connect, daemon=True) for _ in range(count)]
+    for thread in threads:
+        thread.start()
+    deadline = time.monotonic() + timeout
+    for thread in threads:
+        thread.join(max(0, deadline - time.monotonic()))
+    elapsed = time.perf_counter() - started
+    with lock:
+        return list(sockets), elapsed
+
+
+def report(title, latencies, errors, duration):
+    if not latencies:
+        print(f"{title}: no successful requests ({errors} errors)", flush=True)
+        return
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(f"{title}: {len(latencies) / duration:8.1f} req/s  "
+          f"p50 {statistics.median(ordered) * 1000:7.1f} ms  "
+          f"p99 {p99 * 1000:7.1f} ms  errors {errors}", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--url', default='http://127.0.0.1:5000')
+    parser.add_argument('--path', default='/categories')
+    parser.add_argument('--concurrency', type=int, default=32)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--sockets', type=int, default=200)
+    parser.add_argument('--socket-timeout', type=float, default=10)
+    args = parser.parse_args()
+
+    latencies, errors = http_phase(args.url + args.path, args.concurrency, args.duration)
+    report(f"HTTP {args.path} x{args.concurrency}", latencies, errors, args.duration)
+
+    sockets, elapsed = socket_phase(args.url, args.sockets, args.socket_timeout)
+    print(f"Websockets: {len(sockets)}/{args.sockets} connected in {elapsed:.1f}s", flush=True)
+    try:
+        latencies, errors = http_phase(args.url + args.path, args.concurrency, args.duration)
+        report(f"HTTP {args.path} x{args.concurrency} with {len(sockets)} sockets open",
+               latencies, errors, args.duration)
+    finally:
+        for ws in sockets:
+            try:
+                ws.close()
+            except simple_websocket.ConnectionClosed:
+                pass
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,43 @@
+"""Opportunity search triggers, as the migrations create them.
+
+3c9e51d27a4f added these triggers to keep opportunity_fts in step with
+opportunity on SQLite.  batch_alter_table rebuilds the table there, and the
+rebuild drops every trigger on it, so each migration that rebuilds
+opportunity calls restore() afterwards.
+
+This is a frozen copy, separate from app/search.py on purpose: a migration
+has to keep creating the schema it was written against, whatever the app's
+own DDL looks like later.  Changing the triggers means adding a migration
+with its own DDL, not editing this file.
+"""
+from alembic import op
+
+
+SQLITE_TRIGGERS = [
+    "CREATE TRIGGER IF NOT EXISTS opportunity_fts_insert AFTER INSERT ON opportunity "
+    "WHEN new.is_approved BEGIN "
+    "INSERT INTO opportunity_fts(rowid, title, description, category, location) "
+    "VALUES (new.id, new.title, new.description, new.category, new.location); END",
+    "CREATE TRIGGER IF NOT EXISTS opportunity_fts_update "
+    "AFTER UPDATE OF title, description, category, location, is_approved ON opportunity "
+    "BEGIN "
+    "DELETE FROM opportunity_fts WHERE rowid = old.id; "
+    "INSERT INTO opportunity_fts(rowid, title, description, category, location) "
+    "SELECT new.id, new.title, new.description, new.category, new.location "
+    "WHERE new.is_approved; END",
+    "CREATE TRIGGER IF NOT EXISTS opportunity_fts_delete AFTER DELETE ON opportunity "
+    "BEGIN DELETE FROM opportunity_fts WHERE rowid = old.id; END",
+]
+
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS opportunity_fts_insert",
+    "DROP TRIGGER IF EXISTS opportunity_fts_update",
+    "DROP TRIGGER IF EXISTS opportunity_fts_delete",
+]
+
+
+def restore():
+    """Create the triggers again after opportunity was rebuilt"""
+    if op.get_bind().dialect.name == 'sqlite':
+        for statement in SQLITE_TRIGGERS:
+            op.execute(statement)
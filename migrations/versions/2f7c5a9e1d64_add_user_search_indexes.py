@@ -0,0 +1,39 @@
+"""Index users for the admin search
+
+Revision ID: 2f7c5a9e1d64
+Revises: 6b3e0f9d2a18
+Create Date: 2026-10-17 15:52:17.064583
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2f7c5a9e1d64'
+down_revision = '6b3e0f9d2a18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # text_pattern_ops lets Postgres serve LIKE 'prefix%' whatever the
+    # database collation; SQLite matches prefixes with a range instead
+    ops = ' text_pattern_ops' if op.get_bind().dialect.name == 'postgresql' else ''
+    op.create_index('ix_user_username_lower', 'user', [sa.text(f'lower(username){ops}')], unique=False)
+    op.create_index('ix_user_email_lower', 'user', [sa.text(f'lower(email){ops}')], unique=False)
+    op.create_index('ix_user_role', 'user', ['role', 'id'], unique=False)
+    op.create_index('ix_user_suspended', 'user', ['id'], unique=False,
+                    postgresql_where=sa.text('account_active = false'),
+                    sqlite_where=sa.text('account_active = 0'))
+    op.create_index('ix_user_banned', 'user', ['id'], unique=False,
+                    postgresql_where=sa.text('is_banned = true'),
+                    sqlite_where=sa.text('is_banned = 1'))
+
+
+def downgrade():
+    op.drop_index('ix_user_banned', table_name='user')
+    op.drop_index('ix_user_suspended', table_name='user')
+    op.drop_index('ix_user_role', table_name='user')
+    op.drop_index('ix_user_email_lower', table_name='user')
+    op.drop_index('ix_user_username_lower', table_name='user')
@@ -0,0 +1,58 @@
+"""Add opportunity full-text search index
+
+Revision ID: 3c9e51d27a4f
+Revises: 80e71076a6b9
+Create Date: 2026-10-17 09:12:41.220517
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+import search_triggers
+
+
+# revision identifiers, used by Alembic.
+revision = '3c9e51d27a4f'
+down_revision = '80e71076a6b9'
+branch_labels = None
+depends_on = None
+
+
+DOCUMENT = (
+    "setweight(to_tsvector('english', coalesce(opportunity.title, '')), 'A') || "
+    "setweight(to_tsvector('english', coalesce(opportunity.category, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(opportunity.location, '')), 'B') || "
+    "setweight(to_tsvector('english', coalesce(opportunity.description, '')), 'C')"
+)
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        op.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS opportunity_fts USING fts5("
+            "title, description, category, location, "
+            "tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+        )
+        for statement in search_triggers.SQLITE_TRIGGERS:
+            op.execute(statement)
+        # Backfill from the rows that already exist
+        op.execute(
+            "INSERT INTO opportunity_fts(rowid, title, description, category, location) "
+            "SELECT id, title, description, category, location FROM opportunity WHERE is_approved"
+        )
+    elif dialect == 'postgresql':
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_opportunity_search ON opportunity "
+            "USING gin ((" + DOCUMENT + "))"
+        )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        for statement in search_triggers.SQLITE_DROP:
+            op.execute(statement)
+        op.execute("DROP TABLE IF EXISTS opportunity_fts")
+    elif dialect == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_opportunity_search")
@@ -0,0 +1,37 @@
+"""Add coordinates and a geohash index to opportunities
+
+Revision ID: 5c2e8b1f4a97
+Revises: 8d1a6c3f5e02
+Create Date: 2026-10-17 17:48:03.205174
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+import search_triggers
+
+
+# revision identifiers, used by Alembic.
+revision = '5c2e8b1f4a97'
+down_revision = '8d1a6c3f5e02'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing opportunities have no coordinates, so there is nothing to
+    # backfill; the app fills geohash whenever coordinates are saved.
+    with op.batch_alter_table('opportunity', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('latitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('longitude', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('geohash', sa.String(length=9), nullable=True))
+        batch_op.create_index('ix_opportunity_geohash', ['is_approved', 'geohash'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('opportunity', schema=None) as batch_op:
+        batch_op.drop_index('ix_opportunity_geohash')
+        batch_op.drop_column('geohash')
+        batch_op.drop_column('longitude')
+        batch_op.drop_column('latitude')
+    search_triggers.restore()
@@ -0,0 +1,60 @@
+"""Add opportunity engagement counters
+
+Revision ID: 5e2d8b9c0f17
+Revises: b71f0a4c5d22
+Create Date: 2026-10-17 11:26:05.517902
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+import search_triggers
+
+
+# revision identifiers, used by Alembic.
+revision = '5e2d8b9c0f17'
+down_revision = 'b71f0a4c5d22'
+branch_labels = None
+depends_on = None
+
+REACTION_TYPES = ('like', 'love', 'wow')
+BATCH_SIZE = 1000
+
+
+def upgrade():
+    with op.batch_alter_table('opportunity', schema=None) as batch_op:
+        for reaction_type in REACTION_TYPES:
+            batch_op.add_column(sa.Column(f'{reaction_type}_count', sa.Integer(),
+                                          server_default='0', nullable=False))
+        batch_op.add_column(sa.Column('bookmark_count', sa.Integer(),
+                                      server_default='0', nullable=False))
+
+    # Backfill from the child tables one primary-key range at a time, each
+    # committed on its own, so a big table is never rewritten in a single
+    # long transaction.  A run cut short leaves some counters at 0 until
+    # `flask counters repair` recomputes them.
+    assignments = ', '.join(
+        f"{reaction_type}_count = (SELECT count(*) FROM reaction "
+        f"WHERE reaction.opportunity_id = opportunity.id "
+        f"AND reaction.reaction_type = '{reaction_type}')"
+        for reaction_type in REACTION_TYPES
+    )
+    assignments += (", bookmark_count = (SELECT count(*) FROM bookmark "
+                    "WHERE bookmark.opportunity_id = opportunity.id)")
+
+    with op.get_context().autocommit_block():
+        bind = op.get_bind()
+        max_id = bind.execute(sa.text("SELECT max(id) FROM opportunity")).scalar() or 0
+        for start in range(1, max_id + 1, BATCH_SIZE):
+            bind.execute(
+                sa.text(f"UPDATE opportunity SET {assignments} WHERE id BETWEEN :start AND :end"),
+                {'start': start, 'end': start + BATCH_SIZE - 1},
+            )
+
+
+def downgrade():
+    with op.batch_alter_table('opportunity', schema=None) as batch_op:
+        batch_op.drop_column('bookmark_count')
+        for reaction_type in reversed(REACTION_TYPES):
+            batch_op.drop_column(f'{reaction_type}_count')
+    search_triggers.restore()
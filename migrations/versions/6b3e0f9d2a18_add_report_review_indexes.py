@@ -0,0 +1,30 @@
+"""Index reports by target and review status
+
+Revision ID: 6b3e0f9d2a18
+Revises: d4f18a27c6b3
+Create Date: 2026-10-17 15:08:44.390126
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '6b3e0f9d2a18'
+down_revision = 'd4f18a27c6b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('report', schema=None) as batch_op:
+        batch_op.create_index('ix_report_opportunity_review',
+                              ['reported_opportunity_id', 'is_reviewed'], unique=False)
+        batch_op.create_index('ix_report_user_review',
+                              ['reported_user_id', 'is_reviewed'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('report', schema=None) as batch_op:
+        batch_op.drop_index('ix_report_user_review')
+        batch_op.drop_index('ix_report_opportunity_review')
@@ -0,0 +1,78 @@
+"""Normalize tag names and merge case variants
+
+Databases built only from migrations never got the tag tables (they were
+created by db.create_all()), so they are created here when missing.
+
+Revision ID: 8d1a6c3f5e02
+Revises: 2f7c5a9e1d64
+Create Date: 2026-10-17 16:31:52.118406
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d1a6c3f5e02'
+down_revision = '2f7c5a9e1d64'
+branch_labels = None
+depends_on = None
+
+# Same rule as app.tags.normalize, frozen here so later changes to the app
+# cannot change what this migration did
+MAX_NAME_LENGTH = 50
+
+
+def normalize(name):
+    return ' '.join(name.split()).casefold()[:MAX_NAME_LENGTH].strip()
+
+
+def upgrade():
+    bind = op.get_bind()
+    if not sa.inspect(bind).has_table('tag'):
+        op.create_table('tag',
+            sa.Column('id', sa.Integer(), nullable=False),
+            sa.Column('name', sa.String(length=50), nullable=False),
+            sa.PrimaryKeyConstraint('id'),
+            sa.UniqueConstraint('name')
+        )
+    if not sa.inspect(bind).has_table('opportunity_tags'):
+        op.create_table('opportunity_tags',
+            sa.Column('tag_id', sa.Integer(), nullable=False),
+            sa.Column('opportunity_id', sa.Integer(), nullable=False),
+            sa.ForeignKeyConstraint(['opportunity_id'], ['opportunity.id'], ),
+            sa.ForeignKeyConstraint(['tag_id'], ['tag.id'], ),
+            sa.PrimaryKeyConstraint('tag_id', 'opportunity_id')
+        )
+
+    groups = {}
+    for tag_id, name in bind.execute(sa.text("SELECT id, name FROM tag ORDER BY id")):
+        groups.setdefault(normalize(name), []).append((tag_id, name))
+
+    for canonical, tags in groups.items():
+        keep_id, keep_name = tags[0]
+        for duplicate_id, _ in tags[1:]:
+            params = {'keep': keep_id, 'duplicate': duplicate_id}
+            # Move links to the surviving tag unless the opportunity already
+            # has it, then drop what is left on the duplicate.  One duplicate
+            # at a time, so an opportunity tagged with two of them does not
+            # end up with the surviving tag twice.
+            bind.execute(sa.text(
+                "UPDATE opportunity_tags SET tag_id = :keep "
+                "WHERE tag_id = :duplicate AND opportunity_id NOT IN "
+                "(SELECT opportunity_id FROM opportunity_tags WHERE tag_id = :keep)"
+            ), params)
+            bind.execute(sa.text("DELETE FROM opportunity_tags WHERE tag_id = :duplicate"), params)
+            bind.execute(sa.text("DELETE FROM tag WHERE id = :duplicate"), params)
+        if not canonical:
+            # Nothing but whitespace: not a usable tag
+            bind.execute(sa.text("DELETE FROM opportunity_tags WHERE tag_id = :keep"), {'keep': keep_id})
+            bind.execute(sa.text("DELETE FROM tag WHERE id = :keep"), {'keep': keep_id})
+        elif keep_name != canonical:
+            bind.execute(sa.text("UPDATE tag SET name = :name WHERE id = :id"),
+                         {'name': canonical, 'id': keep_id})
+
+
+def downgrade():
+    # Merged tags cannot be split again; the normalized names stay valid
+    pass
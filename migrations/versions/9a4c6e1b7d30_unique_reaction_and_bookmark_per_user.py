@@ -0,0 +1,68 @@
+"""Allow one reaction and one bookmark per user and opportunity
+
+Revision ID: 9a4c6e1b7d30
+Revises: 5e2d8b9c0f17
+Create Date: 2026-10-17 13:02:41.208733
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9a4c6e1b7d30'
+down_revision = '5e2d8b9c0f17'
+branch_labels = None
+depends_on = None
+
+REACTION_TYPES = ('like', 'love', 'wow')
+
+
+def _dedupe(table):
+    """Keep the oldest row per (user_id, opportunity_id); returns touched opportunity ids"""
+    bind = op.get_bind()
+    affected = bind.execute(sa.text(
+        f"SELECT DISTINCT opportunity_id FROM {table} "
+        f"GROUP BY user_id, opportunity_id HAVING count(*) > 1"
+    )).scalars().all()
+    if affected:
+        bind.execute(sa.text(
+            f"DELETE FROM {table} WHERE id NOT IN "
+            f"(SELECT min(id) FROM {table} GROUP BY user_id, opportunity_id)"
+        ))
+    return set(affected)
+
+
+def upgrade():
+    affected = _dedupe('reaction') | _dedupe('bookmark')
+
+    # The duplicates were counted when they were created, so recount the
+    # opportunities that had any.
+    if affected:
+        assignments = ', '.join(
+            f"{reaction_type}_count = (SELECT count(*) FROM reaction "
+            f"WHERE reaction.opportunity_id = opportunity.id "
+            f"AND reaction.reaction_type = '{reaction_type}')"
+            for reaction_type in REACTION_TYPES
+        )
+        assignments += (", bookmark_count = (SELECT count(*) FROM bookmark "
+                        "WHERE bookmark.opportunity_id = opportunity.id)")
+        op.get_bind().execute(
+            sa.text(f"UPDATE opportunity SET {assignments} WHERE id IN :ids")
+            .bindparams(sa.bindparam('ids', expanding=True)),
+            {'ids': sorted(affected)},
+        )
+
+    with op.batch_alter_table('reaction', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_reaction_user_opportunity',
+                                          ['user_id', 'opportunity_id'])
+    with op.batch_alter_table('bookmark', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_bookmark_user_opportunity',
+                                          ['user_id', 'opportunity_id'])
+
+
+def downgrade():
+    with op.batch_alter_table('bookmark', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_bookmark_user_opportunity', type_='unique')
+    with op.batch_alter_table('reaction', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_reaction_user_opportunity', type_='unique')
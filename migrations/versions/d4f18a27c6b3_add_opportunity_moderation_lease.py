@@ -0,0 +1,39 @@
+"""Add a moderation lease to opportunities
+
+Revision ID: d4f18a27c6b3
+Revises: 9a4c6e1b7d30
+Create Date: 2026-10-17 14:26:09.514372
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+import search_triggers
+
+
+# revision identifiers, used by Alembic.
+revision = 'd4f18a27c6b3'
+down_revision = '9a4c6e1b7d30'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # The queue itself is served by ix_opportunity_feed
+    # (is_approved, created_at, id), scanned in ascending order.
+    with op.batch_alter_table('opportunity', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('claimed_by_id', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('claim_expires_at', sa.DateTime(), nullable=True))
+        batch_op.create_index(batch_op.f('ix_opportunity_claimed_by_id'), ['claimed_by_id'], unique=False)
+        batch_op.create_foreign_key('fk_opportunity_claimed_by_id_user', 'user',
+                                    ['claimed_by_id'], ['id'], ondelete='SET NULL')
+    search_triggers.restore()
+
+
+def downgrade():
+    with op.batch_alter_table('opportunity', schema=None) as batch_op:
+        batch_op.drop_constraint('fk_opportunity_claimed_by_id_user', type_='foreignkey')
+        batch_op.drop_index(batch_op.f('ix_opportunity_claimed_by_id'))
+        batch_op.drop_column('claim_expires_at')
+        batch_op.drop_column('claimed_by_id')
+    search_triggers.restore()
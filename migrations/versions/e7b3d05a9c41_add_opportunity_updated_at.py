@@ -0,0 +1,36 @@
+"""Add updated_at to opportunities
+
+Revision ID: e7b3d05a9c41
+Revises: 5c2e8b1f4a97
+Create Date: 2026-10-17 18:35:27.640913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+import search_triggers
+
+
+# revision identifiers, used by Alembic.
+revision = 'e7b3d05a9c41'
+down_revision = '5c2e8b1f4a97'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('opportunity', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('updated_at', sa.DateTime(), nullable=True))
+
+    # Nothing is known about earlier changes; creation is the best guess
+    op.execute('UPDATE opportunity SET updated_at = created_at')
+
+    with op.batch_alter_table('opportunity', schema=None) as batch_op:
+        batch_op.alter_column('updated_at', existing_type=sa.DateTime(), nullable=False)
+    search_triggers.restore()
+
+
+def downgrade():
+    with op.batch_alter_table('opportunity', schema=None) as batch_op:
+        batch_op.drop_column('updated_at')
+    search_triggers.restore()
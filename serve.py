@@ -0,0 +1,132 @@
+"""Production entry point: one or more Socket.IO workers on one box.
+
+    python serve.py --workers 4 --port 5000
+
+Worker ``i`` listens on ``port + i`` and is served by ``app/serving.py`` in
+the async mode chosen by ``SERVER_ASYNC_MODE`` (auto, threading, eventlet or
+gevent).  Socket.IO needs sticky sessions (long-polling requests from one
+client must reach the same worker), so put a load balancer that pins clients
+in front of the ports; see "Scaling out" in the README.  Events emitted on any
+worker reach clients on all of them through ``SOCKETIO_MESSAGE_QUEUE``:
+unless it already points at an external queue (``redis://`` etc.), this
+process runs an IPC message hub and hands its address to the workers.
+
+SIGTERM/SIGINT is forwarded to the workers, which drain for up to
+``SERVER_DRAIN_TIMEOUT`` seconds before exiting.
+"""
+import argparse
+import logging
+import multiprocessing
+import os
+import signal
+
+from dotenv import load_dotenv
+
+DEFAULT_HUB = 'ipc://127.0.0.1:5099'
+ASYNC_MODES = ('threading', 'eventlet', 'gevent')
+LOG_FORMAT = '%(asctime)s %(processName)s %(levelname)s %(message)s'
+
+logger = logging.getLogger(__name__)
+
+
+def resolve_async_mode(requested):
+    """Map a SERVER_ASYNC_MODE value to an installed async mode"""
+    if requested in (None, '', 'auto'):
+        for mode in ('eventlet', 'gevent'):
+            try:
+                __import__(mode)
+            except ImportError:
+                continue
+            return mode
+        return 'threading'
+    if requested not in ASYNC_MODES:
+        raise SystemExit(f"Unknown SERVER_ASYNC_MODE {requested!r}; "
+                         f"expected auto or one of {', '.join(ASYNC_MODES)}")
+    if requested != 'threading':
+        try:
+            __import__(requested)
+        except ImportError:
+            raise SystemExit(f"SERVER_ASYNC_MODE={requested} needs the {requested} package")
+    return requested
+
+
+def run_worker(host, port):
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    mode = resolve_async_mode(os.getenv('SERVER_ASYNC_MODE', 'auto'))
+    # Blocking calls (sockets, the database driver) must be patched before
+    # anything that uses them is imported
+    if mode == 'eventlet':
+        import eventlet
+        eventlet.monkey_patch()
+    elif mode == 'gevent':
+        from gevent import monkey
+        monkey.patch_all()
+    os.environ['SERVER_ASYNC_MODE'] = mode
+
+    from app import create_app
+    from app.serving import serve
+
+    serve(create_app(), host=host, port=port)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--host', default=os.getenv('HOST', '127.0.0.1'))
+    parser.add_argument('--port', type=int, default=int(os.getenv('PORT', '5000')))
+    parser.add_argument('--workers', type=int, default=int(os.getenv('WEB_CONCURRENCY', '1')))
+    return parser.parse_args()
+
+
+def main():
+    load_dotenv()
+    logging.basicConfig(level=logging.INFO, format=LOG_FORMAT)
+    args = parse_args()
+    if args.workers == 1:
+        run_worker(args.host, args.port)
+        return
+
+    hub = None
+    queue_url = os.getenv('SOCKETIO_MESSAGE_QUEUE')
+    if not queue_url or queue_url.startswith('ipc://'):
+        from app.message_queue import MessageHub, parse_ipc_address
+
+        queue_url = queue_url or DEFAULT_HUB
+        hub = MessageHub(parse_ipc_address(queue_url),
+                         authkey=os.getenv('SECRET_KEY', 'dev').encode()).start()
+        # Workers are spawned after this, so they inherit the setting
+        os.environ['SOCKETIO_MESSAGE_QUEUE'] = queue_url
+        logger.info("Message hub listening on %s", queue_url)
+
+    context = multiprocessing.get_context('spawn')
+    workers = [
+        context.Process(target=run_worker, args=(args.host, args.port + i), name=f'worker-{i}')
+        for i in range(args.workers)
+    ]
+    for i, worker in enumerate(workers):
+        worker.start()
+        logger.info("%s (pid %s) on %s:%s", worker.name, worker.pid, args.host, args.port + i)
+
+    def stop(signum, frame):
+        for worker in workers:
+            if worker.is_alive():
+                worker.terminate()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    drain_timeout = float(os.getenv('SERVER_DRAIN_TIMEOUT', '30'))
+    try:
+        for worker in workers:
+            worker.join()
+    finally:
+        # A worker that outlives its drain window is stuck; don't wait forever
+        for worker in workers:
+            worker.join(drain_timeout + 5)
+            if worker.is_alive():
+                worker.kill()
+        if hub is not None:
+            hub.close()
+
+
+if __name__ == '__main__':
+    main()
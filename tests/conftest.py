@@ -16,6 +16,8 @@ def app():
         'TESTING': True,
         'SQLALCHEMY_DATABASE_URI': f'sqlite:///{db_path}',
         'WTF_CSRF_ENABLED': False,
+        # Emit engagement events inline instead of from a background task
+        'REALTIME_COALESCE_WINDOW': 0,
     })
 
     # Create the database and load test data
@@ -54,6 +56,13 @@ def test_user(app):
         return user
 
 
+@pytest.fixture
+def logged_in(client, test_user):
+    """The test client, logged in as the test user."""
+    client.post('/login', json={'username': 'testuser', 'password': 'password123'})
+    return client
+
+
 @pytest.fixture
 def test_admin(app):
     """Create a test admin user."""
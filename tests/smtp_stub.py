@@ -0,0 +1,124 @@
+"""A small local SMTP server for tests and benchmarks.
+
+Speaks just enough SMTP for smtplib: EHLO/HELO, MAIL, RCPT, DATA, RSET,
+NOOP and QUIT, on a free localhost port, one thread per connection::
+
+    with SMTPStub() as stub:
+        app.config.update(MAIL_SERVER=stub.host, MAIL_PORT=stub.port)
+        ...
+    stub.messages   # [(mail_from, [rcpt, ...], data), ...]
+
+``greeting_delay`` sleeps before the greeting, standing in for the
+connect/TLS/AUTH round trips of a real server, and ``data_delay`` before
+answering each message.  ``replies`` holds canned replies for the next DATA
+commands ("451 Try later"); a reply of ``None`` drops the connection
+instead.  Recipients in ``refused`` get a 550.
+"""
+import socketserver
+import threading
+import time
+from collections import deque
+
+
+class SMTPStub:
+    def __init__(self, greeting_delay=0, data_delay=0):
+        self.greeting_delay = greeting_delay
+        self.data_delay = data_delay
+        self.messages = []
+        self.replies = deque()
+        self.refused = set()
+        self.connections = 0
+        self.open_connections = 0
+        self.max_open_connections = 0
+        self._lock = threading.Lock()
+        self._server = None
+
+    def __enter__(self):
+        stub = self
+
+        class Handler(socketserver.StreamRequestHandler):
+            def handle(self):
+                stub._handle(self.rfile, self.wfile)
+
+        self._server = socketserver.ThreadingTCPServer(('127.0.0.1', 0), Handler)
+        self._server.daemon_threads = True
+        self.host, self.port = self._server.server_address
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc_info):
+        self._server.shutdown()
+        self._server.server_close()
+
+    def _handle(self, rfile, wfile):
+        with self._lock:
+            self.connections += 1
+            self.open_connections += 1
+            self.max_open_connections = max(self.max_open_connections, self.open_connections)
+        try:
+            self._session(rfile, wfile)
+        except (ConnectionError, OSError):
+            pass
+        finally:
+            with self._lock:
+                self.open_connections -= 1
+
+    def _session(self, rfile, wfile):
+        def reply(*lines):
+            # One write per reply, so Nagle's algorithm does not hold back
+            # the last line of a multi-line reply
+            wfile.write(''.join(f'{line}\r\n' for line in lines).encode())
+            wfile.flush()
+
+        if self.greeting_delay:
+            time.sleep(self.greeting_delay)
+        reply('220 stub ESMTP')
+        mail_from, rcpt_tos = None, []
+        while True:
+            line = rfile.readline()
+            if not line:
+                return
+            command, _, argument = line.decode().rstrip('\r\n').partition(' ')
+            command = command.upper()
+            if command == 'EHLO':
+                reply('250-stub', '250 8BITMIME')
+            elif command == 'HELO':
+                reply('250 stub')
+            elif command == 'MAIL':
+                mail_from, rcpt_tos = _address(argument), []
+                reply('250 OK')
+            elif command == 'RCPT':
+                address = _address(argument)
+                if address in self.refused:
+                    reply('550 No such user')
+                else:
+                    rcpt_tos.append(address)
+                    reply('250 OK')
+            elif command == 'DATA':
+                reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                for data_line in iter(rfile.readline, b''):
+                    if data_line == b'.\r\n':
+                        break
+                    data.append(data_line)
+                if self.data_delay:
+                    time.sleep(self.data_delay)
+                with self._lock:
+                    canned = self.replies.popleft() if self.replies else '250 OK'
+                    if canned is None:
+                        return
+                    if canned.startswith('250'):
+                        self.messages.append((mail_from, rcpt_tos, b''.join(data)))
+                reply(canned)
+            elif command in ('RSET', 'NOOP'):
+                reply('250 OK')
+            elif command == 'QUIT':
+                reply('221 Bye')
+                return
+            else:
+                reply('502 Command not implemented')
+
+
+def _address(argument):
+    # "FROM:<a@b>" / "TO:<a@b> SIZE=123" -> "a@b"
+    return argument.partition(':')[2].split(' ')[0].strip('<>')
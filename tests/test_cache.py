@@ -0,0 +1,137 @@
+import threading
+import time
+import pytest
+from sqlalchemy import event
+from app import db
+from app.cache import LocalCache, SingleFlight
+from app.models import Opportunity
+from app.signals import notify_feed_changed
+
+
+class TestLocalCache:
+    """Test the in-process LRU cache."""
+
+    def test_evicts_least_recently_used(self):
+        """Test that the oldest untouched entry is evicted first."""
+        cache = LocalCache(max_entries=2)
+        cache.set('a', 1)
+        cache.set('b', 2)
+        cache.get('a')
+        cache.set('c', 3)
+
+        assert cache.get('a') == 1
+        assert cache.get('b') is None
+        assert cache.get('c') == 3
+        assert cache.stats()['evictions'] == 1
+
+    def test_invalidate_by_tag(self):
+        """Test that only entries carrying the tag are dropped."""
+        cache = LocalCache()
+        cache.set('page1', 'x', tags=['feed', 'opportunity:1'])
+        cache.set('page2', 'y', tags=['feed', 'opportunity:2'])
+
+        cache.invalidate_tags(['opportunity:1'])
+        assert cache.get('page1') is None
+        assert cache.get('page2') == 'y'
+
+    def test_stale_fill_is_not_stored(self):
+        """Test that a value computed before an invalidation is discarded."""
+        cache = LocalCache()
+        generation = cache.generation
+        cache.invalidate_tags(['feed'])
+        assert cache.set('page', 'stale', generation=generation) is False
+        assert cache.get('page') is None
+
+    def test_entries_expire(self):
+        """Test that entries older than the TTL are treated as misses."""
+        cache = LocalCache(ttl=0.01)
+        cache.set('a', 1)
+        time.sleep(0.02)
+        assert cache.get('a') is None
+
+
+class TestSingleFlight:
+    """Test coalescing of concurrent cache fills."""
+
+    def test_concurrent_misses_share_one_fill(self):
+        """Test that parallel callers for one key run the fill once."""
+        flights = SingleFlight()
+        calls = []
+        started = threading.Event()
+
+        def fill():
+            calls.append(1)
+            started.set()
+            time.sleep(0.05)
+            return 'value'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(flights.do('key', fill)))
+                   for _ in range(8)]
+        threads[0].start()
+        started.wait()
+        for thread in threads[1:]:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert len(calls) == 1
+        assert results == ['value'] * 8
+
+
+@pytest.fixture
+def statements(app):
+    """Record the SQL statements issued while the fixture is active."""
+    executed = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        executed.append(statement)
+
+    engine = db.engine
+    event.listen(engine, 'before_cursor_execute', record)
+    yield executed
+    event.remove(engine, 'before_cursor_execute', record)
+
+
+class TestFeedCache:
+    """Test caching of rendered feed pages."""
+
+    def test_repeat_request_served_from_cache(self, client, test_opportunity, statements):
+        """Test that an identical feed request issues no queries."""
+        first = client.get('/?category=Education')
+        statements.clear()
+        second = client.get('/?category=Education')
+
+        assert statements == []
+        assert second.get_json() == first.get_json()
+
+    def test_write_route_invalidates(self, client, test_moderator, test_user):
+        """Test that approving through the route refreshes the cached feed."""
+        opportunity = Opportunity(
+            title='Pending',
+            description='Waiting for review',
+            category='Education',
+            location='Test City',
+            user_id=test_user.id
+        )
+        db.session.add(opportunity)
+        db.session.commit()
+        assert client.get('/').get_json()['opportunities'] == []
+
+        client.post('/login', json={'username': 'moderator', 'password': 'moderator123'})
+        client.post(f'/moderator/approve/{opportunity.id}')
+
+        assert [opp['title'] for opp in client.get('/').get_json()['opportunities']] == ['Pending']
+
+    def test_engagement_change_only_evicts_pages_showing_it(self, app, client, test_opportunity, statements):
+        """Test that a non-membership change keeps unrelated pages cached."""
+        client.get('/')
+        client.get('/?category=Climate')
+
+        notify_feed_changed(app, [test_opportunity.id], membership=False)
+        statements.clear()
+        client.get('/?category=Climate')
+        assert statements == []
+
+        client.get('/')
+        assert statements != []
@@ -0,0 +1,103 @@
+import pytest
+from sqlalchemy import event
+from app import db
+from app.models import Opportunity
+from app.tags import parse_tags, set_opportunity_tags
+
+
+@pytest.fixture
+def used_tags(app, test_user):
+    """Tags used by approved and pending opportunities in two categories."""
+    specs = [
+        ('python, climate', 'Climate', True),
+        ('python', 'Education', True),
+        ('pyramids, python', 'Education', True),
+        ('climate, unseen', 'Climate', False),
+    ]
+    for tags, category, approved in specs:
+        opportunity = Opportunity(title='T', description='d', category=category,
+                                  location='Test City', user_id=test_user.id, is_approved=approved)
+        db.session.add(opportunity)
+        db.session.flush()
+        set_opportunity_tags(opportunity.id, parse_tags(tags), replace=False)
+    db.session.commit()
+
+
+def counts(response):
+    return [(item['name'], item['count']) for item in response.get_json()]
+
+
+class TestListings:
+    """Test the tag and category listings."""
+
+    def test_tags_with_approved_counts(self, client, used_tags):
+        """Test that tags come in name order with counts over approved opportunities."""
+        response = client.get('/tags')
+        assert response.status_code == 200
+        assert counts(response) == [('climate', 1), ('pyramids', 1), ('python', 3), ('unseen', 0)]
+
+    def test_top_and_prefix(self, client, used_tags):
+        """Test ?top=N and ?prefix= alone and together."""
+        assert counts(client.get('/tags?top=2')) == [('python', 3), ('climate', 1)]
+        assert counts(client.get('/tags?prefix=PY')) == [('pyramids', 1), ('python', 3)]
+        assert counts(client.get('/tags?prefix=py&top=1')) == [('python', 3)]
+        assert client.get('/tags?top=0').status_code == 400
+        assert client.get('/tags?top=many').status_code == 400
+
+    def test_categories_with_counts(self, client, used_tags):
+        """Test that every category is listed with its approved count."""
+        categories = dict(counts(client.get('/categories')))
+        assert categories['Education'] == 2
+        assert categories['Climate'] == 1
+        assert categories['Health'] == 0
+
+
+class TestSnapshot:
+    """Test caching and revalidation of the listings."""
+
+    def test_served_without_queries(self, app, client, used_tags):
+        """Test that repeat requests do not touch the database."""
+        client.get('/tags')
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            client.get('/tags')
+            client.get('/tags?top=1')
+            client.get('/categories')
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        assert statements == []
+
+    def test_conditional_get(self, client, used_tags):
+        """Test ETag, Cache-Control and the 304 for a current ETag."""
+        response = client.get('/tags')
+        etag = response.headers['ETag']
+        assert 'max-age=60' in response.headers['Cache-Control']
+        assert client.get('/categories').headers['ETag'] == etag
+
+        not_modified = client.get('/tags', headers={'If-None-Match': etag})
+        assert not_modified.status_code == 304
+        assert not_modified.data == b''
+
+    def test_rebuilt_after_changes(self, client, used_tags, test_moderator):
+        """Test that new tags and approvals produce a new snapshot."""
+        etag = client.get('/tags').headers['ETag']
+
+        client.post('/login', json={'username': 'testuser', 'password': 'password123'})
+        created = client.post('/new', json={
+            'title': 'New', 'description': 'd', 'category': 'Health',
+            'location': 'Test City', 'tags': 'Gardening, python',
+        }).get_json()
+        response = client.get('/tags', headers={'If-None-Match': etag})
+        assert response.status_code == 200
+        assert ('gardening', 0) in counts(response)
+        client.post('/logout')
+
+        client.post('/login', json={'username': 'moderator', 'password': 'moderator123'})
+        client.post(f"/moderator/approve/{created['id']}")
+        assert ('gardening', 1) in counts(client.get('/tags'))
+        assert dict(counts(client.get('/categories')))['Health'] == 1
@@ -0,0 +1,120 @@
+import pytest
+from sqlalchemy import event
+from app import db
+from app.models import Opportunity
+from app.signals import notify_feed_changed
+
+
+def revalidate(client, url, response):
+    return client.get(url, headers={'If-None-Match': response.headers['ETag']})
+
+
+class TestDetail:
+    """Test conditional GET on /opportunity/<id>."""
+
+    def test_304_skips_loading(self, client, test_opportunity):
+        """Test that a current ETag gets a 304 after a single lookup."""
+        url = f'/opportunity/{test_opportunity.id}'
+        first = client.get(url)
+        assert first.status_code == 200
+        assert 'Last-Modified' in first.headers
+
+        statements = []
+        record = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            second = revalidate(client, url, first)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        assert second.status_code == 304
+        assert second.data == b''
+        assert second.headers['ETag'] == first.headers['ETag']
+        assert len(statements) == 1
+
+    def test_if_modified_since(self, client, test_opportunity):
+        """Test that Last-Modified works as a validator on its own."""
+        url = f'/opportunity/{test_opportunity.id}'
+        first = client.get(url)
+        again = client.get(url, headers={'If-Modified-Since': first.headers['Last-Modified']})
+        assert again.status_code == 304
+
+    def test_expansions_get_their_own_etag(self, client, test_opportunity):
+        """Test that ?expand= changes the ETag."""
+        url = f'/opportunity/{test_opportunity.id}'
+        assert client.get(url).headers['ETag'] != client.get(f'{url}?expand=reactions').headers['ETag']
+
+    @pytest.mark.parametrize('change', ['react', 'bookmark', 'edit', 'tags'])
+    def test_mutations_change_the_etag(self, logged_in, test_opportunity, change):
+        """Test that every kind of change moves updated_at."""
+        url = f'/opportunity/{test_opportunity.id}'
+        first = logged_in.get(url)
+        before = first.get_json()['updated_at']
+        if change == 'react':
+            logged_in.post(f'{url}/react', json={'reaction_type': 'like'})
+        elif change == 'bookmark':
+            logged_in.post(f'{url}/bookmark')
+        elif change == 'edit':
+            logged_in.post(f'{url}/edit', json={'title': 'Renamed'})
+        else:
+            logged_in.post(f'{url}/edit', json={'tags': 'new tag'})
+
+        response = revalidate(logged_in, url, first)
+        assert response.status_code == 200
+        assert response.get_json()['updated_at'] > before
+
+    def test_missing(self, client):
+        """Test that an unknown id is still a 404."""
+        assert client.get('/opportunity/999').status_code == 404
+
+
+class TestFeed:
+    """Test conditional GET on the feed."""
+
+    def test_304_until_something_changes(self, app, client, logged_in, test_opportunity, test_user):
+        """Test that the feed ETag holds until a reaction or deletion."""
+        first = client.get('/?per_page=10')
+        assert revalidate(client, '/?per_page=10', first).status_code == 304
+        # The ETag is a digest of the body, so a different page does not match
+        assert revalidate(client, '/?per_page=10&category=Climate', first).status_code == 200
+
+        logged_in.post(f'/opportunity/{test_opportunity.id}/react', json={'reaction_type': 'like'})
+        second = client.get('/?per_page=10')
+        assert second.headers['ETag'] != first.headers['ETag']
+
+        other = Opportunity(title='Old', description='d', category='Education', location='X',
+                            user_id=test_user.id, is_approved=True)
+        db.session.add(other)
+        db.session.commit()
+        notify_feed_changed(app, [other.id])
+        third = client.get('/?per_page=10')
+        logged_in.delete(f'/opportunity/{other.id}/delete')
+        assert revalidate(client, '/?per_page=10', third).status_code == 200
+
+    def test_no_last_modified(self, app, client, logged_in, test_opportunity, test_user):
+        """Test that a deletion cannot be hidden behind If-Modified-Since."""
+        newer = Opportunity(title='Newer', description='d', category='Education', location='X',
+                            user_id=test_user.id, is_approved=True)
+        db.session.add(newer)
+        db.session.commit()
+        notify_feed_changed(app, [newer.id])
+        first = client.get('/')
+        assert 'Last-Modified' not in first.headers
+
+        # Deleting an older row leaves the newest updated_at on the page as it was
+        logged_in.delete(f'/opportunity/{test_opportunity.id}/delete')
+        since = {'If-Modified-Since': 'Fri, 01 Jan 2100 00:00:00 GMT'}
+        response = client.get('/', headers=since)
+        assert response.status_code == 200
+        assert len(response.get_json()['opportunities']) == 1
+
+    def test_repeat_304_without_queries(self, client, test_opportunity):
+        """Test that revalidating a cached page runs no queries."""
+        first = client.get('/')
+        statements = []
+        record = lambda conn, cursor, statement, *args: statements.append(statement)
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            assert revalidate(client, '/', first).status_code == 304
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        assert statements == []
@@ -0,0 +1,130 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy.exc import IntegrityError
+
+from app import counters as counter_checks
+from app import db
+from app.models import Opportunity, Reaction, Bookmark, User
+
+
+def counters(opportunity_id):
+    db.session.expire_all()
+    opportunity = db.session.get(Opportunity, opportunity_id)
+    return opportunity.reaction_counts, opportunity.bookmark_count
+
+
+class TestEngagementCounters:
+    """Test the denormalized reaction and bookmark counters."""
+
+    def test_reaction_toggles_update_counters(self, logged_in, test_opportunity):
+        """Test add, change and remove of a reaction."""
+        url = f'/opportunity/{test_opportunity.id}/react'
+
+        response = logged_in.post(url, json={'reaction_type': 'like'})
+        assert response.status_code == 201
+        assert response.get_json()['reaction_counts'] == {'like': 1, 'love': 0, 'wow': 0}
+
+        logged_in.post(url, json={'reaction_type': 'love'})
+        assert counters(test_opportunity.id)[0] == {'like': 0, 'love': 1, 'wow': 0}
+
+        logged_in.post(url, json={'reaction_type': 'love'})
+        assert counters(test_opportunity.id)[0] == {'like': 0, 'love': 0, 'wow': 0}
+
+    def test_bookmark_toggle_updates_counter(self, logged_in, test_opportunity):
+        """Test that bookmarking and un-bookmarking adjust the total."""
+        url = f'/opportunity/{test_opportunity.id}/bookmark'
+
+        assert logged_in.post(url).get_json()['bookmark_count'] == 1
+        logged_in.post(url)
+        assert counters(test_opportunity.id)[1] == 0
+
+    def test_unknown_reaction_type_rejected(self, logged_in, test_opportunity):
+        """Test that only known reaction types are accepted."""
+        response = logged_in.post(f'/opportunity/{test_opportunity.id}/react',
+                                  json={'reaction_type': 'angry'})
+        assert response.status_code == 400
+
+
+class TestAtomicToggles:
+    """Test the unique constraints and the upsert based toggles."""
+
+    def test_duplicate_rows_rejected(self, test_user, test_opportunity):
+        """Test that a second bookmark row for the same pair cannot be stored."""
+        for _ in range(2):
+            db.session.add(Bookmark(user_id=test_user.id, opportunity_id=test_opportunity.id))
+        with pytest.raises(IntegrityError):
+            db.session.commit()
+        db.session.rollback()
+
+    def test_reaction_toggle_actions(self, test_user, test_opportunity):
+        """Test the add/change/remove results reported by Reaction.toggle."""
+        args = (test_user.id, test_opportunity.id)
+        assert Reaction.toggle(*args, 'like') == ('added', None)
+        assert Reaction.toggle(*args, 'wow') == ('changed', 'like')
+        assert Reaction.toggle(*args, 'wow') == ('removed', 'wow')
+        db.session.commit()
+        assert Reaction.query.count() == 0
+        assert counters(test_opportunity.id)[0] == {'like': 0, 'love': 0, 'wow': 0}
+
+    def test_parallel_toggles(self, app, test_opportunity):
+        """Test that many simultaneous toggles leave no duplicates or drift."""
+        users = []
+        for i in range(4):
+            user = User(username=f'clicker{i}', email=f'clicker{i}@example.com')
+            user.set_password('password123')
+            users.append(user)
+        db.session.add_all(users)
+        db.session.commit()
+        names = [user.username for user in users]
+
+        # User i toggles i + 3 times, so odd totals end up bookmarked/reacted
+        jobs = []
+        for i, name in enumerate(names):
+            client = app.test_client()
+            client.post('/login', json={'username': name, 'password': 'password123'})
+            jobs += [(client, i)] * (i + 3)
+        start = threading.Barrier(len(jobs))
+
+        def fire(job):
+            client, i = job
+            start.wait()
+            bookmark = client.post(f'/opportunity/{test_opportunity.id}/bookmark')
+            reaction = client.post(f'/opportunity/{test_opportunity.id}/react',
+                                   json={'reaction_type': 'like'})
+            return bookmark.status_code, reaction.status_code
+
+        with ThreadPoolExecutor(max_workers=len(jobs)) as pool:
+            statuses = list(pool.map(fire, jobs))
+
+        assert all(status in (200, 201) for pair in statuses for status in pair)
+        db.session.expire_all()
+        expected = sum(1 for i in range(len(names)) if (i + 3) % 2)
+        assert Bookmark.query.count() == expected
+        assert Reaction.query.count() == expected
+        assert counters(test_opportunity.id) == ({'like': expected, 'love': 0, 'wow': 0}, expected)
+        assert list(counter_checks.find_drift()) == []
+
+
+class TestCounterCommands:
+    """Test the counters verify/repair CLI."""
+
+    def test_verify_and_repair(self, runner, test_user, test_opportunity):
+        """Test that drift is reported and then fixed from source rows."""
+        db.session.add(Reaction(user_id=test_user.id, opportunity_id=test_opportunity.id,
+                                reaction_type='wow'))
+        db.session.add(Bookmark(user_id=test_user.id, opportunity_id=test_opportunity.id))
+        db.session.commit()
+
+        result = runner.invoke(args=['counters', 'verify'])
+        assert result.exit_code == 1
+        assert f'Opportunity {test_opportunity.id}' in result.output
+        assert 'wow_count 0 != 1' in result.output
+
+        result = runner.invoke(args=['counters', 'repair'])
+        assert 'Repaired 1 opportunities.' in result.output
+        assert counters(test_opportunity.id) == ({'like': 0, 'love': 0, 'wow': 1}, 1)
+
+        result = runner.invoke(args=['counters', 'verify'])
+        assert result.exit_code == 0
@@ -0,0 +1,93 @@
+import gzip
+import json
+import zlib
+from datetime import date, datetime
+
+import pytest
+from flask import Flask
+from app import db
+from app.json_provider import JSONProvider, orjson
+from app.models import Opportunity
+
+BACKENDS = ['stdlib'] + (['orjson'] if orjson is not None else [])
+
+
+def provider(backend):
+    app = Flask(__name__)
+    app.config['JSON_BACKEND'] = backend
+    return JSONProvider(app)
+
+
+@pytest.fixture
+def many(app, test_user):
+    """Enough approved opportunities for the feed body to pass the threshold."""
+    for i in range(10):
+        db.session.add(Opportunity(title=f'Opportunity {i}', description='x' * 200, category='Education',
+                                   location='Test City', user_id=test_user.id, is_approved=True))
+    db.session.commit()
+
+
+class TestJSONProvider:
+    """Test both JSON backends."""
+
+    @pytest.mark.parametrize('backend', BACKENDS)
+    def test_datetimes_and_keys(self, backend):
+        """Test ISO datetimes and sorted keys."""
+        json_provider = provider(backend)
+        assert json_provider.backend == backend
+        value = {'b': datetime(2026, 10, 17, 9, 30, 5, 120000), 'a': date(2026, 1, 2)}
+        text = json_provider.dumps(value)
+        assert json.loads(text) == {'a': '2026-01-02', 'b': '2026-10-17T09:30:05.120000'}
+        assert text.index('"a"') < text.index('"b"')
+        assert json_provider.loads(text.encode()) == json.loads(text)
+
+    @pytest.mark.skipif(orjson is None, reason='orjson not installed')
+    def test_backends_agree(self):
+        """Test that both backends produce the same document."""
+        value = {'when': datetime(2026, 10, 17, 9, 30), 'items': [{'id': 1, 'name': 'é'}], 'none': None}
+        assert json.loads(provider('orjson').dumps(value)) == json.loads(provider('stdlib').dumps(value))
+
+    def test_unknown_backend(self):
+        """Test that a misspelled backend fails at startup."""
+        with pytest.raises(ValueError):
+            provider('simdjson')
+
+    def test_routes_use_the_provider(self, client, test_opportunity):
+        """Test that models hand over datetimes and responses carry ISO strings."""
+        opportunity = client.get(f'/opportunity/{test_opportunity.id}').get_json()
+        assert datetime.fromisoformat(opportunity['created_at']) == test_opportunity.created_at
+
+
+class TestCompression:
+    """Test negotiated response compression."""
+
+    def test_gzip(self, client, many):
+        """Test that large JSON bodies are gzipped for clients that ask."""
+        plain = client.get('/?per_page=10')
+        response = client.get('/?per_page=10', headers={'Accept-Encoding': 'gzip, deflate'})
+        assert response.headers['Content-Encoding'] == 'gzip'
+        assert 'Accept-Encoding' in response.headers['Vary']
+        assert int(response.headers['Content-Length']) < len(plain.data)
+        assert json.loads(gzip.decompress(response.data)) == plain.get_json()
+
+    def test_deflate_when_preferred(self, client, many):
+        """Test that q-values pick the encoding."""
+        response = client.get('/?per_page=10', headers={'Accept-Encoding': 'gzip;q=0.5, deflate'})
+        assert response.headers['Content-Encoding'] == 'deflate'
+        assert json.loads(zlib.decompress(response.data))['opportunities']
+
+    def test_not_compressed(self, app, client, many):
+        """Test the threshold, clients that refuse, and clients that do not ask."""
+        assert 'Content-Encoding' not in client.get('/?per_page=10').headers
+        assert 'Content-Encoding' not in client.get(
+            '/?per_page=10', headers={'Accept-Encoding': 'gzip;q=0, identity'}).headers
+        small = client.get('/categories', headers={'Accept-Encoding': 'gzip'})
+        assert 'Content-Encoding' not in small.headers
+
+    def test_weak_etag_still_revalidates(self, client, many):
+        """Test that the weakened ETag of a compressed body still gets a 304."""
+        headers = {'Accept-Encoding': 'gzip'}
+        first = client.get('/?per_page=10', headers=headers)
+        assert first.headers['ETag'].startswith('W/')
+        again = client.get('/?per_page=10', headers={**headers, 'If-None-Match': first.headers['ETag']})
+        assert again.status_code == 304
@@ -0,0 +1,146 @@
+import random
+
+import pytest
+from app import db
+from app.geo import bounding_box, covering_cells, distances_km, encode
+from app.models import Opportunity
+
+
+@pytest.fixture
+def located(app, test_user):
+    """Opportunities around central London, one far away and one without a point."""
+    specs = [
+        ('Trafalgar', 'Education', 51.5080, -0.1281, True),
+        ('Camden', 'Climate', 51.5390, -0.1426, True),        # ~3.6 km
+        ('Greenwich', 'Education', 51.4826, -0.0077, True),   # ~8.8 km
+        ('Oxford', 'Education', 51.7520, -1.2577, True),      # ~82 km
+        ('Pending', 'Education', 51.5081, -0.1282, False),
+        ('Nowhere', 'Education', None, None, True),
+    ]
+    for title, category, latitude, longitude, approved in specs:
+        db.session.add(Opportunity(title=title, description='d', category=category,
+                                   location='London', latitude=latitude, longitude=longitude,
+                                   user_id=test_user.id, is_approved=approved))
+    db.session.commit()
+
+
+def in_box(box, lat, lon):
+    south, north, west, east = box
+    if not south <= lat <= north:
+        return False
+    if west is None:
+        return True
+    return west <= lon <= east if west <= east else (lon >= west or lon <= east)
+
+
+def near(client, query):
+    response = client.get(f'/?per_page=50&{query}')
+    assert response.status_code == 200
+    return {opp['title']: opp['distance_km'] for opp in response.get_json()['opportunities']}
+
+
+class TestGeohash:
+    """Test geohash encoding and cell covering."""
+
+    def test_known_geohash(self):
+        """Test against a published geohash value."""
+        assert encode(57.64911, 10.40744, 11) == 'u4pruydqqvj'
+
+    def test_cells_cover_the_circle(self):
+        """Test that every point within the radius lies in a covering cell."""
+        rng = random.Random(3)
+        for _ in range(200):
+            latitude, longitude = rng.uniform(-80, 80), rng.uniform(-180, 180)
+            radius_km = rng.choice((0.5, 5, 50, 800))
+            cells = covering_cells(latitude, longitude, radius_km)
+            for _ in range(20):
+                lat = latitude + rng.uniform(-1, 1) * radius_km / 111
+                lon = ((longitude + rng.uniform(-1, 1) * radius_km / 50 + 180) % 360) - 180
+                if not -90 <= lat <= 90:
+                    continue
+                if distances_km(latitude, longitude, [(0, lat, lon)])[0] <= radius_km:
+                    assert any(encode(lat, lon).startswith(cell) for cell in cells)
+
+
+    def test_box_contains_the_circle(self):
+        """Test that every point within the radius lies in the bounding box, across the antimeridian too."""
+        rng = random.Random(5)
+        for _ in range(200):
+            latitude = rng.uniform(-85, 85)
+            longitude = rng.choice((rng.uniform(-180, 180), rng.uniform(178, 180)))
+            radius_km = rng.choice((0.5, 5, 50, 500))
+            box = bounding_box(latitude, longitude, radius_km)
+            for _ in range(20):
+                lat = latitude + rng.uniform(-1, 1) * radius_km / 111
+                lon = ((longitude + rng.uniform(-1, 1) * radius_km / 20 + 180) % 360) - 180
+                if -90 <= lat <= 90 and distances_km(latitude, longitude, [(0, lat, lon)])[0] <= radius_km:
+                    assert in_box(box, lat, lon)
+
+
+class TestRadiusFilter:
+    """Test the feed's ?near= filter."""
+
+    def test_exact_distance_after_cell_pruning(self, client, located):
+        """Test that only approved points within the radius come back, with distances."""
+        results = near(client, 'near=51.5080,-0.1281&radius_km=5')
+        assert sorted(results) == ['Camden', 'Trafalgar']
+        assert results['Trafalgar'] == 0
+        assert 3 < results['Camden'] < 4
+
+        assert sorted(near(client, 'near=51.5080,-0.1281&radius_km=100')) == \
+            ['Camden', 'Greenwich', 'Oxford', 'Trafalgar']
+
+    def test_database_measures_above_the_cap(self, app, client, located):
+        """Test that past GEO_FILTER_MAX_INLINE_IDS the database checks the distances, with the same results."""
+        app.config['GEO_FILTER_MAX_INLINE_IDS'] = 1
+        statements = []
+        record = lambda conn, cursor, statement, *args: statements.append(statement)
+        db.event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            results = near(client, 'near=51.5080,-0.1281&radius_km=5')
+        finally:
+            db.event.remove(db.engine, 'before_cursor_execute', record)
+        assert sorted(results) == ['Camden', 'Trafalgar']
+        assert 3 < results['Camden'] < 4
+        assert any('sin(' in statement for statement in statements)
+        assert sorted(near(client, 'near=51.5080,-0.1281&radius_km=100')) == \
+            ['Camden', 'Greenwich', 'Oxford', 'Trafalgar']
+
+    @pytest.mark.parametrize('max_inline', [500, 1])
+    def test_across_the_antimeridian(self, app, client, test_user, max_inline):
+        """Test a circle that spans longitude 180."""
+        app.config['GEO_FILTER_MAX_INLINE_IDS'] = max_inline
+        for title, longitude in (('East', 179.99), ('West', -179.99), ('Far', -179.5)):
+            db.session.add(Opportunity(title=title, description='d', category='Education',
+                                       location='Fiji', latitude=-17.0, longitude=longitude,
+                                       user_id=test_user.id, is_approved=True))
+        db.session.commit()
+        assert sorted(near(client, 'near=-17.0,180&radius_km=5')) == ['East', 'West']
+
+    def test_composes_with_other_filters(self, client, located):
+        """Test the radius together with the category filter."""
+        assert sorted(near(client, 'near=51.5080,-0.1281&radius_km=10&category=Education')) == \
+            ['Greenwich', 'Trafalgar']
+
+    def test_geohash_follows_edits(self, client, located, test_user):
+        """Test that moving an opportunity moves it in and out of the radius."""
+        client.post('/login', json={'username': 'testuser', 'password': 'password123'})
+        oxford = Opportunity.query.filter_by(title='Oxford').one()
+        response = client.post(f'/opportunity/{oxford.id}/edit',
+                               json={'latitude': 51.5079, 'longitude': -0.1280})
+        assert response.status_code == 200
+        assert 'Oxford' in near(client, 'near=51.5080,-0.1281&radius_km=1')
+
+    def test_validation(self, client, test_user):
+        """Test bad near/radius values and half-given coordinates."""
+        assert client.get('/?near=91,0').status_code == 400
+        assert client.get('/?near=london').status_code == 400
+        assert client.get('/?near=51,0&radius_km=0').status_code == 400
+        assert client.get('/?near=51,0&radius_km=100000').status_code == 400
+
+        client.post('/login', json={'username': 'testuser', 'password': 'password123'})
+        response = client.post('/new', json={
+            'title': 'T', 'description': 'd', 'category': 'Education',
+            'location': 'L', 'latitude': 51.5,
+        })
+        assert response.status_code == 400
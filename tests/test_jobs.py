@@ -0,0 +1,214 @@
+from datetime import datetime, timedelta
+
+import pytest
+from app import db
+from app.jobs import TASKS, PermanentFailure, Worker, job, job_queue
+from app.models import Job, Tag
+
+calls = []
+
+
+@job(name='tests.record')
+def record(value, suffix=''):
+    calls.append(f'{value}{suffix}')
+
+
+@job(name='tests.add_tag', max_attempts=2)
+def add_tag(name, fail=False):
+    db.session.add(Tag(name=name))
+    db.session.flush()
+    if fail:
+        raise RuntimeError('boom')
+
+
+@job(name='tests.give_up')
+def give_up():
+    raise PermanentFailure('no point retrying')
+
+
+@job(name='tests.steal_lease')
+def steal_lease(name):
+    db.session.add(Tag(name=name))
+    # Another worker took the job over while this one was running
+    db.session.execute(db.update(Job).values(locked_by='someone-else'))
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    calls.clear()
+
+
+@pytest.fixture
+def worker(app):
+    app.config['JOBS_BACKOFF_SECONDS'] = 0
+    return Worker(app, batch_size=10, poll_seconds=0)
+
+
+def jobs():
+    db.session.expire_all()
+    return Job.query.order_by(Job.id).all()
+
+
+class TestEnqueue:
+    """Test adding jobs."""
+
+    def test_registered(self):
+        """Test that @job registers the task and keeps it callable."""
+        assert TASKS['tests.record'] is record
+        record('inline')
+        assert calls == ['inline']
+        with pytest.raises(ValueError):
+            job(name='tests.record')(lambda: None)
+
+    def test_part_of_the_transaction(self, app):
+        """Test that a job exists only if the enqueuing transaction commits."""
+        record.delay('lost')
+        db.session.rollback()
+        assert jobs() == []
+
+        job_id = record.delay('kept', suffix='!')
+        db.session.commit()
+        [stored] = jobs()
+        assert stored.id == job_id
+        assert (stored.task, stored.status, stored.max_attempts) == ('tests.record', 'queued', 5)
+
+    def test_idempotency_key(self, app):
+        """Test that a repeated key adds the job once."""
+        first = record.enqueue(('a',), idempotency_key='welcome:1')
+        second = record.enqueue(('b',), idempotency_key='welcome:1')
+        db.session.commit()
+        assert first == second
+        assert len(jobs()) == 1
+
+    def test_arguments_must_be_json(self, app):
+        """Test that unserializable arguments fail at enqueue time."""
+        with pytest.raises(TypeError):
+            record.delay(object())
+
+
+class TestWorker:
+    """Test running jobs."""
+
+    def test_runs_by_priority(self, app, worker):
+        """Test that higher priorities run first, then older jobs."""
+        record.delay('low')
+        record.enqueue(('high',), priority=10)
+        record.delay('low again')
+        record.enqueue(('later',), priority=100, countdown=3600)
+        db.session.commit()
+
+        assert worker.run(until_idle=True) == 3
+        assert calls == ['high', 'low', 'low again']
+        assert [j.status for j in jobs()] == ['done', 'done', 'done', 'queued']
+
+    def test_batches_and_max_jobs(self, app):
+        """Test that a worker stops after max_jobs."""
+        for i in range(5):
+            record.delay(i)
+        db.session.commit()
+        assert Worker(app, batch_size=2, poll_seconds=0).run(max_jobs=3) == 3
+        assert calls == ['0', '1', '2']
+
+    def test_job_writes_commit_with_done(self, app, worker):
+        """Test that a job's changes and its done mark commit together."""
+        add_tag.delay('from a job')
+        db.session.commit()
+        worker.run(until_idle=True)
+        assert Tag.query.filter_by(name='from a job').count() == 1
+        assert jobs()[0].finished_at is not None
+
+    def test_retries_then_fails(self, app, worker):
+        """Test that a failing job is retried with backoff, then left failed."""
+        app.config['JOBS_BACKOFF_SECONDS'] = 60
+        add_tag.delay('never', fail=True)
+        db.session.commit()
+
+        assert worker.run(until_idle=True) == 1
+        [failed_once] = jobs()
+        assert (failed_once.status, failed_once.attempts) == ('queued', 1)
+        assert 'boom' in failed_once.last_error
+        assert failed_once.run_at >= datetime.utcnow() + timedelta(seconds=29)
+        # The failed attempt's writes were rolled back
+        assert Tag.query.filter_by(name='never').count() == 0
+
+        failed_once.run_at = datetime.utcnow()
+        db.session.commit()
+        worker.run(until_idle=True)
+        [failed] = jobs()
+        assert (failed.status, failed.attempts) == ('failed', 2)
+
+        assert job_queue.retry(failed.id)
+        assert not job_queue.retry(failed.id)
+        assert jobs()[0].status == 'queued'
+
+    def test_permanent_failure(self, app, worker):
+        """Test that PermanentFailure fails the job without using its other attempts."""
+        give_up.delay()
+        db.session.commit()
+        worker.run(until_idle=True)
+        [failed] = jobs()
+        assert (failed.status, failed.attempts) == ('failed', 1)
+        assert 'no point retrying' in failed.last_error
+
+    def test_unknown_task(self, app, worker):
+        """Test that a job for a task nobody registered fails like any error."""
+        job_queue.enqueue('tests.missing', max_attempts=1)
+        db.session.commit()
+        worker.run(until_idle=True)
+        assert jobs()[0].status == 'failed'
+        assert 'Unknown task' in jobs()[0].last_error
+
+    def test_lost_lease_rolls_back(self, app, worker):
+        """Test that a worker whose lease was taken over keeps none of its writes."""
+        steal_lease.delay('stolen')
+        db.session.commit()
+        worker.run(until_idle=True)
+        assert Tag.query.filter_by(name='stolen').count() == 0
+        assert jobs()[0].status == 'running'
+
+    def test_expired_leases_requeued(self, app, worker):
+        """Test that jobs held by a dead worker go back to the queue."""
+        record.delay('orphan')
+        record.enqueue(('exhausted',), priority=1)
+        db.session.commit()
+        dead = Worker(app)
+        dead.claim(2)
+        orphan, exhausted = jobs()
+        for stored in (orphan, exhausted):
+            stored.locked_until = datetime.utcnow() - timedelta(seconds=1)
+        exhausted.max_attempts = 1
+        db.session.commit()
+
+        assert worker.run(until_idle=True) == 1
+        assert calls == ['orphan']
+        assert [j.status for j in jobs()] == ['done', 'failed']
+
+    def test_stop_releases_the_rest(self, app, worker):
+        """Test that a stopped worker hands back the jobs it has not started."""
+        for i in range(3):
+            record.delay(i)
+        db.session.commit()
+        TASKS['tests.record'].fn, original = lambda value: worker.stop(), record.fn
+        try:
+            assert worker.run() == 1
+        finally:
+            TASKS['tests.record'].fn = original
+        assert [(j.status, j.attempts) for j in jobs()] == [('done', 1), ('queued', 0), ('queued', 0)]
+
+
+class TestCommands:
+    """Test the jobs CLI."""
+
+    def test_work_stats_prune(self, app, runner):
+        """Test running, counting and pruning jobs from the command line."""
+        record.delay('cli')
+        db.session.commit()
+        result = runner.invoke(args=['jobs', 'work', '--until-idle'])
+        assert 'ran 1 jobs' in result.output
+        assert calls == ['cli']
+
+        result = runner.invoke(args=['jobs', 'stats'])
+        assert 'done     1' in result.output
+        assert 'Deleted 0' in runner.invoke(args=['jobs', 'prune']).output
+        assert 'Deleted 1' in runner.invoke(args=['jobs', 'prune', '--older-than', '0']).output
+        assert runner.invoke(args=['jobs', 'retry', '1']).exit_code == 1
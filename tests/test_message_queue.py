@@ -0,0 +1,155 @@
+import json
+import multiprocessing
+import socket
+import time
+import urllib.request
+import uuid
+
+import pytest
+import serve
+from app import create_app, socketio
+from app.message_queue import LocalManager, MessageHub, parse_ipc_address
+from app.realtime import ENGAGEMENT_EVENT, room_for
+
+
+def emit_from_worker(queue_url, channel, opportunity_id, payload):
+    """Runs in a separate process: a second worker emitting to a room."""
+    import os
+    os.environ['SOCKETIO_MESSAGE_QUEUE'] = queue_url
+    os.environ['SOCKETIO_CHANNEL'] = channel
+    app = create_app()
+    with app.app_context():
+        socketio.emit(ENGAGEMENT_EVENT, payload, to=room_for(opportunity_id))
+
+
+def wait_for(predicate, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.05)
+    return False
+
+
+class TestIPCAddresses:
+    """Test parsing of ipc:// queue URLs."""
+
+    def test_tcp_and_unix_addresses(self):
+        assert parse_ipc_address('ipc://127.0.0.1:5099') == ('127.0.0.1', 5099)
+        assert parse_ipc_address('ipc:///tmp/socketio.sock') == '/tmp/socketio.sock'
+
+    def test_invalid_addresses(self):
+        for url in ('redis://localhost:6379', 'ipc://localhost'):
+            with pytest.raises(ValueError):
+                parse_ipc_address(url)
+
+
+class TestLocalManager:
+    """Test the in-process pub/sub bus."""
+
+    def test_publish_reaches_other_managers_on_the_channel(self):
+        channel = uuid.uuid4().hex
+        sender = LocalManager(channel=channel)
+        receiver = LocalManager(channel=channel)
+        other = LocalManager(channel=channel + '-other')
+        try:
+            sender._publish({'method': 'emit', 'event': 'ping'})
+            assert next(receiver._listen()) == '{"method": "emit", "event": "ping"}'
+            assert other._inbox.empty()
+        finally:
+            for manager in (sender, receiver, other):
+                manager.close()
+
+
+class PollingClient:
+    """Just enough of the Engine.IO v4 long-polling protocol to join a room."""
+
+    def __init__(self, base_url):
+        self.url = f'{base_url}/socket.io/?EIO=4&transport=polling'
+        handshake = self._get()[0]
+        self.url += '&sid=' + json.loads(handshake[1:])['sid']
+        self._post('40')
+        self.packets = self._get()   # the namespace connect reply
+
+    def _get(self, timeout=30):
+        with urllib.request.urlopen(self.url, timeout=timeout) as response:
+            return response.read().decode().split('\x1e')
+
+    def _post(self, body):
+        request = urllib.request.Request(self.url, data=body.encode(), method='POST')
+        urllib.request.urlopen(request, timeout=30).close()
+
+    def call(self, event, data):
+        """Emit with an ack and return the ack's payload"""
+        self._post('421' + json.dumps([event, data]))
+        while True:
+            for packet in self._get():
+                if packet.startswith('431'):
+                    return json.loads(packet[3:])[0]
+
+    def wait_for_event(self, event, timeout=10):
+        """Return the first payload of ``event``, or None after ``timeout``"""
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                packets = self._get(timeout=deadline - time.monotonic())
+            except OSError:
+                return None
+            for packet in packets:
+                if packet.startswith('42'):
+                    name, *args = json.loads(packet[2:])
+                    if name == event:
+                        return args[0]
+        return None
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def connect(base_url, timeout=30):
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            return PollingClient(base_url)
+        except OSError:
+            if time.monotonic() > deadline:
+                raise
+            time.sleep(0.2)
+
+
+class TestCrossWorkerFanOut:
+    """Test that an emit on one worker process reaches a client on another."""
+
+    def test_emit_from_worker_a_reaches_client_on_worker_b(self, monkeypatch):
+        channel = f'test-{uuid.uuid4().hex}'
+        hub = MessageHub(('127.0.0.1', 0), authkey=b'dev').start()
+        queue_url = f'ipc://127.0.0.1:{hub.address[1]}'
+        monkeypatch.setenv('SECRET_KEY', 'dev')
+        monkeypatch.setenv('SOCKETIO_MESSAGE_QUEUE', queue_url)
+        monkeypatch.setenv('SOCKETIO_CHANNEL', channel)
+        context = multiprocessing.get_context('spawn')
+
+        # Worker B serves the client; worker A only shares the hub with it
+        port = free_port()
+        worker_b = context.Process(target=serve.run_worker, args=('127.0.0.1', port), daemon=True)
+        worker_b.start()
+        try:
+            client = connect(f'http://127.0.0.1:{port}')
+            assert client.call('subscribe', {'opportunity_ids': [42]}) == {'subscribed': [42]}
+            assert wait_for(lambda: hub.subscriber_count(channel) == 1)
+
+            payload = {'opportunity_id': 42, 'bookmark_count': 3}
+            worker_a = context.Process(target=emit_from_worker,
+                                       args=(queue_url, channel, 42, payload))
+            worker_a.start()
+            worker_a.join(30)
+            assert worker_a.exitcode == 0
+
+            assert client.wait_for_event(ENGAGEMENT_EVENT) == payload
+        finally:
+            worker_b.terminate()
+            worker_b.join(10)
+            hub.close()
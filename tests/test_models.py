@@ -1,5 +1,6 @@
 import pytest
-from app.models import User, Opportunity, Report
+from sqlalchemy import event
+from app.models import User, Opportunity, Report, Reaction, Bookmark, serialize_opportunities
 from app import db
 from werkzeug.security import check_password_hash
 
@@ -192,3 +193,80 @@ class TestReport:
             repr_str = repr(report)
             assert 'Report' in repr_str
             assert str(test_user.id) in repr_str
+
+
+class TestOpportunitySerialization:
+    """Test the compact opportunity representation."""
+
+    def _populate(self, user, count):
+        opportunities = []
+        for i in range(count):
+            opportunity = Opportunity(
+                title=f'Opportunity {i}',
+                description='Serialized',
+                category='Education',
+                location='Test City',
+                user_id=user.id,
+                is_approved=True,
+                like_count=1,
+                bookmark_count=1
+            )
+            db.session.add(opportunity)
+            opportunities.append(opportunity)
+        db.session.flush()
+        for opportunity in opportunities:
+            db.session.add(Reaction(user_id=user.id, opportunity_id=opportunity.id, reaction_type='like'))
+            db.session.add(Bookmark(user_id=user.id, opportunity_id=opportunity.id))
+        ids = [opportunity.id for opportunity in opportunities]
+        db.session.commit()
+        db.session.expunge_all()
+        return ids
+
+    def _count_queries(self, fn):
+        statements = []
+
+        def record(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            fn()
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+        return len(statements)
+
+    def test_summary_counts(self, app, test_user):
+        """Test that reactions and bookmarks are summarized as counts."""
+        with app.app_context():
+            self._populate(test_user, 1)
+            data = serialize_opportunities(Opportunity.query.all())[0]
+
+            assert data['reaction_counts'] == {'like': 1, 'love': 0, 'wow': 0}
+            assert data['bookmark_count'] == 1
+            assert data['username'] == 'testuser'
+            assert 'reactions' not in data
+            assert 'bookmarks' not in data
+
+    def test_expand_includes_child_rows(self, app, test_user):
+        """Test that expand returns the full child lists."""
+        with app.app_context():
+            self._populate(test_user, 1)
+            data = serialize_opportunities(Opportunity.query.all(),
+                                           expand=('reactions', 'bookmarks'))[0]
+
+            assert [r['reaction_type'] for r in data['reactions']] == ['like']
+            assert len(data['bookmarks']) == 1
+
+    def test_query_count_independent_of_page_size(self, app, test_user):
+        """Test that serializing a page uses a fixed number of queries."""
+        with app.app_context():
+            ids = self._populate(test_user, 10)
+
+            def serialize(page_ids):
+                opportunities = Opportunity.query.filter(Opportunity.id.in_(page_ids)).all()
+                serialize_opportunities(opportunities)
+
+            small = self._count_queries(lambda: serialize(ids[:2]))
+            db.session.expunge_all()
+            large = self._count_queries(lambda: serialize(ids))
+            assert small == large
@@ -0,0 +1,366 @@
+from datetime import datetime, timedelta
+
+import pytest
+from flask import g
+from flask.testing import FlaskClient
+from app import db
+from app.models import Opportunity, Report, User
+
+
+@pytest.fixture
+def pending(app, test_user):
+    """Six pending opportunities, oldest first."""
+    start = datetime(2026, 1, 1)
+    with app.app_context():
+        opportunities = [
+            Opportunity(title=f'Pending {i}', description='Needs review', category='Education',
+                        location='Test City', user_id=test_user.id,
+                        created_at=start + timedelta(minutes=i))
+            for i in range(6)
+        ]
+        db.session.add_all(opportunities)
+        db.session.commit()
+        return [opportunity.id for opportunity in opportunities]
+
+
+@pytest.fixture
+def second_moderator(app):
+    with app.app_context():
+        moderator = User(username='moderator2', email='moderator2@example.com', role='moderator')
+        moderator.set_password('moderator456')
+        db.session.add(moderator)
+        db.session.commit()
+        return moderator.id
+
+
+class SessionClient(FlaskClient):
+    """A client that always acts as the user in its own session cookie.
+
+    The app fixture keeps one app context open, so flask-login's cached user
+    in ``g`` would otherwise leak from one client's request to the next.
+    """
+
+    def open(self, *args, **kwargs):
+        g.pop('_login_user', None)
+        return super().open(*args, **kwargs)
+
+
+def login(app, username, password):
+    client = SessionClient(app, app.response_class, use_cookies=True)
+    client.post('/login', json={'username': username, 'password': password})
+    return client
+
+
+@pytest.fixture
+def moderator_client(app, test_moderator):
+    return login(app, 'moderator', 'moderator123')
+
+
+@pytest.fixture
+def other_client(app, second_moderator):
+    return login(app, 'moderator2', 'moderator456')
+
+
+def ids(response):
+    return [item['id'] for item in response.get_json()['opportunities']]
+
+
+class TestQueuePages:
+    """Test keyset paging over pending opportunities."""
+
+    def test_pages_oldest_first(self, moderator_client, pending, test_opportunity):
+        """Test that pages walk the pending items in order and skip approved ones."""
+        first = moderator_client.get('/moderator/opportunities?per_page=4')
+        data = first.get_json()
+        assert ids(first) == pending[:4]
+        assert data['pagination']['has_more'] is True
+
+        cursor = data['pagination']['next_cursor']
+        second = moderator_client.get(f'/moderator/opportunities?per_page=4&after={cursor}')
+        assert ids(second) == pending[4:]
+        assert second.get_json()['pagination'] == {'per_page': 4, 'next_cursor': None, 'has_more': False}
+
+    def test_invalid_cursor_and_view(self, moderator_client, pending):
+        """Test that bad parameters are rejected."""
+        assert moderator_client.get('/moderator/opportunities?after=nope').status_code == 400
+        assert moderator_client.get('/moderator/opportunities?view=other').status_code == 400
+
+
+class TestLeases:
+    """Test claiming batches of the queue."""
+
+    def test_claims_are_disjoint(self, moderator_client, other_client, pending, second_moderator):
+        """Test that two moderators claiming in turn get different items."""
+        mine = moderator_client.post('/moderator/opportunities/claim', json={'count': 4})
+        theirs = other_client.post('/moderator/opportunities/claim', json={'count': 4})
+        assert ids(mine) == pending[:4]
+        assert ids(theirs) == pending[4:]
+        assert theirs.get_json()['opportunities'][0]['claimed_by_id'] == second_moderator
+
+        available = moderator_client.get('/moderator/opportunities?view=available')
+        assert ids(available) == pending[:4]
+        assert ids(moderator_client.get('/moderator/opportunities?view=mine')) == pending[:4]
+
+    def test_claim_count_is_capped(self, app, moderator_client, pending):
+        """Test that one claim cannot take more than MODERATION_CLAIM_MAX items."""
+        app.config['MODERATION_CLAIM_MAX'] = 2
+        assert ids(moderator_client.post('/moderator/opportunities/claim', json={'count': 10})) == pending[:2]
+        assert moderator_client.post('/moderator/opportunities/claim', json={'count': 0}).status_code == 400
+
+    def test_expired_lease_returns_to_queue(self, app, moderator_client, other_client, pending):
+        """Test that an expired claim can be taken by someone else."""
+        moderator_client.post('/moderator/opportunities/claim', json={'count': 6})
+        with app.app_context():
+            db.session.execute(db.update(Opportunity).where(Opportunity.id.in_(pending[:2]))
+                               .values(claim_expires_at=datetime.utcnow() - timedelta(seconds=1)))
+            db.session.commit()
+
+        assert ids(other_client.post('/moderator/opportunities/claim', json={'count': 6})) == pending[:2]
+        assert ids(moderator_client.get('/moderator/opportunities?view=mine')) == pending[2:]
+
+    def test_release(self, moderator_client, other_client, pending):
+        """Test that released items go back to the queue."""
+        moderator_client.post('/moderator/opportunities/claim', json={'count': 3})
+        response = moderator_client.post('/moderator/opportunities/release', json={'ids': pending[:2]})
+        assert response.get_json() == {'released': 2}
+
+        assert ids(other_client.post('/moderator/opportunities/claim', json={'count': 3})) == \
+            [pending[0], pending[1], pending[3]]
+
+    def test_leased_item_cannot_be_decided_by_others(self, moderator_client, other_client, pending):
+        """Test that approve/reject answer 409 under another moderator's lease."""
+        moderator_client.post('/moderator/opportunities/claim', json={'count': 1})
+
+        assert other_client.post(f'/moderator/approve/{pending[0]}').status_code == 409
+        assert other_client.post(f'/moderator/reject/{pending[0]}').status_code == 409
+
+        response = moderator_client.post(f'/moderator/approve/{pending[0]}')
+        assert response.status_code == 200
+        assert response.get_json()['is_approved'] is True
+        assert ids(moderator_client.get('/moderator/opportunities?view=mine')) == []
+
+
+class TestBulkActions:
+    """Test the one-transaction bulk endpoints."""
+
+    def test_bulk_approve(self, app, moderator_client, other_client, pending, test_moderator):
+        """Test per-id outcomes for a mixed batch."""
+        other_client.post('/moderator/opportunities/claim', json={'count': 1})
+        moderator_client.post(f'/moderator/approve/{pending[1]}')
+
+        response = moderator_client.post('/moderator/bulk/approve',
+                                         json={'ids': pending[:4] + [999, pending[2]]})
+        assert response.status_code == 200
+        assert response.get_json() == {
+            'action': 'approve',
+            'results': {str(pending[0]): 'claimed', str(pending[1]): 'already_approved',
+                        str(pending[2]): 'approved', str(pending[3]): 'approved', '999': 'not_found'},
+            'counts': {'claimed': 1, 'already_approved': 1, 'approved': 2, 'not_found': 1},
+        }
+        with app.app_context():
+            approved = db.session.get(Opportunity, pending[2])
+            assert approved.is_approved and approved.approved_by_id == test_moderator.id
+
+    def test_bulk_reject_and_delete(self, app, moderator_client, pending, test_user, test_opportunity):
+        """Test that rows and their dependents are removed in one go."""
+        client = login(app, 'testuser', 'password123')
+        client.post(f'/opportunity/{test_opportunity.id}/react', json={'reaction_type': 'like'})
+        client.post(f'/opportunity/{test_opportunity.id}/bookmark')
+        client.post('/report', json={'reason': 'Spam', 'reported_opportunity_id': test_opportunity.id})
+
+        rejected = moderator_client.post('/moderator/bulk/reject', json={'ids': pending[:2]})
+        assert rejected.get_json()['counts'] == {'rejected': 2}
+        deleted = moderator_client.post('/moderator/bulk/delete', json={'ids': [test_opportunity.id]})
+        assert deleted.get_json()['results'] == {str(test_opportunity.id): 'deleted'}
+
+        with app.app_context():
+            remaining = db.session.execute(db.select(Opportunity.id)).scalars().all()
+            assert sorted(remaining) == pending[2:]
+            assert db.session.execute(db.text('SELECT count(*) FROM reaction')).scalar() == 0
+            assert db.session.execute(db.text('SELECT count(*) FROM bookmark')).scalar() == 0
+            assert db.session.execute(
+                db.text('SELECT reported_opportunity_id FROM report')).scalar() is None
+
+    def test_bulk_mark_reviewed(self, moderator_client, test_report):
+        """Test marking reports reviewed in bulk."""
+        first = moderator_client.post('/moderator/bulk/mark_reviewed', json={'ids': [test_report.id]})
+        again = moderator_client.post('/moderator/bulk/mark_reviewed', json={'ids': [test_report.id]})
+        assert first.get_json()['results'] == {str(test_report.id): 'reviewed'}
+        assert again.get_json()['results'] == {str(test_report.id): 'already_reviewed'}
+
+    def test_one_event_per_batch(self, app, moderator_client, pending, caplog):
+        """Test that a batch sends one feed signal and one audit line."""
+        from app.signals import feed_changed
+        sent = []
+        with feed_changed.connected_to(lambda sender, **kwargs: sent.append(kwargs), app):
+            with caplog.at_level('INFO', logger='app.moderation.audit'):
+                moderator_client.post('/moderator/bulk/approve', json={'ids': pending})
+
+        assert sent == [{'opportunity_ids': pending, 'membership': True}]
+        assert len(caplog.records) == 1
+        assert 'action=approve' in caplog.records[0].getMessage()
+
+    def test_bulk_validation(self, app, test_user, moderator_client):
+        """Test bad actions, bad ids and the permission check."""
+        assert moderator_client.post('/moderator/bulk/archive', json={'ids': [1]}).status_code == 404
+        assert moderator_client.post('/moderator/bulk/approve', json={'ids': []}).status_code == 400
+        assert moderator_client.post('/moderator/bulk/approve', json={'ids': ['1']}).status_code == 400
+        app.config['MODERATION_BULK_MAX'] = 2
+        assert moderator_client.post('/moderator/bulk/approve', json={'ids': [1, 2, 3]}).status_code == 400
+
+        user_client = login(app, 'testuser', 'password123')
+        assert user_client.post('/moderator/bulk/approve', json={'ids': [1]}).status_code == 403
+
+
+@pytest.fixture
+def reported(app, test_user, test_moderator, pending):
+    """Reports on two opportunities and one user, in a known order."""
+    with app.app_context():
+        reports = [
+            Report(reporter_id=test_user.id, reported_opportunity_id=pending[0], reason='Spam'),
+            Report(reporter_id=test_user.id, reported_user_id=test_moderator.id, reason='Rude'),
+            Report(reporter_id=test_moderator.id, reported_opportunity_id=pending[0], reason='Scam'),
+            Report(reporter_id=test_user.id, reported_opportunity_id=pending[1], reason='Old',
+                   is_reviewed=True),
+            Report(reporter_id=test_moderator.id, reported_opportunity_id=pending[0], reason='Fake'),
+        ]
+        db.session.add_all(reports)
+        db.session.commit()
+        return [report.id for report in reports]
+
+
+class TestReportTargets:
+    """Test the grouped report review."""
+
+    def test_groups_by_target(self, app, moderator_client, reported, pending, test_moderator):
+        """Test counts, latest reasons and target summaries per target."""
+        app.config['REPORT_LATEST_REASONS'] = 2
+        response = moderator_client.get('/moderator/reports/targets?status=all')
+        assert response.status_code == 200
+        targets = response.get_json()['targets']
+
+        assert [(t['type'], t['id']) for t in targets] == [
+            ('opportunity', pending[0]), ('opportunity', pending[1]), ('user', test_moderator.id)]
+        first = targets[0]
+        assert (first['report_count'], first['open_count'], first['is_reviewed']) == (3, 3, False)
+        assert [r['reason'] for r in first['latest_reports']] == ['Fake', 'Scam']
+        assert first['latest_reports'][0]['reporter_username'] == 'moderator'
+        assert first['target']['title'] == 'Pending 0'
+        assert first['target']['username'] == 'testuser'
+        assert targets[1]['is_reviewed'] is True
+        assert targets[2]['target']['username'] == 'moderator'
+
+    def test_status_type_and_paging(self, moderator_client, reported, pending, test_moderator):
+        """Test the filters and the keyset cursor."""
+        open_targets = moderator_client.get('/moderator/reports/targets').get_json()['targets']
+        assert [t['id'] for t in open_targets] == [pending[0], test_moderator.id]
+        users = moderator_client.get('/moderator/reports/targets?type=user').get_json()['targets']
+        assert [t['type'] for t in users] == ['user']
+
+        first = moderator_client.get('/moderator/reports/targets?status=all&per_page=2').get_json()
+        cursor = first['pagination']['next_cursor']
+        second = moderator_client.get(
+            f'/moderator/reports/targets?status=all&per_page=2&after={cursor}').get_json()
+        assert [t['id'] for t in second['targets']] == [test_moderator.id]
+        assert second['pagination']['has_more'] is False
+
+        assert moderator_client.get('/moderator/reports/targets?status=x').status_code == 400
+        assert moderator_client.get('/moderator/reports/targets?after=x').status_code == 400
+
+    def test_walks_reports_in_batches(self, monkeypatch, moderator_client, reported, pending,
+                                      test_moderator):
+        """Test that targets come out in order when the walk spans several batches."""
+        from app import reports
+        monkeypatch.setattr(reports, 'SCAN_BATCH', 2)
+
+        def walk(status):
+            ids, after = [], ''
+            while True:
+                page = moderator_client.get(
+                    f'/moderator/reports/targets?status={status}&per_page=1&after={after}').get_json()
+                ids += [t['id'] for t in page['targets']]
+                after = page['pagination']['next_cursor']
+                if after is None:
+                    return ids
+
+        assert walk('all') == [pending[0], pending[1], test_moderator.id]
+        assert walk('open') == [pending[0], test_moderator.id]
+        assert walk('reviewed') == [pending[1]]
+
+        # A page that runs out of windows comes back short and carries on
+        monkeypatch.setattr(reports, 'SCAN_BATCH', 1)
+        monkeypatch.setattr(reports, 'SCAN_MAX_BATCHES', 1)
+        assert walk('reviewed') == [pending[1]]
+        assert walk('all') == [pending[0], pending[1], test_moderator.id]
+
+    def test_query_count_is_fixed(self, app, moderator_client, reported, test_user):
+        """Test that a page takes the same number of queries however many reports it has."""
+        from sqlalchemy import event
+
+        def count_queries():
+            statements = []
+            listener = lambda *args: statements.append(args[2])
+            with app.app_context():
+                engine = db.engine
+            event.listen(engine, 'before_cursor_execute', listener)
+            try:
+                moderator_client.get('/moderator/reports/targets?status=all')
+            finally:
+                event.remove(engine, 'before_cursor_execute', listener)
+            return len(statements)
+
+        # The first request after login also loads the moderator's user
+        count_queries()
+        before = count_queries()
+        with app.app_context():
+            db.session.add_all([Report(reporter_id=test_user.id, reported_user_id=test_user.id,
+                                       reason=f'Report {i}') for i in range(10)])
+            db.session.commit()
+        assert count_queries() == before
+
+    def test_review_target(self, moderator_client, reported, pending):
+        """Test marking all open reports on one target reviewed."""
+        response = moderator_client.post(f'/moderator/reports/targets/opportunity/{pending[0]}/review')
+        assert response.get_json() == {'type': 'opportunity', 'id': pending[0], 'reviewed': 3}
+        open_targets = moderator_client.get('/moderator/reports/targets').get_json()['targets']
+        assert [t['type'] for t in open_targets] == ['user']
+
+
+class TestDeleteUser:
+    """Test deleting a user through the job queue."""
+
+    def test_cascade_runs_as_a_job(self, app, moderator_client, other_client, pending,
+                                   test_user, test_opportunity, second_moderator):
+        """Test that the route queues the delete and the job removes what depends on the user."""
+        from app.jobs import Worker
+        with app.app_context():
+            kept = Opportunity(title='Kept', description='Not theirs', category='Education',
+                               location='Test City', user_id=second_moderator, is_approved=True)
+            db.session.add(kept)
+            db.session.commit()
+            kept_id = kept.id
+        client = login(app, 'testuser', 'password123')
+        client.post(f'/opportunity/{kept_id}/react', json={'reaction_type': 'like'})
+        client.post(f'/opportunity/{kept_id}/bookmark')
+        client.post('/report', json={'reason': 'Spam', 'reported_opportunity_id': kept_id})
+        other_client.post('/report', json={'reason': 'Rude', 'reported_user_id': test_user.id})
+
+        response = moderator_client.delete(f'/moderator/delete_user/{test_user.id}')
+        assert response.status_code == 202
+        again = moderator_client.delete(f'/moderator/delete_user/{test_user.id}')
+        assert again.get_json()['job_id'] == response.get_json()['job_id']
+        with app.app_context():
+            assert db.session.get(User, test_user.id) is not None
+
+        assert Worker(app, poll_seconds=0).run(until_idle=True) == 1
+        with app.app_context():
+            db.session.expire_all()
+            assert db.session.get(User, test_user.id) is None
+            remaining = db.session.execute(db.select(Opportunity.id)).scalars().all()
+            assert remaining == [kept_id]
+            kept = db.session.get(Opportunity, kept_id)
+            assert (kept.like_count, kept.bookmark_count) == (0, 0)
+            assert db.session.execute(db.text('SELECT count(*) FROM reaction')).scalar() == 0
+            reports = db.session.execute(db.select(Report)).scalars().all()
+            assert [(r.reason, r.reported_user_id) for r in reports] == [('Rude', None)]
+        assert moderator_client.delete(f'/moderator/delete_user/{test_user.id}').status_code == 404
@@ -0,0 +1,159 @@
+import json
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+from app import db, mail
+from app.jobs import Worker
+from app.models import Job
+from app.outbox import outbox, send_mail
+from tests.smtp_stub import SMTPStub
+
+
+@pytest.fixture
+def stub(app):
+    """A local SMTP server the app's mail settings point at."""
+    with SMTPStub() as stub:
+        app.config.update({
+            'MAIL_SERVER': stub.host,
+            'MAIL_PORT': stub.port,
+            'MAIL_USE_TLS': False,
+            'MAIL_USE_SSL': False,
+            'MAIL_USERNAME': None,
+            'MAIL_PASSWORD': None,
+            'MAIL_SUPPRESS_SEND': False,
+            'MAIL_DEFAULT_SENDER': 'noreply@example.com',
+            'MAIL_OUTBOX_TIMEOUT': 5,
+            'JOBS_BACKOFF_SECONDS': 60,
+        })
+        mail.init_app(app)
+        yield stub
+
+
+def send(app, batch_size=10):
+    return Worker(app, batch_size=batch_size, poll_seconds=0).run(until_idle=True)
+
+
+def jobs():
+    db.session.expire_all()
+    return Job.query.order_by(Job.id).all()
+
+
+def queue(count, **options):
+    ids = [outbox.queue(f'Message {i}', [f'user{i}@example.com'], f'Body {i}', **options)
+           for i in range(count)]
+    db.session.commit()
+    return ids
+
+
+class TestQueue:
+    """Test adding messages."""
+
+    def test_part_of_the_transaction(self, app, stub):
+        """Test that a message exists only if the queuing transaction commits, and sends nothing."""
+        outbox.queue('Lost', 'a@example.com', 'Never sent')
+        db.session.rollback()
+        assert jobs() == []
+
+        queue(1)
+        [stored] = jobs()
+        assert stored.task == send_mail.name
+        assert json.loads(stored.payload)['args'][1] == ['user0@example.com']
+        assert outbox.stats()['queued'] == 1
+        assert stub.connections == 0
+
+    def test_needs_a_recipient(self, app):
+        """Test that a message without recipients is refused."""
+        with pytest.raises(ValueError):
+            outbox.queue('Nobody', [], 'Body')
+
+
+class TestSending:
+    """Test sending queued messages from the job workers."""
+
+    def test_one_connection_for_many_messages(self, app, stub):
+        """Test that a worker's batches share one SMTP connection, closed once idle."""
+        queue(25)
+        assert send(app) == 25
+        assert stub.connections == 1
+        assert outbox.stats()['done'] == 25
+
+        mail_from, rcpt_tos, data = stub.messages[0]
+        assert (mail_from, rcpt_tos) == ('noreply@example.com', ['user0@example.com'])
+        assert b'Subject: Message 0' in data
+
+        deadline = time.monotonic() + 2
+        while stub.open_connections and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert stub.open_connections == 0
+
+    def test_connections_bounded(self, app, stub):
+        """Test that workers hold one connection each and never send a message twice."""
+        stub.greeting_delay = 0.02
+        queue(60)
+        ran = []
+        workers = [threading.Thread(target=lambda: ran.append(send(app, batch_size=5)))
+                   for _ in range(3)]
+        for worker in workers:
+            worker.start()
+        for worker in workers:
+            worker.join()
+        assert sum(ran) == 60
+        assert stub.max_open_connections <= 3
+        assert sorted(rcpt for _, [rcpt], _ in stub.messages) == sorted(
+            f'user{i}@example.com' for i in range(60))
+
+    def test_transient_failure_retried(self, app, stub):
+        """Test that a 4xx reply queues the message again after a backoff."""
+        stub.replies.append('451 Try again later')
+        queue(2)
+        send(app)
+
+        retried, sent = jobs()
+        assert (retried.status, retried.attempts, sent.status) == ('queued', 1, 'done')
+        assert '451' in retried.last_error
+        assert retried.run_at >= datetime.utcnow() + timedelta(seconds=29)
+        # smtplib reset the transaction; the connection carried on
+        assert stub.connections == 1
+
+        retried.run_at = datetime.utcnow()
+        db.session.commit()
+        assert send(app) == 1
+        assert jobs()[0].status == 'done'
+
+    def test_permanent_failure(self, app, stub):
+        """Test that a 5xx reply fails the message at once."""
+        stub.refused.add('user0@example.com')
+        queue(2)
+        send(app)
+        refused, sent = jobs()
+        assert (refused.status, refused.attempts) == ('failed', 1)
+        assert '550' in refused.last_error
+        assert sent.status == 'done'
+
+    def test_dropped_connection(self, app, stub):
+        """Test that a lost connection is reopened for the next message."""
+        stub.replies.append(None)
+        queue(3)
+        send(app)
+        assert [j.status for j in jobs()] == ['queued', 'done', 'done']
+        assert stub.connections == 2
+
+    def test_server_down(self, app, stub):
+        """Test that an unreachable server leaves every message for a retry."""
+        queue(3)
+        # Nothing listens on the stub's port once it has shut down
+        stub.__exit__(None, None, None)
+        send(app)
+        assert [(j.status, j.attempts) for j in jobs()] == [('queued', 1)] * 3
+
+    def test_gives_up(self, app, stub):
+        """Test that a message out of attempts is failed."""
+        app.config['JOBS_MAX_ATTEMPTS'] = 1
+        stub.replies.append('451 Try again later')
+        queue(1)
+        send(app)
+        [failed] = jobs()
+        assert failed.status == 'failed'
+        assert '451' in failed.last_error
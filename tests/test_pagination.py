@@ -0,0 +1,81 @@
+import pytest
+from datetime import datetime, timedelta
+from app import db
+from app.models import Opportunity
+
+
+@pytest.fixture
+def feed(app, test_user):
+    """Create twelve approved opportunities, two of them sharing a timestamp."""
+    created = datetime(2026, 1, 1)
+    for i in range(12):
+        db.session.add(Opportunity(
+            title=f'Opportunity {i}',
+            description='Feed entry',
+            category='Education',
+            location='Test City',
+            user_id=test_user.id,
+            is_approved=True,
+            created_at=created + timedelta(minutes=min(i, 10))
+        ))
+    db.session.commit()
+
+
+class TestKeysetPagination:
+    """Test cursor pagination on the public feed."""
+
+    def test_cursor_walk_returns_every_row_once(self, client, feed):
+        """Test that following next_cursor visits the whole feed in order."""
+        seen = []
+        data = client.get('/?per_page=5').get_json()
+        seen.extend(opp['id'] for opp in data['opportunities'])
+        while data['pagination']['next_cursor']:
+            data = client.get(f"/?per_page=5&after={data['pagination']['next_cursor']}").get_json()
+            seen.extend(opp['id'] for opp in data['opportunities'])
+
+        expected = [opp.id for opp in Opportunity.query.order_by(
+            Opportunity.created_at.desc(), Opportunity.id.desc())]
+        assert seen == expected
+        assert data['pagination']['has_more'] is False
+        assert data['pagination']['total_items'] == 12
+
+    def test_page_mode_contract(self, client, feed):
+        """Test that page= keeps returning the original pagination keys."""
+        data = client.get('/?page=3').get_json()
+        assert len(data['opportunities']) == 2
+        assert data['pagination']['page'] == 3
+        assert data['pagination']['per_page'] == 5
+        assert data['pagination']['total_pages'] == 3
+        assert data['pagination']['total_items'] == 12
+
+    def test_page_size_is_clamped(self, client, feed, app):
+        """Test that per_page cannot exceed the configured maximum."""
+        app.config['FEED_MAX_PAGE_SIZE'] = 4
+        data = client.get('/?per_page=100').get_json()
+        assert data['pagination']['per_page'] == 4
+        assert len(data['opportunities']) == 4
+
+    def test_invalid_cursor(self, client, feed):
+        """Test that a malformed cursor is rejected."""
+        response = client.get('/?after=not-a-cursor')
+        assert response.status_code == 400
+
+    def test_total_refreshed_on_approval(self, client, test_moderator, test_user):
+        """Test that the cached total is refreshed when a moderator approves."""
+        assert client.get('/').get_json()['pagination']['total_items'] == 0
+
+        opportunity = Opportunity(
+            title='Pending',
+            description='Waiting for review',
+            category='Education',
+            location='Test City',
+            user_id=test_user.id
+        )
+        db.session.add(opportunity)
+        db.session.commit()
+
+        client.post('/login', json={'username': 'moderator', 'password': 'moderator123'})
+        response = client.post(f'/moderator/approve/{opportunity.id}')
+        assert response.status_code == 200
+
+        assert client.get('/').get_json()['pagination']['total_items'] == 1
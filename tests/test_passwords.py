@@ -0,0 +1,141 @@
+import threading
+import time
+
+import pytest
+from werkzeug.security import generate_password_hash
+from app import db
+from app.models import User
+from app.passwords import HashPool, PasswordHashBusy, normalize_method, password_hasher
+
+
+@pytest.fixture
+def cheap(app):
+    """Fast PBKDF2 settings so tests do not pay for scrypt."""
+    app.config['PASSWORD_HASH_METHOD'] = 'pbkdf2:sha256:1000'
+    password_hasher.init_app(app)
+    return app
+
+
+def login(client, password='password123'):
+    return client.post('/login', json={'username': 'testuser', 'password': password})
+
+
+class TestMethods:
+    """Test hash method parsing."""
+
+    @pytest.mark.parametrize('method, expected', [
+        ('scrypt', 'scrypt:32768:8:1'),
+        ('scrypt:16384:8:2', 'scrypt:16384:8:2'),
+        ('pbkdf2', 'pbkdf2:sha256:1000000'),
+        ('pbkdf2:sha512', 'pbkdf2:sha512:1000000'),
+        ('pbkdf2:sha256:1000', 'pbkdf2:sha256:1000'),
+    ])
+    def test_normalize(self, method, expected):
+        """Test that methods are spelled out as Werkzeug stores them."""
+        assert normalize_method(method) == expected
+
+    @pytest.mark.parametrize('method', ['md5', 'scrypt:1', 'pbkdf2:sha256:many', 'pbkdf2:a:1:2'])
+    def test_invalid(self, app, method):
+        """Test that a bad method fails at startup."""
+        app.config['PASSWORD_HASH_METHOD'] = method
+        with pytest.raises(ValueError):
+            password_hasher.init_app(app)
+
+    def test_configured_method(self, cheap):
+        """Test that new hashes use the configured method and salt length."""
+        pwhash = password_hasher.hash('secret')
+        method, salt, _ = pwhash.split('$')
+        assert method == 'pbkdf2:sha256:1000'
+        assert len(salt) == 16
+        assert password_hasher.verify(pwhash, 'secret')
+        assert not password_hasher.verify(pwhash, 'wrong')
+        assert not password_hasher.needs_rehash(pwhash)
+
+    def test_needs_rehash(self, cheap):
+        """Test that other methods, costs and salt lengths are outdated."""
+        assert password_hasher.needs_rehash(generate_password_hash('secret', 'pbkdf2:sha256:999'))
+        assert password_hasher.needs_rehash(generate_password_hash('secret', 'scrypt'))
+        assert password_hasher.needs_rehash(generate_password_hash('secret', 'pbkdf2:sha256:1000', 8))
+
+
+class TestRehash:
+    """Test upgrading stored hashes on login."""
+
+    def test_login_rehashes(self, cheap, client, test_user):
+        """Test that a successful login stores a hash with the current settings."""
+        user = db.session.get(User, test_user.id)
+        user.password_hash = generate_password_hash('password123', 'pbkdf2:sha256:999')
+        db.session.commit()
+
+        assert login(client).status_code == 200
+        new = db.session.get(User, test_user.id).password_hash
+        assert new.startswith('pbkdf2:sha256:1000$')
+        assert login(client).status_code == 200
+        assert db.session.get(User, test_user.id).password_hash == new
+
+    def test_failed_login_keeps_hash(self, cheap, client, test_user):
+        """Test that a wrong password changes nothing."""
+        old = db.session.get(User, test_user.id).password_hash
+        assert login(client, 'wrong').status_code == 401
+        assert db.session.get(User, test_user.id).password_hash == old
+
+
+class TestPool:
+    """Test the bounded hashing pool."""
+
+    def test_runs_on_pool_threads(self):
+        """Test that work runs off the calling thread."""
+        pool = HashPool(workers=2, queue=0)
+        try:
+            assert pool.run(lambda: threading.current_thread().name).startswith('password-hash')
+        finally:
+            pool.shutdown()
+        assert pool.stats()['completed'] == 1
+
+    def test_inline(self):
+        """Test that no workers means the calling thread."""
+        assert HashPool(workers=0, queue=0).run(threading.current_thread) is threading.current_thread()
+
+    def test_full_pool_refuses(self):
+        """Test that work beyond workers plus queue is refused, not queued."""
+        pool = HashPool(workers=1, queue=1)
+        release = threading.Event()
+        started = threading.Event()
+
+        def block():
+            started.set()
+            release.wait(5)
+
+        callers = [threading.Thread(target=pool.run, args=(block,)) for _ in range(2)]
+        try:
+            for caller in callers:
+                caller.start()
+            started.wait(5)
+            while pool.stats()['pending'] < 2:
+                time.sleep(0.001)
+            with pytest.raises(PasswordHashBusy):
+                pool.run(block)
+        finally:
+            release.set()
+            for caller in callers:
+                caller.join()
+            pool.shutdown()
+        assert pool.stats() == {'workers': 1, 'limit': 2, 'pending': 0, 'completed': 2, 'rejected': 1}
+
+    def test_login_503_when_busy(self, app, client, test_user):
+        """Test that a full pool turns a login into a 503 with Retry-After."""
+        pool = app.extensions['passwords']['pool']
+        pool.limit = 0
+        response = login(client)
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+        assert pool.stats()['rejected'] == 1
+
+    def test_process_executor(self, cheap):
+        """Test hashing in worker processes."""
+        cheap.config['PASSWORD_HASH_EXECUTOR'] = 'process'
+        password_hasher.init_app(cheap)
+        try:
+            assert password_hasher.verify(password_hasher.hash('secret'), 'secret')
+        finally:
+            cheap.extensions['passwords']['pool'].shutdown()
@@ -0,0 +1,168 @@
+import pytest
+from app.ratelimit import LATENCY_HALF_LIFE, Admission, LocalLimiter, limit, rate_limiter
+from tests.test_moderation import login
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def admission(app):
+    return app.extensions['ratelimit']['admission']
+
+
+class TestLocalLimiter:
+    """Test the in-process GCRA buckets."""
+
+    def test_burst_then_refill(self):
+        """Test that a full bucket pays for a burst and then refills at the rate."""
+        clock = Clock()
+        limiter = LocalLimiter(clock=clock)
+        assert [limiter.consume('k', 1, rate=2, burst=3)[0] for _ in range(4)] == [True] * 3 + [False]
+        allowed, retry_after = limiter.consume('k', 1, rate=2, burst=3)
+        assert not allowed and retry_after == pytest.approx(0.5)
+
+        clock.now += 0.5
+        assert limiter.consume('k', 1, rate=2, burst=3)[0]
+        assert not limiter.consume('k', 1, rate=2, burst=3)[0]
+        # Other keys have their own bucket
+        assert limiter.consume('other', 3, rate=2, burst=3)[0]
+
+    def test_costs(self):
+        """Test that a request costing more than is left is refused without charge."""
+        limiter = LocalLimiter(clock=Clock())
+        assert limiter.consume('k', 8, rate=1, burst=10)[0]
+        assert not limiter.consume('k', 5, rate=1, burst=10)[0]
+        assert limiter.consume('k', 2, rate=1, burst=10)[0]
+        assert limiter.stats()['limited'] == 1
+
+    def test_refund(self):
+        """Test that a refund gives the tokens back, down to a full bucket."""
+        limiter = LocalLimiter(clock=Clock())
+        assert limiter.consume('k', 3, rate=1, burst=3)[0]
+        limiter.refund('k', 2, rate=1)
+        assert limiter.consume('k', 2, rate=1, burst=3)[0]
+        assert not limiter.consume('k', 1, rate=1, burst=3)[0]
+        limiter.refund('k', 3, rate=1)
+        assert len(limiter) == 0
+
+    def test_bounded(self):
+        """Test that refilled keys are dropped first, then the least recent."""
+        clock = Clock()
+        limiter = LocalLimiter(max_keys=2, clock=clock)
+        limiter.consume('a', 1, rate=1, burst=5)
+        clock.now += 10
+        limiter.consume('b', 5, rate=1, burst=5)
+        limiter.consume('c', 5, rate=1, burst=5)
+        assert len(limiter) == 2
+        # 'b' is still empty, 'a' was forgotten with a full bucket
+        assert not limiter.consume('b', 1, rate=1, burst=5)[0]
+        assert limiter.consume('a', 5, rate=1, burst=5)[0]
+
+    def test_priority_checked(self):
+        """Test that an unknown priority is a mistake."""
+        with pytest.raises(ValueError):
+            limit(priority='urgent')
+
+
+class TestQuotas:
+    """Test quotas charged per request."""
+
+    def test_ip_bucket(self, app, client):
+        """Test that anonymous clients are limited by IP with Retry-After."""
+        app.config.update({'RATE_LIMIT_IP_BURST': 3, 'RATE_LIMIT_IP_RATE': 0.1})
+        assert [client.get('/categories').status_code for _ in range(4)] == [200, 200, 200, 429]
+        response = client.get('/categories')
+        assert response.headers['Retry-After'] == '10'
+        assert 'error' in response.get_json()
+
+    def test_route_costs(self, app, test_user):
+        """Test that costly routes drain the user's bucket faster."""
+        app.config.update({'RATE_LIMIT_USER_BURST': 25, 'RATE_LIMIT_USER_RATE': 0.01})
+        client = login(app, 'testuser', 'password123')
+        new = {'title': 'T', 'description': 'D', 'category': 'Education', 'location': 'X'}
+        assert client.post('/new', json=new).status_code == 201
+        assert client.post('/new', json=new).status_code == 201
+        # 5 tokens left: not enough for a third post, enough for browsing
+        assert client.post('/new', json=new).status_code == 429
+        assert client.get('/@me').status_code == 200
+
+    def test_users_are_separate(self, app, test_user, test_admin, test_opportunity):
+        """Test that one user's flood does not limit another."""
+        app.config.update({'RATE_LIMIT_USER_BURST': 4, 'RATE_LIMIT_USER_RATE': 0.01})
+        flooder = login(app, 'testuser', 'password123')
+        other = login(app, 'admin', 'admin123')
+        url = f'/opportunity/{test_opportunity.id}/bookmark'
+        assert [flooder.post(url).status_code for _ in range(3)] == [201, 200, 429]
+        assert other.post(url).status_code == 201
+
+    def test_rejection_charges_no_bucket(self, app, test_user):
+        """Test that a request the user bucket refuses costs the IP bucket nothing."""
+        app.config.update({'RATE_LIMIT_USER_BURST': 2, 'RATE_LIMIT_USER_RATE': 0.01})
+        client = login(app, 'testuser', 'password123')
+        arrivals = app.extensions['ratelimit']['backend']._arrivals
+        assert [client.get('/@me').status_code for _ in range(3)] == [200, 200, 429]
+        ip_bucket = arrivals['ip:127.0.0.1']
+        assert client.get('/@me').status_code == 429
+        assert arrivals['ip:127.0.0.1'] == ip_bucket
+
+    def test_search_costs_more(self, app, client):
+        """Test that a search costs more than a plain feed page."""
+        app.config.update({'RATE_LIMIT_IP_BURST': 6, 'RATE_LIMIT_IP_RATE': 0.01})
+        assert client.get('/?q=garden').status_code == 200
+        assert client.get('/?q=garden').status_code == 429
+        assert client.get('/').status_code == 200
+
+    def test_null_backend(self, app, client):
+        """Test that the null backend turns quotas off."""
+        app.config.update({'RATE_LIMIT_BACKEND': 'null', 'RATE_LIMIT_IP_BURST': 1})
+        rate_limiter.init_app(app)
+        assert all(client.get('/categories').status_code == 200 for _ in range(3))
+        assert admission(app).stats()['in_flight'] == 0
+
+
+class TestAdmission:
+    """Test load shedding."""
+
+    def test_slow_server_sheds_search(self, app, client):
+        """Test that high latency refuses searches but not browsing."""
+        admission(app).latency = 5.0
+        response = client.get('/?q=garden')
+        assert response.status_code == 503
+        assert response.headers['Retry-After'] == '1'
+        assert client.get('/').status_code == 200
+        assert admission(app).stats()['shed'] == {'low': 1, 'normal': 0}
+
+    def test_latency_recovers(self):
+        """Test that shedding stops once a slow spell is over, with no request finishing."""
+        clock = Clock()
+        state = Admission(0, 0, 1000, clock=clock)
+        state.latency = 5.0
+        assert not state.enter('low')
+
+        clock.now += 3 * LATENCY_HALF_LIFE
+        assert state.enter('low')
+        assert state.latency == pytest.approx(5.0 / 8)
+
+    def test_concurrency_limits(self, app, client):
+        """Test that low priority work is refused first as requests pile up."""
+        state = admission(app)
+        state.in_flight = state.low_priority_max
+        assert client.get('/?q=garden').status_code == 503
+        assert client.get('/').status_code == 200
+        state.in_flight = state.max_concurrent
+        assert client.get('/').status_code == 503
+        state.in_flight = 0
+
+    def test_in_flight_released(self, app, client):
+        """Test that every admitted request is counted out again."""
+        client.get('/')
+        client.get('/opportunity/999')
+        client.get('/categories')
+        stats = admission(app).stats()
+        assert stats['in_flight'] == 0
+        assert stats['latency_ms'] > 0
@@ -0,0 +1,78 @@
+import time
+
+from app import socketio
+from app.realtime import ENGAGEMENT_EVENT, broadcaster
+
+
+def engagement_events(socket_client):
+    return [packet['args'][0] for packet in socket_client.get_received()
+            if packet['name'] == ENGAGEMENT_EVENT]
+
+
+class TestSubscriptions:
+    """Test the per-opportunity Socket.IO rooms."""
+
+    def test_only_subscribers_receive_updates(self, app, logged_in, test_opportunity):
+        """Test that events go to the opportunity's room and nowhere else."""
+        watcher = socketio.test_client(app)
+        bystander = socketio.test_client(app)
+        ack = watcher.emit('subscribe', {'opportunity_ids': [test_opportunity.id]}, callback=True)
+        assert ack == {'subscribed': [test_opportunity.id]}
+
+        logged_in.post(f'/opportunity/{test_opportunity.id}/react', json={'reaction_type': 'love'})
+
+        events = engagement_events(watcher)
+        assert events == [{
+            'opportunity_id': test_opportunity.id,
+            'reaction_counts': {'like': 0, 'love': 1, 'wow': 0},
+            'bookmark_count': 0,
+            'changes': [{'kind': 'reaction', 'action': 'added', 'type': 'love',
+                         'previous': None, 'user_id': test_opportunity.user_id}],
+            'total_changes': 1,
+        }]
+        assert engagement_events(bystander) == []
+
+    def test_unsubscribe(self, app, logged_in, test_opportunity):
+        """Test that leaving the room stops the events."""
+        watcher = socketio.test_client(app)
+        watcher.emit('subscribe', {'opportunity_ids': [test_opportunity.id]})
+        assert watcher.emit('unsubscribe', {}, callback=True) == {'unsubscribed': [test_opportunity.id]}
+
+        logged_in.post(f'/opportunity/{test_opportunity.id}/bookmark')
+        assert engagement_events(watcher) == []
+
+    def test_subscription_limit(self, app):
+        """Test that a client cannot join more rooms than allowed."""
+        app.config['REALTIME_MAX_SUBSCRIPTIONS'] = 2
+        watcher = socketio.test_client(app)
+        ack = watcher.emit('subscribe', {'opportunity_ids': [1, 2, 3, 'x']}, callback=True)
+        assert ack == {'subscribed': [1, 2]}
+
+
+class TestCoalescing:
+    """Test that bursts are merged into one event per window."""
+
+    def test_burst_becomes_one_event(self, app, logged_in, test_opportunity):
+        """Test a burst of toggles on one post is emitted once, after the window."""
+        app.config['REALTIME_COALESCE_WINDOW'] = 0.2
+        app.config['REALTIME_MAX_CHANGES'] = 2
+        watcher = socketio.test_client(app)
+        watcher.emit('subscribe', {'opportunity_ids': [test_opportunity.id]})
+
+        url = f'/opportunity/{test_opportunity.id}/react'
+        for reaction_type in ('like', 'wow', 'wow'):
+            logged_in.post(url, json={'reaction_type': reaction_type})
+        logged_in.post(f'/opportunity/{test_opportunity.id}/bookmark')
+        assert engagement_events(watcher) == []
+
+        time.sleep(0.5)
+        events = engagement_events(watcher)
+        assert len(events) == 1
+        assert events[0]['reaction_counts'] == {'like': 0, 'love': 0, 'wow': 0}
+        assert events[0]['bookmark_count'] == 1
+        assert events[0]['total_changes'] == 4
+        assert [change['action'] for change in events[0]['changes']] == ['removed', 'added']
+
+    def test_flush_without_pending_changes(self, app):
+        """Test that flushing an empty queue emits nothing."""
+        assert broadcaster.flush(app) == 0
@@ -0,0 +1,147 @@
+import os
+
+import pytest
+from flask_migrate import upgrade
+from sqlalchemy import text
+from app import create_app, db
+from app.models import Opportunity
+from app.signals import notify_feed_changed
+
+
+def make_opportunity(user, title, description, category='Education',
+                     location='Test City', is_approved=True):
+    opportunity = Opportunity(
+        title=title,
+        description=description,
+        category=category,
+        location=location,
+        user_id=user.id,
+        is_approved=is_approved
+    )
+    db.session.add(opportunity)
+    db.session.commit()
+    return opportunity
+
+
+class TestFeedSearch:
+    """Test full-text search on the public feed."""
+
+    def test_search_ranks_title_matches_first(self, client, test_user):
+        """Test that a title hit outranks a description hit."""
+        make_opportunity(test_user, 'Garden helpers', 'Help us plant trees in the park')
+        make_opportunity(test_user, 'Tree planting day', 'Bring gloves')
+
+        response = client.get('/?q=tree')
+        assert response.status_code == 200
+
+        data = response.get_json()
+        titles = [opp['title'] for opp in data['opportunities']]
+        assert titles == ['Tree planting day', 'Garden helpers']
+        assert data['pagination']['total_items'] == 2
+
+    def test_search_returns_highlights(self, client, test_user):
+        """Test that results carry highlighted snippets."""
+        make_opportunity(test_user, 'Coding club', 'Teach kids python on weekends')
+
+        data = client.get('/?q=python').get_json()
+        highlight = data['opportunities'][0]['highlight']
+        assert '<mark>python</mark>' in highlight['snippet']
+        assert highlight['title'] == 'Coding club'
+
+    def test_search_combines_with_filters(self, client, test_user):
+        """Test that search still honours the category filter."""
+        make_opportunity(test_user, 'Beach cleanup', 'Volunteer cleanup', category='Climate')
+        make_opportunity(test_user, 'Cleanup lesson', 'Volunteer cleanup', category='Education')
+
+        data = client.get('/?q=cleanup&category=Climate').get_json()
+        assert [opp['title'] for opp in data['opportunities']] == ['Beach cleanup']
+
+    def test_index_follows_approval_edit_and_delete(self, app, client, test_user):
+        """Test that the index tracks approval, edits and deletion."""
+        opportunity = make_opportunity(test_user, 'Soccer coach', 'Coach youth', is_approved=False)
+        assert client.get('/?q=soccer').get_json()['opportunities'] == []
+
+        opportunity.is_approved = True
+        db.session.commit()
+        notify_feed_changed(app, [opportunity.id])
+        assert len(client.get('/?q=soccer').get_json()['opportunities']) == 1
+
+        opportunity.title = 'Basketball coach'
+        db.session.commit()
+        notify_feed_changed(app, [opportunity.id])
+        assert client.get('/?q=soccer').get_json()['opportunities'] == []
+        assert len(client.get('/?q=basketball').get_json()['opportunities']) == 1
+
+        db.session.delete(opportunity)
+        db.session.commit()
+        notify_feed_changed(app, [opportunity.id])
+        assert client.get('/?q=basketball').get_json()['opportunities'] == []
+
+    def test_search_ignores_query_syntax(self, client, test_opportunity):
+        """Test that FTS operators in user input are treated as plain text."""
+        response = client.get('/?q="test*(')
+        assert response.status_code == 200
+        assert len(response.get_json()['opportunities']) == 1
+
+    def test_search_without_words(self, client, test_opportunity):
+        """Test that a query with nothing to search for matches nothing instead of failing."""
+        for query in ('!!!', '-', '"*'):
+            response = client.get('/', query_string={'q': query})
+            assert response.status_code == 200
+            assert response.get_json()['opportunities'] == []
+
+    def test_highlights_escape_html(self, client, test_user):
+        """Test that highlighted text is HTML-escaped around the <mark> tags."""
+        make_opportunity(test_user, '<script>alert(1)</script> garden',
+                         'Dig <b>beds</b> in the garden')
+
+        highlight = client.get('/?q=garden').get_json()['opportunities'][0]['highlight']
+        assert highlight['title'] == '&lt;script&gt;alert(1)&lt;/script&gt; <mark>garden</mark>'
+        assert '&lt;b&gt;beds&lt;/b&gt;' in highlight['snippet']
+        assert '<mark>garden</mark>' in highlight['snippet']
+
+    def test_search_results_page_with_cursor(self, client, test_user):
+        """Test that relevance-ordered results can be walked with a cursor."""
+        for i in range(4):
+            make_opportunity(test_user, f'Reading buddy {i}', 'Read with kids')
+
+        first = client.get('/?q=reading&per_page=3').get_json()
+        second = client.get(f"/?q=reading&per_page=3&after={first['pagination']['next_cursor']}").get_json()
+
+        ids = [opp['id'] for opp in first['opportunities'] + second['opportunities']]
+        assert len(ids) == len(set(ids)) == 4
+        assert second['pagination']['next_cursor'] is None
+
+
+class TestMigrations:
+    """Test the search index on a database built by the migrations."""
+
+    def test_index_live_after_upgrade(self, tmp_path, monkeypatch):
+        """Test that rows written after `flask db upgrade` reach the index.
+
+        Migrations that rebuild the opportunity table on SQLite drop its
+        triggers unless they recreate them.
+        """
+        monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'migrated.db'}")
+        migrated = create_app()
+        with migrated.app_context():
+            upgrade(directory=os.path.join(os.path.dirname(__file__), '..', 'migrations'))
+            # Plain SQL: the migrated schema predates some model columns
+            db.session.execute(text(
+                "INSERT INTO user (id, username, email, password_hash, role, account_active, is_banned) "
+                "VALUES (1, 'migrated', 'migrated@example.com', 'x', 'user', 1, 0)"))
+            db.session.execute(text(
+                "INSERT INTO opportunity (id, title, description, category, location, is_approved, "
+                "created_at, updated_at, user_id) VALUES (1, 'Orchard harvest', 'Pick apples', "
+                "'Education', 'Test City', 1, '2026-01-01', '2026-01-01', 1)"))
+            db.session.execute(text("UPDATE opportunity SET title = 'Vineyard harvest' WHERE id = 1"))
+            db.session.commit()
+
+            def matches(word):
+                return db.session.execute(text(
+                    "SELECT rowid FROM opportunity_fts WHERE opportunity_fts MATCH :word"
+                ), {'word': word}).scalars().all()
+
+            assert matches('vineyard') == [1]
+            assert matches('orchard') == []
+            db.session.remove()
@@ -0,0 +1,87 @@
+import http.client
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from app.serving import PooledWSGIServer
+
+
+class SlowApp:
+    """WSGI app that records how many requests run at once."""
+
+    def __init__(self, delay=0.2):
+        self.delay = delay
+        self.lock = threading.Lock()
+        self.running = 0
+        self.peak = 0
+
+    def __call__(self, environ, start_response):
+        with self.lock:
+            self.running += 1
+            self.peak = max(self.peak, self.running)
+        time.sleep(self.delay)
+        with self.lock:
+            self.running -= 1
+        start_response('200 OK', [('Content-Type', 'text/plain'), ('Content-Length', '2')])
+        return [b'ok']
+
+
+@pytest.fixture
+def server():
+    servers = []
+
+    def start(app, **options):
+        server = PooledWSGIServer('127.0.0.1', 0, app, **options)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.draining = True
+        server.shutdown()
+        server.server_close()
+
+
+def get(port, path='/'):
+    connection = http.client.HTTPConnection('127.0.0.1', port, timeout=10)
+    connection.request('GET', path)
+    response = connection.getresponse()
+    body = response.read()
+    connection.close()
+    return response.status, body
+
+
+class TestPooledWSGIServer:
+    """Test the bounded thread pool server used by serve.py."""
+
+    def test_concurrency_is_bounded_by_pool(self, server):
+        """Test that no more than `threads` requests run at the same time."""
+        app = SlowApp()
+        port = server(app, threads=2).port
+        with ThreadPoolExecutor(max_workers=6) as pool:
+            results = list(pool.map(lambda _: get(port), range(6)))
+        assert results == [(200, b'ok')] * 6
+        assert app.peak == 2
+
+    def test_idle_connections_time_out(self, server):
+        """Test that a connection that never sends a request is closed."""
+        port = server(SlowApp(delay=0), threads=1, keepalive=0.2).port
+        with socket.create_connection(('127.0.0.1', port), timeout=5) as idle:
+            assert idle.recv(1) == b''
+        assert get(port) == (200, b'ok')
+
+    def test_drain_waits_for_in_flight_requests(self, server):
+        """Test that a draining server finishes requests it already accepted."""
+        app = SlowApp(delay=0.5)
+        srv = server(app, threads=2)
+        with ThreadPoolExecutor(max_workers=1) as pool:
+            pending = pool.submit(get, srv.port)
+            while not app.running:
+                time.sleep(0.01)
+            srv.draining = True
+            srv.shutdown()
+            assert srv.wait_idle(timeout=5) == 0
+            assert pending.result() == (200, b'ok')
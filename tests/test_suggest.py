@@ -0,0 +1,98 @@
+import random
+
+import pytest
+from app import db
+from app.models import Opportunity
+from app.suggest import PrefixTrie
+from app.tags import parse_tags, set_opportunity_tags
+
+
+@pytest.fixture
+def places(app, test_user):
+    """Approved opportunities with repeated locations and tags, plus one pending."""
+    specs = [
+        ('Oak Park', 'python', True),
+        ('oak  park', 'python, outdoors', True),
+        ('Oakland', 'outdoors', True),
+        ('Ocean View', 'python', True),
+        ('Oakville', 'oak trees', False),
+    ]
+    ids = []
+    for location, tags, approved in specs:
+        opportunity = Opportunity(title='T', description='d', category='Education',
+                                  location=location, user_id=test_user.id, is_approved=approved)
+        db.session.add(opportunity)
+        db.session.flush()
+        set_opportunity_tags(opportunity.id, parse_tags(tags), replace=False)
+        ids.append(opportunity.id)
+    db.session.commit()
+    return ids
+
+
+def values(response, kind):
+    return [(item['value'], item['count']) for item in response.get_json()[kind]]
+
+
+class TestPrefixTrie:
+    """Test the trie's cached rankings against a brute-force answer."""
+
+    def test_matches_brute_force_under_updates(self):
+        """Test that every prefix ranks like a full scan after random changes."""
+        rng = random.Random(7)
+        words = [''.join(rng.choice('abc') for _ in range(rng.randint(1, 4))) for _ in range(60)]
+        trie, counts = PrefixTrie(3), {}
+        trie.load((word, None) for word in words)
+        for word in words:
+            counts[word] = counts.get(word, 0) + 1
+
+        for _ in range(400):
+            word = rng.choice(words)
+            delta = 1 if counts.get(word, 0) == 0 else rng.choice((1, -1))
+            trie.add(word, delta)
+            counts[word] += delta
+            for prefix in ('', 'a', 'b', 'ac', 'cab'):
+                expected = sorted((w for w, n in counts.items() if n and w.startswith(prefix)),
+                                  key=lambda w: (-counts[w], w))[:3]
+                assert [item['value'] for item in trie.search(prefix, 3)] == expected
+
+    def test_removed_values_are_pruned(self):
+        """Test that counting a value down to zero removes its nodes."""
+        trie = PrefixTrie(5)
+        trie.add('abc', 1)
+        trie.add('abc', -1)
+        assert trie.root.children == {}
+        assert trie.search('a', 5) == []
+
+
+class TestSuggest:
+    """Test the /suggest endpoint."""
+
+    def test_locations_ranked_and_merged(self, client, places):
+        """Test that spellings merge, approved counts rank and pending is hidden."""
+        response = client.get('/suggest?kind=location&q=OAK')
+        assert response.status_code == 200
+        assert values(response, 'locations') == [('Oak Park', 2), ('Oakland', 1)]
+
+    def test_both_kinds(self, client, places):
+        """Test that without kind both lists come back, ranked by use."""
+        data = client.get('/suggest?q=o&limit=1').get_json()
+        assert data['tags'] == [{'value': 'outdoors', 'count': 2}]
+        assert data['locations'] == [{'value': 'Oak Park', 'count': 2}]
+        assert values(client.get('/suggest?kind=tag&q='), 'tags') == [('python', 3), ('outdoors', 2)]
+
+    def test_follows_moderation(self, client, places, test_moderator):
+        """Test that approving and deleting update the index in place."""
+        assert values(client.get('/suggest?kind=tag&q=oak'), 'tags') == []
+        client.post('/login', json={'username': 'moderator', 'password': 'moderator123'})
+        client.post(f'/moderator/approve/{places[4]}')
+        assert values(client.get('/suggest?kind=tag&q=oak'), 'tags') == [('oak trees', 1)]
+
+        client.delete(f'/moderator/delete_opportunity/{places[2]}')
+        assert values(client.get('/suggest?kind=location&q=oak'), 'locations') == \
+            [('Oak Park', 2), ('Oakville', 1)]
+
+    def test_invalid_arguments(self, client):
+        """Test kind and limit validation."""
+        assert client.get('/suggest?kind=city').status_code == 400
+        assert client.get('/suggest?limit=0').status_code == 400
+        assert client.get('/suggest?limit=500').status_code == 400
@@ -0,0 +1,183 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from sqlalchemy import event
+from app import db
+from app.models import Opportunity, Tag
+from app.tags import exact_tag_filter, normalize, parse_tags, set_opportunity_tags, tag_cache
+
+
+def post_opportunity(client, tags, title='Tagged'):
+    return client.post('/new', json={
+        'title': title, 'description': 'Has tags', 'category': 'Education',
+        'location': 'Test City', 'tags': tags,
+    })
+
+
+class TestNormalization:
+    """Test tag name normalization."""
+
+    def test_normalize(self):
+        """Test case folding, whitespace collapsing and the length limit."""
+        assert normalize('  Climate   ACTION ') == 'climate action'
+        assert normalize('Straße') == 'strasse'
+        assert normalize('   ') == ''
+        assert len(normalize('x' * 80)) == 50
+
+    def test_parse_tags(self):
+        """Test that duplicates after normalizing collapse, keeping first-seen order."""
+        assert parse_tags('Python, climate,PYTHON , ,Climate') == ['python', 'climate']
+        assert parse_tags(['Youth', 'youth', 3]) == ['youth']
+
+
+class TestResolution:
+    """Test batched tag resolution on the create/edit routes."""
+
+    def test_tags_are_shared_case_insensitively(self, logged_in):
+        """Test that names differing only in case map to one tag."""
+        first = post_opportunity(logged_in, 'Python, Climate  Action')
+        second = post_opportunity(logged_in, 'python,CLIMATE ACTION, youth')
+        assert first.status_code == second.status_code == 201
+        assert [tag['name'] for tag in first.get_json()['tags']] == ['python', 'climate action']
+        assert Tag.query.count() == 3
+
+    def test_fixed_number_of_tag_queries(self, app, logged_in):
+        """Test that resolving many tags costs one lookup and one insert, then none."""
+        tag_statements = []
+
+        def record(conn, cursor, statement, *args):
+            if 'tag' in statement and 'opportunity_tags' not in statement:
+                tag_statements.append(statement)
+
+        names = ', '.join(f'tag{i}' for i in range(20))
+        event.listen(db.engine, 'before_cursor_execute', record)
+        try:
+            post_opportunity(logged_in, names)
+            created = len(tag_statements)
+            tag_statements.clear()
+            tag_cache.clear()
+            post_opportunity(logged_in, names)
+            looked_up = len(tag_statements)
+            tag_statements.clear()
+            post_opportunity(logged_in, names)
+            cached = len(tag_statements)
+        finally:
+            event.remove(db.engine, 'before_cursor_execute', record)
+
+        assert created == 3     # lookup, upsert, read back
+        assert looked_up == 1
+        assert cached == 0
+
+    def test_edit_replaces_tags(self, logged_in):
+        """Test that editing with tags swaps the opportunity's links."""
+        opportunity_id = post_opportunity(logged_in, 'one, two').get_json()['id']
+        response = logged_in.post(f'/opportunity/{opportunity_id}/edit', json={'tags': 'Two, three'})
+        assert [tag['name'] for tag in response.get_json()['tags']] == ['two', 'three']
+
+    def test_renamed_tag_is_not_served_from_cache(self, logged_in):
+        """Test that ORM changes to a tag drop the cached ids."""
+        post_opportunity(logged_in, 'old')
+        tag = Tag.query.filter_by(name='old').one()
+        tag.name = 'renamed'
+        db.session.commit()
+
+        response = post_opportunity(logged_in, 'old')
+        assert [t['name'] for t in response.get_json()['tags']] == ['old']
+        assert Tag.query.count() == 2
+
+    def test_concurrent_new_tag(self, app, test_user):
+        """Test that posters racing to create the same tag all succeed."""
+        clients = []
+        for _ in range(6):
+            client = app.test_client()
+            client.post('/login', json={'username': 'testuser', 'password': 'password123'})
+            clients.append(client)
+        start = threading.Barrier(len(clients))
+
+        def fire(client):
+            start.wait()
+            return post_opportunity(client, 'Brand New, brand new').status_code
+
+        with ThreadPoolExecutor(max_workers=len(clients)) as pool:
+            statuses = list(pool.map(fire, clients))
+
+        assert statuses == [201] * len(clients)
+        db.session.expire_all()
+        assert [tag.name for tag in Tag.query.all()] == ['brand new']
+        assert all(len(opp.tags) == 1 for opp in Opportunity.query.all())
+
+
+@pytest.fixture
+def tagged(app, test_user):
+    """Approved opportunities with known tag sets, plus one pending."""
+    specs = [
+        ('Both', 'python, climate', True),
+        ('Python only', 'python', True),
+        ('Climate only', 'climate, pythonic', True),
+        ('Pending', 'python, climate', False),
+    ]
+    ids = {}
+    for title, tags, approved in specs:
+        opportunity = Opportunity(title=title, description='d', category='Education',
+                                  location='Test City', user_id=test_user.id, is_approved=approved)
+        db.session.add(opportunity)
+        db.session.flush()
+        set_opportunity_tags(opportunity.id, parse_tags(tags), replace=False)
+        ids[title] = opportunity.id
+    db.session.commit()
+    return ids
+
+
+def feed_titles(client, query):
+    response = client.get(f'/?per_page=50&{query}')
+    assert response.status_code == 200
+    return sorted(opp['title'] for opp in response.get_json()['opportunities'])
+
+
+class TestExactTagFilter:
+    """Test the posting-list backed exact tag filter."""
+
+    def test_all_and_any(self, client, tagged):
+        """Test AND/OR semantics and that matching is exact, not substring."""
+        assert feed_titles(client, 'tags=Python,climate&tag_match=exact') == ['Both']
+        assert feed_titles(client, 'tags=python,climate&tag_match=exact&tag_mode=any') == \
+            ['Both', 'Climate only', 'Python only']
+        # Substring matching still finds "pythonic" by default
+        assert feed_titles(client, 'tags=python') == ['Both', 'Climate only', 'Python only']
+
+    def test_unknown_tags(self, client, tagged):
+        """Test that an unknown tag empties an AND filter but not an OR one."""
+        assert feed_titles(client, 'tags=python,nope&tag_match=exact') == []
+        assert feed_titles(client, 'tags=python,nope&tag_match=exact&tag_mode=any') == \
+            ['Both', 'Python only']
+
+    def test_big_tags_fall_back_to_sql(self, app, client, tagged):
+        """Test that tags over TAG_POSTINGS_MAX_IDS give the same answers from SQL."""
+        app.config['TAG_POSTINGS_MAX_IDS'] = 1
+        app.config['FEED_CACHE_BACKEND'] = 'null'
+        assert feed_titles(client, 'tags=python,climate&tag_match=exact') == ['Both']
+        assert feed_titles(client, 'tags=python,pythonic&tag_match=exact&tag_mode=any') == \
+            ['Both', 'Climate only', 'Python only']
+
+    def test_long_results_fall_back_to_sql(self, app, client, tagged):
+        """Test that a result over TAG_FILTER_MAX_INLINE_IDS is matched in SQL, not inlined."""
+        app.config['TAG_FILTER_MAX_INLINE_IDS'] = 1
+        app.config['FEED_CACHE_BACKEND'] = 'null'
+        criterion = exact_tag_filter(['python', 'climate'], mode='any')
+        assert 'opportunity_tags' in str(criterion)
+        assert feed_titles(client, 'tags=python,climate&tag_match=exact&tag_mode=any') == \
+            ['Both', 'Climate only', 'Python only']
+        assert feed_titles(client, 'tags=python,climate&tag_match=exact') == ['Both']
+
+    def test_postings_follow_feed_changes(self, app, client, tagged, test_moderator):
+        """Test that approving an opportunity refreshes the cached lists."""
+        assert feed_titles(client, 'tags=python,climate&tag_match=exact') == ['Both']
+        client.post('/login', json={'username': 'moderator', 'password': 'moderator123'})
+        client.post(f"/moderator/approve/{tagged['Pending']}")
+        assert feed_titles(client, 'tags=python,climate&tag_match=exact') == ['Both', 'Pending']
+
+    def test_invalid_mode(self, client):
+        """Test that unknown modes are rejected."""
+        assert client.get('/?tags=a&tag_mode=some').status_code == 400
+        assert client.get('/?tags=a&tag_match=fuzzy').status_code == 400
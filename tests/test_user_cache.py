@@ -0,0 +1,127 @@
+import pytest
+from sqlalchemy import event
+from app import db
+from app.jobs import Worker
+from app.models import User
+from app.user_cache import UserSnapshot, user_cache
+from tests.test_moderation import login
+
+
+@pytest.fixture
+def user_client(app, test_user):
+    return login(app, 'testuser', 'password123')
+
+
+@pytest.fixture
+def admin_client(app, test_admin):
+    return login(app, 'admin', 'admin123')
+
+
+@pytest.fixture
+def moderator_client(app, test_moderator):
+    return login(app, 'moderator', 'moderator123')
+
+
+def user_queries(client, url):
+    statements = []
+    record = lambda conn, cursor, statement, *args: statements.append(statement)
+    event.listen(db.engine, 'before_cursor_execute', record)
+    try:
+        response = client.get(url)
+    finally:
+        event.remove(db.engine, 'before_cursor_execute', record)
+    return response, [statement for statement in statements if 'FROM user' in statement]
+
+
+class TestLoader:
+    """Test the cached Flask-Login user loader."""
+
+    def test_repeat_requests_skip_the_query(self, app, user_client, test_user):
+        """Test that only the first request after a miss reads the user row."""
+        user_cache.clear()
+        first, queries = user_queries(user_client, '/@me')
+        assert first.get_json()['username'] == 'testuser'
+        assert len(queries) == 1
+
+        second, queries = user_queries(user_client, '/@me')
+        assert second.get_json() == first.get_json()
+        assert queries == []
+        assert user_cache.stats()['hits'] >= 1
+
+    def test_snapshot_is_read_only(self, app, test_user):
+        """Test that snapshots cannot be changed and carry no password hash."""
+        snapshot = user_cache.get(test_user.id)
+        assert isinstance(snapshot, UserSnapshot)
+        assert snapshot.to_dict() == db.session.get(User, test_user.id).to_dict()
+        assert not hasattr(snapshot, 'password_hash')
+        with pytest.raises(AttributeError):
+            snapshot.role = 'admin'
+
+    def test_unknown_user(self, app):
+        """Test that a missing user loads as None."""
+        assert user_cache.get(999) is None
+
+    def test_bounded(self, app, test_user, test_admin):
+        """Test that USER_CACHE_MAX_ENTRIES bounds the cache."""
+        app.config['USER_CACHE_MAX_ENTRIES'] = 1
+        user_cache.init_app(app)
+        user_cache.get(test_user.id)
+        user_cache.get(test_admin.id)
+        assert user_cache.stats()['entries'] == 1
+        assert user_cache.get(test_admin.id).username == 'admin'
+
+
+class TestInvalidation:
+    """Test that account changes take effect on the next request."""
+
+    def test_change_role(self, app, user_client, admin_client, test_user):
+        """Test that a promotion is seen by the user's next request."""
+        assert user_client.get('/admin/users').status_code == 403
+        admin_client.post(f'/admin/role/{test_user.id}/moderator')
+        assert user_client.get('/@me').get_json()['role'] == 'moderator'
+        assert user_client.get('/admin/users').status_code == 200
+
+    @pytest.mark.parametrize('url, field, value', [
+        ('/admin/suspend/{}', 'account_active', False),
+        ('/moderator/ban_user/{}', 'is_banned', True),
+    ])
+    def test_account_state(self, app, user_client, moderator_client, test_user, url, field, value):
+        """Test that suspending and banning are seen at once."""
+        user_client.get('/@me')
+        moderator_client.post(url.format(test_user.id))
+        assert user_client.get('/@me').get_json()[field] is value
+
+    def test_activate(self, app, user_client, admin_client, test_user):
+        """Test that reactivation is seen at once."""
+        admin_client.post(f'/admin/suspend/{test_user.id}')
+        assert user_client.get('/@me').get_json()['account_active'] is False
+        admin_client.post(f'/admin/activate/{test_user.id}')
+        assert user_client.get('/@me').get_json()['account_active'] is True
+
+    def test_delete(self, app, user_client, moderator_client, test_user):
+        """Test that a deleted user's session stops working."""
+        assert user_client.get('/@me').status_code == 200
+        response = moderator_client.delete(f'/moderator/delete_user/{test_user.id}')
+        assert response.status_code == 202
+        Worker(app, poll_seconds=0).run(until_idle=True)
+        assert user_client.get('/@me').status_code == 401
+
+    def test_orm_updates_evict(self, app, test_user):
+        """Test that a change made outside the routes still evicts."""
+        user_cache.get(test_user.id)
+        user = db.session.get(User, test_user.id)
+        user.role = 'admin'
+        db.session.commit()
+        assert user_cache.get(test_user.id).role == 'admin'
+
+
+class TestMetrics:
+    """Test /admin/metrics."""
+
+    def test_admin_only(self, user_client, admin_client):
+        """Test that only admins see the cache counters."""
+        assert user_client.get('/admin/metrics').status_code == 403
+        metrics = admin_client.get('/admin/metrics').get_json()
+        assert set(metrics) == {'user_cache', 'feed_cache', 'tag_cache', 'tag_postings', 'password_hashing', 'rate_limit', 'jobs', 'outbox'}
+        assert {'hits', 'misses', 'entries'} <= set(metrics['user_cache'])
+        assert metrics['user_cache']['misses'] >= 1
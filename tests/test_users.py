@@ -0,0 +1,99 @@
+import pytest
+from app import db
+from app.models import User
+
+
+@pytest.fixture
+def people(app, test_admin):
+    """A handful of users with mixed case, roles and states."""
+    with app.app_context():
+        specs = [
+            ('Alice', 'alice@example.com', 'user', True, False),
+            ('alfred', 'fred@example.org', 'moderator', True, False),
+            ('bob', 'ALbert@example.com', 'user', False, False),
+            ('carol', 'carol@example.com', 'user', True, True),
+            ('al_x', 'x@example.com', 'user', True, False),
+        ]
+        for username, email, role, active, banned in specs:
+            user = User(username=username, email=email, role=role,
+                        account_active=active, is_banned=banned)
+            user.set_password('secret123')
+            db.session.add(user)
+        db.session.commit()
+
+
+@pytest.fixture
+def admin_client(client, test_admin):
+    client.post('/login', json={'username': 'admin', 'password': 'admin123'})
+    return client
+
+
+def usernames(response):
+    return [user['username'] for user in response.get_json()['users']]
+
+
+class TestUserSearch:
+    """Test the paginated admin user listing."""
+
+    def test_prefix_search_is_case_insensitive(self, admin_client, people):
+        """Test that q matches username or email prefixes in any case."""
+        response = admin_client.get('/admin/users?q=AL&sort=id&per_page=50')
+        assert response.status_code == 200
+        assert usernames(response) == ['Alice', 'alfred', 'bob', 'al_x']
+
+    def test_like_wildcards_are_literal(self, admin_client, people):
+        """Test that _ and % in the prefix are not wildcards."""
+        assert usernames(admin_client.get('/admin/users?q=al_')) == ['al_x']
+        assert usernames(admin_client.get('/admin/users?q=%25')) == []
+
+    def test_unicode_prefixes(self, app, admin_client, people):
+        """Test non-ASCII prefixes, including ones without a plain successor."""
+        for i, username in enumerate(('Émile', 'z\U0010ffffa', 'z\ud7ffb')):
+            db.session.add(User(username=username, email=f'u{i}@example.net', password_hash='x'))
+        db.session.commit()
+
+        def search(q):
+            return usernames(admin_client.get('/admin/users', query_string={'q': q}))
+
+        assert search('Ém') == ['Émile']
+        assert search('z\U0010ffff') == ['z\U0010ffffa']
+        assert search('z\ud7ff') == ['z\ud7ffb']
+
+    def test_filters(self, admin_client, people):
+        """Test the role, active and banned filters."""
+        assert usernames(admin_client.get('/admin/users?role=moderator')) == ['alfred']
+        assert usernames(admin_client.get('/admin/users?active=false')) == ['bob']
+        assert usernames(admin_client.get('/admin/users?banned=true')) == ['carol']
+        assert admin_client.get('/admin/users?banned=maybe').status_code == 400
+        assert admin_client.get('/admin/users?role=owner').status_code == 400
+
+    def test_keyset_pages_follow_the_sort(self, admin_client, people):
+        """Test that walking the cursor visits every user once, in order."""
+        seen, after = [], ''
+        while True:
+            data = admin_client.get(f'/admin/users?sort=-username&per_page=2&after={after}').get_json()
+            seen += [user['username'] for user in data['users']]
+            after = data['pagination']['next_cursor']
+            if not after:
+                break
+        assert seen == sorted(seen, reverse=True)
+        assert len(seen) == len(set(seen)) == 6
+        assert admin_client.get('/admin/users?sort=age').status_code == 400
+
+    def test_capped_count(self, app, admin_client, people):
+        """Test that the optional total stops counting at the cap."""
+        data = admin_client.get('/admin/users?count=true').get_json()
+        assert data['pagination']['total'] == {'value': 6, 'exact': True}
+
+        app.config['ADMIN_USER_COUNT_CAP'] = 3
+        data = admin_client.get('/admin/users?count=true').get_json()
+        assert data['pagination']['total'] == {'value': 3, 'exact': False}
+        assert 'total' not in admin_client.get('/admin/users').get_json()['pagination']
+
+    def test_moderators_allowed_users_forbidden(self, client, test_moderator, test_user):
+        """Test the role check on the listing."""
+        client.post('/login', json={'username': 'testuser', 'password': 'password123'})
+        assert client.get('/admin/users').status_code == 403
+        client.post('/logout')
+        client.post('/login', json={'username': 'moderator', 'password': 'moderator123'})
+        assert client.get('/admin/users').status_code == 200